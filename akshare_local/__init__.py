@@ -8,6 +8,7 @@ from akshare_local.stock.stock_hk_em import (
 )
 from akshare_local.stock.stock_hk_sfc import (
     get_stock_short_sale_hk_report_list,
+    get_stock_short_sale_hk_report,
     stock_hk_short_sale,
     stock_hk_ccass_records,
 )
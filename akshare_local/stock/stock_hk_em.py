@@ -9,10 +9,10 @@ https://hk.eastmoney.com/sellshort.html
 import datetime
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from pandas import DataFrame
 
+from akshare_local.utils import http
 from akshare_local.utils.func import split_date_range
 
 
@@ -34,7 +34,7 @@ def stock_hk_short_sale_em_simple(
     end_date = datetime.datetime.strptime(end_date, "%Y%m%d").strftime("%Y-%m-%d")
 
     params = {"code": symbol, "sdate": start_date, "edate": end_date}
-    r = requests.get(url, params=params)
+    r = http.get(url, params=params)
 
     soup = BeautifulSoup(r.text, "html.parser")
     raw_list = soup.find("tbody").find_all("tr")
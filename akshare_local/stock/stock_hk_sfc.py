@@ -8,15 +8,16 @@ https://www.sfc.hk/TC/
 
 import datetime
 import re
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from typing import Tuple
 
+import lxml.html
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 from opencc import OpenCC
 
+from akshare_local.utils import http
+
 
 def convert_date(str_date):
     """
@@ -27,24 +28,22 @@ def convert_date(str_date):
     return f"{item[0]}{item[1]:0>2}{item[2]:0>2}"
 
 
+SHORT_SALE_COLUMNS = ["日期", "证券代码", "证券简称", "淡仓股数", "淡仓金额"]
+
+
 def get_stock_short_sale_hk_report_list():
     """
     获取港股证监会卖空报告列表: 报告日期、报告CSV文件地址
     """
-    # Initialize UserAgent
-    ua = UserAgent()
-    random_agent = ua.random
-    headers = {"User-Agent": random_agent}
     root_url = "https://sc.sfc.hk/TuniS/www.sfc.hk/TC/Regulatory-functions/Market/Short-position-reporting/Aggregated-reportable-short-positions-of-specified-shares"
-    r = requests.get(root_url, headers=headers)
-    soup = BeautifulSoup(r.text, "html.parser")
-    rows = soup.find_all("tr", scope="row")
+    r = http.get(root_url)
+    tree = lxml.html.fromstring(r.content)
     url_rows = []
-    for row in rows:
-        items = row.find_all("td")
+    for row in tree.xpath("//tr[@scope='row']"):
+        items = row.xpath("./td")
         if len(items) == 3:
-            csv_date = convert_date(items[0].text)
-            csv_url = items[2].find("a").get("href")
+            csv_date = convert_date(items[0].text_content())
+            csv_url = items[2].xpath(".//a/@href")[0]
             url_rows.append([csv_date, csv_url])
     url_rows.reverse()
     return pd.DataFrame(url_rows, columns=["报告日期", "文件地址"])
@@ -52,46 +51,47 @@ def get_stock_short_sale_hk_report_list():
 
 def get_stock_short_sale_hk_report(url):
     """
-    根据获取港股证监会卖空CSV文件地址，获取港股证监会卖空报告内容
+    根据获取港股证监会卖空CSV文件地址，获取港股证监会卖空报告内容 (日期为 YYYYMMDD 字符串)
     """
-    # Initialize UserAgent
-    ua = UserAgent()
-    random_agent = ua.random
-    headers = {"User-Agent": random_agent}
-    csv_text = requests.get(url, headers=headers).text
-    df = pd.read_csv(StringIO(csv_text))
-    df["Date"] = df["Date"].apply(lambda d: d.replace("/", ""))
-    df["Stock Code"] = df["Stock Code"].apply(lambda d: f"{d:05d}")
-    df.columns = ["日期", "证券代码", "证券简称", "淡仓股数", "淡仓金额"]
+    r = http.get(url)
+    df = pd.read_csv(StringIO(r.text), dtype={"Stock Code": str})
+    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y").dt.strftime("%Y%m%d")
+    df["Stock Code"] = df["Stock Code"].str.strip().str.zfill(5)
+    df.columns = SHORT_SALE_COLUMNS
     df = df[df["淡仓股数"] > 0]
     return df
 
 
 def stock_hk_short_sale(
-        start_date: str = "20120801", end_date: str = "20900101"
+        start_date: str = "20120801",
+        end_date: str = "20900101",
+        report_list: pd.DataFrame = None,
+        max_workers: int = 4,
 ) -> pd.DataFrame:
     """
     香港证监会公示数据-卖空汇总统计
     https://www.sfc.hk/TC/Regulatory-functions/Market/Short-position-reporting/Aggregated-reportable-short-positions-of-specified-shares
+    报告列表仅获取一次 (或由调用方传入已缓存的 report_list), 各周报告 CSV 并发下载 (每个线程复用一个 HTTP 会话), 合并后返回
     :param start_date: 开始统计时间
     :type start_date: str
     :param end_date: 结束统计时间
     :type end_date: str
+    :param report_list: 报告列表 (get_stock_short_sale_hk_report_list 的返回结果), 为空时重新获取
+    :type report_list: pandas.DataFrame
+    :param max_workers: 并发下载数
+    :type max_workers: int
     :return: 港股卖空数据
     :rtype: pandas.DataFrame
     """
-    report_list = get_stock_short_sale_hk_report_list()
+    if report_list is None:
+        report_list = get_stock_short_sale_hk_report_list()
     report_list = report_list[
         (end_date >= report_list["报告日期"]) & (report_list["报告日期"] >= start_date)
         ]
 
-    # 读取卖空报告并存储
-    df_list = []
-    for index, row in report_list.iterrows():
-        row_url = row.iloc[1]
-        df = get_stock_short_sale_hk_report(row_url)
-        df["日期"] = pd.to_datetime(df["日期"], format="%d%m%Y").dt.strftime("%Y%m%d")
-        df_list.append(df)
+    # 并发读取卖空报告, 按报告日期顺序返回
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        df_list = list(executor.map(get_stock_short_sale_hk_report, report_list["文件地址"]))
 
     if len(df_list) > 0:
         # 日期数据合并
@@ -100,9 +100,46 @@ def stock_hk_short_sale(
         res[number_cols] = res[number_cols].apply(pd.to_numeric, errors="coerce")
         return res
     else:
-        return pd.DataFrame(
-            columns=["日期", "证券代码", "证券简称", "淡仓股数", "淡仓金额"]
-        )
+        return pd.DataFrame(columns=SHORT_SALE_COLUMNS)
+
+
+CCASS_SUMMARY_COLUMNS = [
+    "日期",
+    "证券代码",
+    "证券简称",
+    "持股类型",
+    "持股量",
+    "参数者数",
+    "百分比",
+]
+
+CCASS_BODY_COLUMNS = [
+    "日期",
+    "证券代码",
+    "证券简称",
+    "机构编号",
+    "机构名称",
+    "持股量",
+    "百分比",
+]
+
+# 繁体转简体转换器加载词典较慢, 模块内共享一个实例
+_hk2s = OpenCC("hk2s")
+
+
+def _has_class(name):
+    """
+    XPath 条件: class 属性包含指定类名
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _text(node, xpath):
+    """
+    第一个匹配节点的文本 (去除首尾空白), 无匹配节点时返回 None
+    """
+    nodes = node.xpath(xpath)
+    return nodes[0].text_content().strip() if nodes else None
 
 
 def stock_hk_ccass_records(
@@ -111,6 +148,7 @@ def stock_hk_ccass_records(
     """
     香港证监会公示数据-中央結算系統持股紀錄
     https://www3.hkexnews.hk/sdw/search/searchsdw_c.aspx
+    页面使用 lxml 解析, 仅对提取出的证券简称、持股类型、机构名称做繁体转简体
     :param symbol: 股票代码
     :type symbol: str
     :param date: 数据日期
@@ -138,142 +176,66 @@ def stock_hk_ccass_records(
         "txtParticipantName": "",
         "txtSelPartID": "",
     }
-    # Initialize UserAgent
-    ua = UserAgent()
-    random_agent = ua.random
-    headers = {"User-Agent": random_agent}
-    r = requests.post(url, data=data, headers=headers)
+    r = http.post(url, data=data)
 
-    cc = OpenCC("hk2s")
-    soup = BeautifulSoup(cc.convert(r.text), "html.parser")
-
-    search_date_div = soup.find(
-        "div", class_="search-bar__selectedItem-filter searchDate"
-    )
+    tree = lxml.html.fromstring(r.content)
+    search_date = _text(tree, f"//div[{_has_class('searchDate')}]")
 
     """ 如页面返回内容日期等于搜索日期,则解析页面返回结果, 否则返回空的 DataFrame 对象 """
-    if (
-            search_date_div is not None
-            and search_date_div.text.strip()[-10:] == holding_date
-    ):
-        stock_info = (
-            soup.find("div", class_="search-bar__selectedItem-filter searchStock")
-            .text.strip()
-            .split(" ")
+    if search_date is None or search_date[-10:] != holding_date:
+        return (
+            pd.DataFrame(columns=CCASS_SUMMARY_COLUMNS),
+            pd.DataFrame(columns=CCASS_BODY_COLUMNS),
         )
-        stock_symbol = stock_info[0]
-        stock_name = stock_info[1]
 
-        summary_divs = soup.find_all("div", class_="ccass-search-datarow")
-        summary_rows = []
-        for item in summary_divs:
-            category = item.find("div", class_="summary-category").text.strip()
-            shareholding = (
-                item.find("div", class_="shareholding")
-                .find("div", class_="value")
-                .text.strip()
-                .replace(",", "")
-            )
-            number = (
-                item.find("div", class_="number-of-participants")
-                .find("div", class_="value")
-                .text.strip()
-                .replace(",", "")
-            )
-            percents = (
-                item.find("div", class_="percent-of-participants")
-                .find("div", class_="value")
-                .text.strip()[:-1]
-            )
-            summary_rows.append([category, shareholding, number, percents])
-        summary_df = pd.DataFrame(
-            summary_rows, columns=["持股类型", "持股量", "参数者数", "百分比"]
+    stock_info = _text(tree, f"//div[{_has_class('searchStock')}]").split(" ")
+    stock_symbol = stock_info[0]
+    stock_name = _hk2s.convert(stock_info[1])
+
+    summary_rows = []
+    for item in tree.xpath(f"//div[{_has_class('ccass-search-datarow')}]"):
+        summary_rows.append(
+            [
+                _hk2s.convert(_text(item, f".//div[{_has_class('summary-category')}]")),
+                _text(item, f".//div[{_has_class('shareholding')}]//div[{_has_class('value')}]").replace(",", ""),
+                _text(item, f".//div[{_has_class('number-of-participants')}]//div[{_has_class('value')}]").replace(",", ""),
+                _text(item, f".//div[{_has_class('percent-of-participants')}]//div[{_has_class('value')}]")[:-1],
+            ]
         )
-        summary_df["日期"] = date
-        summary_df["证券代码"] = stock_symbol
-        summary_df["证券简称"] = stock_name
-        summary_columns = [
-            "日期",
-            "证券代码",
-            "证券简称",
-            "持股类型",
-            "持股量",
-            "参数者数",
-            "百分比",
-        ]
-        summary_df = summary_df[summary_columns]
-        summary_df["持股量"] = pd.to_numeric(summary_df["持股量"], errors="coerce")
-        summary_df["参数者数"] = pd.to_numeric(summary_df["参数者数"], errors="coerce")
-        summary_df["百分比"] = pd.to_numeric(summary_df["百分比"], errors="coerce")
-
-        body_divs = soup.find("tbody").find_all("tr")
-        body_rows = []
-        for item in body_divs:
-            participant_id = (
-                item.find("td", class_="col-participant-id")
-                .find("div", class_="mobile-list-body")
-                .text.strip()
-            )
-            participant_name = (
-                item.find("td", class_="col-participant-name")
-                .find("div", class_="mobile-list-body")
-                .text.strip()
-            )
-            shareholding = (
-                item.find("td", class_="col-shareholding text-right")
-                .find("div", class_="mobile-list-body")
-                .text.strip()
-                .replace(",", "")
-            )
-            percents = (
-                0
-                if item.find("td", class_="col-shareholding-percent text-right") is None
-                else (
-                    item.find("td", class_="col-shareholding-percent text-right")
-                    .find("div", class_="mobile-list-body")
-                    .text.strip()[:-1]
-                )
-            )
-            body_rows.append([participant_id, participant_name, shareholding, percents])
-        body_df = pd.DataFrame(
-            body_rows, columns=["机构编号", "机构名称", "持股量", "百分比"]
+    summary_df = pd.DataFrame(
+        summary_rows, columns=["持股类型", "持股量", "参数者数", "百分比"]
+    )
+    summary_df["日期"] = date
+    summary_df["证券代码"] = stock_symbol
+    summary_df["证券简称"] = stock_name
+    summary_df = summary_df[CCASS_SUMMARY_COLUMNS]
+    summary_df["持股量"] = pd.to_numeric(summary_df["持股量"], errors="coerce")
+    summary_df["参数者数"] = pd.to_numeric(summary_df["参数者数"], errors="coerce")
+    summary_df["百分比"] = pd.to_numeric(summary_df["百分比"], errors="coerce")
+
+    body_rows = []
+    for item in tree.xpath("//tbody/tr"):
+        percents = _text(
+            item,
+            f"./td[{_has_class('col-shareholding-percent')}]//div[{_has_class('mobile-list-body')}]",
         )
-        body_df["日期"] = date
-        body_df["证券代码"] = stock_symbol
-        body_df["证券简称"] = stock_name
-        body_columns = [
-            "日期",
-            "证券代码",
-            "证券简称",
-            "机构编号",
-            "机构名称",
-            "持股量",
-            "百分比",
-        ]
-        body_df = body_df[body_columns]
-        summary_df["持股量"] = pd.to_numeric(summary_df["持股量"], errors="coerce")
-        summary_df["百分比"] = pd.to_numeric(summary_df["百分比"], errors="coerce")
-
-        return summary_df, body_df
-    else:
-        summary_columns = [
-            "日期",
-            "证券代码",
-            "证券简称",
-            "持股类型",
-            "持股量",
-            "参数者数",
-            "百分比",
-        ]
-        body_columns = [
-            "日期",
-            "证券代码",
-            "证券简称",
-            "机构编号",
-            "机构名称",
-            "持股量",
-            "百分比",
-        ]
-        return pd.DataFrame(columns=[summary_columns]), pd.DataFrame(
-            columns=[body_columns]
+        body_rows.append(
+            [
+                _text(item, f"./td[{_has_class('col-participant-id')}]//div[{_has_class('mobile-list-body')}]"),
+                _text(item, f"./td[{_has_class('col-participant-name')}]//div[{_has_class('mobile-list-body')}]"),
+                _text(item, f"./td[{_has_class('col-shareholding')}]//div[{_has_class('mobile-list-body')}]").replace(",", ""),
+                0 if percents is None else percents[:-1],
+            ]
         )
+    body_df = pd.DataFrame(
+        body_rows, columns=["机构编号", "机构名称", "持股量", "百分比"]
+    )
+    body_df["机构名称"] = [_hk2s.convert(name) for name in body_df["机构名称"]]
+    body_df["日期"] = date
+    body_df["证券代码"] = stock_symbol
+    body_df["证券简称"] = stock_name
+    body_df = body_df[CCASS_BODY_COLUMNS]
+    body_df["持股量"] = pd.to_numeric(body_df["持股量"], errors="coerce")
+    body_df["百分比"] = pd.to_numeric(body_df["百分比"], errors="coerce")
+
+    return summary_df, body_df
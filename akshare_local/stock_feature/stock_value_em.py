@@ -9,7 +9,8 @@ https://data.eastmoney.com/gzfx/detail/300766.html
 import datetime
 
 import pandas as pd
-from akshare.request import make_request_with_retry_json
+
+from akshare_local.utils import http
 
 
 def stock_value_em_by_date(trade_date: str = "20251110") -> pd.DataFrame:
@@ -43,7 +44,7 @@ def stock_value_em_by_date(trade_date: str = "20251110") -> pd.DataFrame:
         "client": "WEB",
         "filter": f"(TRADE_DATE='{trade_date}')",
     }
-    data_json = make_request_with_retry_json(url, params=params)
+    data_json = http.get(url, params=params).json()
     temp_json = data_json["result"]["data"]
     temp_df = pd.DataFrame(temp_json)
     temp_df.rename(
@@ -126,7 +127,7 @@ def stock_value_em(symbol: str = "300766") -> pd.DataFrame:
         "client": "WEB",
         "filter": f'(SECURITY_CODE="{symbol}")',
     }
-    data_json = make_request_with_retry_json(url, params=params)
+    data_json = http.get(url, params=params).json()
     temp_json = data_json["result"]["data"]
     temp_df = pd.DataFrame(temp_json)
     temp_df.rename(
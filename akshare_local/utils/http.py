@@ -0,0 +1,103 @@
+"""
+akshare_local 共享 HTTP 会话
+1. 每个线程一个 requests.Session, 连接按主机复用 (HTTP keep-alive), 避免每次请求重新建立 TCP/TLS 连接
+2. User-Agent 列表在首次使用时生成一次 (fake_useragent 加载数据文件较慢), 每个会话从列表中随机选取
+3. 超时时间及每个主机的连接池大小读取 application.ini [http], 响应 gzip/deflate 压缩由 requests 透明解压
+"""
+
+import random
+import threading
+
+import requests
+import requests.adapters
+
+from util.config import get_cfg
+
+USER_AGENT_SIZE = 32
+
+# fake_useragent 不可用时使用的 User-Agent
+FALLBACK_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0",
+]
+
+_lock = threading.Lock()
+_local = threading.local()
+_user_agents = None
+
+
+def get_http_cfg():
+    cfg = get_cfg()
+    return {
+        "connect_timeout": cfg.getfloat("http", "connect_timeout", fallback=10),
+        "read_timeout": cfg.getfloat("http", "read_timeout", fallback=30),
+        "pool_maxsize": cfg.getint("http", "pool_maxsize", fallback=8),
+    }
+
+
+def get_user_agents():
+    """
+    User-Agent 列表, 进程内只生成一次
+    """
+    global _user_agents
+    if _user_agents is None:
+        with _lock:
+            if _user_agents is None:
+                try:
+                    from fake_useragent import UserAgent
+
+                    ua = UserAgent()
+                    _user_agents = list({ua.random for _ in range(USER_AGENT_SIZE)})
+                except Exception:
+                    _user_agents = list(FALLBACK_USER_AGENTS)
+    return _user_agents
+
+
+def random_user_agent():
+    return random.choice(get_user_agents())
+
+
+def get_session():
+    """
+    当前线程的 requests.Session, 首次调用时创建
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        http_cfg = get_http_cfg()
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=http_cfg["pool_maxsize"],
+            pool_maxsize=http_cfg["pool_maxsize"],
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {
+                "User-Agent": random_user_agent(),
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        _local.session = session
+        _local.timeout = (http_cfg["connect_timeout"], http_cfg["read_timeout"])
+    return session
+
+
+def request(method, url, **kwargs):
+    """
+    使用当前线程的会话发起请求, 未指定 timeout 时使用配置的超时时间, 响应状态码异常时抛出 requests.HTTPError
+    """
+    session = get_session()
+    kwargs.setdefault("timeout", _local.timeout)
+    r = session.request(method, url, **kwargs)
+    r.raise_for_status()
+    return r
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
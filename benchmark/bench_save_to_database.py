@@ -0,0 +1,109 @@
+"""
+描述: save_to_database 写入性能对比 (DataFrame.to_sql vs oracledb executemany 数组绑定)
+    按 STOCK_ZH_A_HIST_DAILY_* 的表结构生成模拟日线数据, 写入临时基准表, 输出每种写入方式的 rows/sec
+
+执行: python -m benchmark.bench_save_to_database --rows 200000 --repeat 3
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from util.tools import exec_sql, get_engine, query_table_is_exist, save_to_database
+
+BENCH_TABLE = "BENCH_SAVE_TO_DATABASE"
+
+CREATE_TABLE_SQL = f"""CREATE TABLE {BENCH_TABLE} (
+    "ID" NUMBER(10,0) GENERATED BY DEFAULT AS IDENTITY NOT NULL ENABLE,
+    "日期" NUMBER(8,0) DEFAULT NULL,
+    "股票代码" VARCHAR2(8) DEFAULT NULL,
+    "开盘" NUMBER(10,2) DEFAULT NULL,
+    "收盘" NUMBER(10,2) DEFAULT NULL,
+    "最高" NUMBER(10,2) DEFAULT NULL,
+    "最低" NUMBER(10,2) DEFAULT NULL,
+    "成交量" NUMBER(10,0) DEFAULT NULL,
+    "成交额" NUMBER(16,2) DEFAULT NULL,
+    "振幅" NUMBER(12,2) DEFAULT NULL,
+    "涨跌幅" NUMBER(8,2) DEFAULT NULL,
+    "涨跌额" NUMBER(10,2) DEFAULT NULL,
+    "换手率" NUMBER(8,2) DEFAULT NULL
+)"""
+
+
+def make_daily_frame(rows, symbols=5000, seed=0):
+    """
+    生成与 stock_zh_a_hist 日线结果结构一致的模拟数据
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.array([f"{600000 + i:06d}" for i in range(symbols)])
+    dates = pd.bdate_range(end="2025-12-31", periods=rows // symbols + 1)
+    close = np.round(rng.uniform(2, 200, rows), 2)
+    return pd.DataFrame(
+        {
+            "日期": dates[np.arange(rows) // symbols].strftime("%Y%m%d"),
+            "股票代码": codes[np.arange(rows) % symbols],
+            "开盘": np.round(close * rng.uniform(0.95, 1.05, rows), 2),
+            "收盘": close,
+            "最高": np.round(close * 1.05, 2),
+            "最低": np.round(close * 0.95, 2),
+            "成交量": rng.integers(100, 10_000_000, rows),
+            "成交额": np.round(rng.uniform(1e4, 1e10, rows), 2),
+            "振幅": np.round(rng.uniform(0, 20, rows), 2),
+            "涨跌幅": np.round(rng.uniform(-10, 10, rows), 2),
+            "涨跌额": np.round(rng.uniform(-5, 5, rows), 2),
+            "换手率": np.round(rng.uniform(0, 30, rows), 2),
+        }
+    )
+
+
+def bench_writer(df, engine, writer, batch_size, repeat):
+    """
+    执行 repeat 次写入, 返回最优一次的 rows/sec
+    """
+    best = None
+    for _ in range(repeat):
+        exec_sql(f"TRUNCATE TABLE {BENCH_TABLE}")
+        start = time.perf_counter()
+        save_to_database(
+            df,
+            BENCH_TABLE.lower(),
+            engine,
+            index=False,
+            if_exists="append",
+            chunksize=20000,
+            writer=writer,
+            batch_size=batch_size,
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return df.shape[0] / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="save_to_database benchmark")
+    parser.add_argument("--rows", default=200000, type=int, help="写入记录数")
+    parser.add_argument("--batch-size", default=50000, type=int, help="executemany 单批次行数")
+    parser.add_argument("--repeat", default=3, type=int, help="每种写入方式的重复次数")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if query_table_is_exist(BENCH_TABLE):
+        exec_sql(f"DROP TABLE {BENCH_TABLE} PURGE")
+    exec_sql(CREATE_TABLE_SQL)
+
+    try:
+        df = make_daily_frame(args.rows)
+        print(f"Benchmark save_to_database Rows[{args.rows}] BatchSize[{args.batch_size}] Repeat[{args.repeat}]")
+        for writer in ["to_sql", "executemany"]:
+            rows_per_sec, elapsed = bench_writer(
+                df, engine, writer, args.batch_size, args.repeat
+            )
+            print(f"Writer[{writer:<12}] Best[{elapsed:8.2f}s] Throughput[{rows_per_sec:12.0f} rows/sec]")
+    finally:
+        exec_sql(f"DROP TABLE {BENCH_TABLE} PURGE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+描述: 离线同步基准测试, 不访问东方财富等数据源及 Oracle 数据库
+    1. 模块模式: 同步模块中的 akshare 替换为模拟数据源 (benchmark/fake_akshare.py), 数据库替换为本地 SQLite 文件,
+       执行模块 sync(), 输出每个模块的耗时、写入记录数、rows/sec、数据库往返次数、HTTP 请求次数
+    2. 调度模式: sync_start.py 中的全部同步任务替换为按预估耗时等比缩放的模拟任务, 由 DagScheduler 调度执行,
+       输出实际总耗时与关键路径下界, 用于检查调度策略及主机并发限制的回退
+
+执行:
+    python -m benchmark.bench_sync --modules stock_zh_a_hist_daily_bfq stock_zh_a_hist_daily_qfq --symbols 500 --history-days 750
+    python -m benchmark.bench_sync --scheduler --time-scale 0.05 --processes 8
+"""
+
+import argparse
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from tenacity import wait_fixed
+
+from benchmark.fake_akshare import FakeAkshare, make_trade_codes, make_trade_dates
+from util import metrics, tools
+from util.ratelimit import install_limiters
+from util.trade_calendar import TradeCalendar
+
+# 支持离线执行的同步模块: 模块名 -> (表名, 周期, 复权方式)
+MODULES = {
+    "stock_zh_a_hist_daily_bfq": ("STOCK_ZH_A_HIST_DAILY_BFQ", "daily", ""),
+    "stock_zh_a_hist_daily_hfq": ("STOCK_ZH_A_HIST_DAILY_HFQ", "daily", "hfq"),
+    "stock_zh_a_hist_daily_qfq": ("STOCK_ZH_A_HIST_DAILY_QFQ", "daily", "qfq"),
+    "stock_zh_a_hist_weekly_hfq": ("STOCK_ZH_A_HIST_WEEKLY_HFQ", "weekly", "hfq"),
+    "stock_zh_a_hist_weekly_qfq": ("STOCK_ZH_A_HIST_WEEKLY_QFQ", "weekly", "qfq"),
+    "stock_zh_a_hist_monthly_hfq": ("STOCK_ZH_A_HIST_MONTHLY_HFQ", "monthly", "hfq"),
+    "stock_zh_a_hist_monthly_qfq": ("STOCK_ZH_A_HIST_MONTHLY_QFQ", "monthly", "qfq"),
+}
+
+
+class SqliteStandIn:
+    """
+    本地 SQLite 数据库, 替代 Oracle; 通过 SQLAlchemy 事件统计数据库往返次数
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.engine = create_engine(
+            f"sqlite:///{path}", connect_args={"timeout": 60, "check_same_thread": False}
+        )
+        self.lock = threading.Lock()
+        self.round_trips = 0
+        self.sync_logs = {}
+        event.listen(self.engine, "before_cursor_execute", self.count_round_trip)
+
+    def count_round_trip(self, *args):
+        with self.lock:
+            self.round_trips += 1
+
+    def exec_sql(self, sql):
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(sql)
+
+    def count_rows(self, table_name):
+        with self.engine.connect() as connection:
+            return connection.execute(text(f"SELECT COUNT(1) FROM {table_name}")).scalar()
+
+    def update_sync_log_date(self, api_name, table_name, date):
+        self.sync_logs[table_name] = ("成功", date)
+
+    def update_sync_log_state_to_failed(self, api_name, table_name):
+        self.sync_logs[table_name] = ("失败", None)
+
+
+class FakeGlobalData:
+    def __init__(self, trade_code_a, trade_date_a):
+        self.trade_code_a = trade_code_a
+        self.trade_date_a = trade_date_a
+        self.trade_calendar = TradeCalendar(trade_date_a)
+
+
+class NoCheckpoint:
+    """
+    检查点替身: SYNC_CHECKPOINT 使用 Oracle MERGE, 基准测试中每次均同步全部股票
+    """
+
+    def __init__(self, table_name, end_date):
+        pass
+
+    def load(self, logger):
+        return self
+
+    def filter(self, args, key):
+        return args
+
+    def track(self, func, key):
+        return func
+
+    def mark_done(self, trade_code):
+        pass
+
+    def mark_failed(self, trade_code):
+        pass
+
+
+def no_write_cfg(writer=None, batch_size=None):
+    # SQLite 不支持 oracledb 数组绑定, 统一使用 DataFrame.to_sql 写入
+    return "to_sql", batch_size or 50000
+
+
+def prefill_table(fake, db, table_name, period, adjust, trade_codes, until_date):
+    """
+    预置截止日期(含)前的历史数据, 使模块执行增量同步; until_date 为 None 时仅创建空表
+    """
+    frames = []
+    for trade_code in trade_codes:
+        bars = fake.period_bars(trade_code, period, adjust)
+        if until_date is not None:
+            frames.append(bars[bars["日期"] <= pd.Timestamp(until_date)])
+        else:
+            frames.append(bars.head(0))
+    df = pd.concat(frames, ignore_index=True)
+    df["日期"] = df["日期"].dt.strftime("%Y%m%d")
+    df.to_sql(table_name.lower(), db.engine, index=False, if_exists="replace", chunksize=20000)
+    return df.shape[0]
+
+
+def patch_module(module, fake, db, global_data, retry_wait):
+    """
+    替换同步模块中的数据源、数据库及全局数据引用
+    """
+    module.akshare = fake
+    module.get_engine = lambda: db.engine
+    module.exec_create_table_script = lambda script_dir, drop_exist, logger: None
+    module.GlobalData = lambda: global_data
+    module.update_sync_log_date = db.update_sync_log_date
+    module.update_sync_log_state_to_failed = db.update_sync_log_state_to_failed
+    if hasattr(module, "exec_sql"):
+        module.exec_sql = db.exec_sql
+    if hasattr(module, "SyncCheckpoint"):
+        module.SyncCheckpoint = NoCheckpoint
+    if hasattr(module, "is_resample_enabled"):
+        module.is_resample_enabled = lambda: False
+    if hasattr(module, "is_async_fetch_enabled"):
+        module.is_async_fetch_enabled = lambda: False
+    # 模拟失败的重试间隔缩短, 保留 tenacity 重试及限流装饰器的执行开销
+    module.stock_zh_a_hist = module.stock_zh_a_hist.retry_with(wait=wait_fixed(retry_wait))
+
+
+def bench_module(name, args, db, trade_codes, trade_dates):
+    table_name, period, adjust = MODULES[name]
+    module = importlib.import_module(f"{name}.{name}")
+    fake = FakeAkshare(
+        trade_dates,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    global_data = FakeGlobalData(trade_codes, trade_dates)
+    patch_module(module, fake, db, global_data, args.retry_wait)
+
+    prefill_count = int(len(trade_dates) * args.prefill_ratio)
+    until_date = trade_dates[prefill_count - 1] if prefill_count > 0 else None
+    prefill_rows = prefill_table(
+        fake, db, table_name, period, adjust, trade_codes["证券代码"], until_date
+    )
+
+    metrics.set_module(name)
+    round_trips = db.round_trips
+    start = time.perf_counter()
+    module.sync(False, False, args.workers)
+    elapsed = time.perf_counter() - start
+
+    rows = db.count_rows(table_name) - prefill_rows
+    return {
+        "module": name,
+        "status": db.sync_logs.get(name.lower(), ("未完成", None))[0],
+        "wall_seconds": round(elapsed, 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "db_round_trips": db.round_trips - round_trips,
+        **fake.stats(),
+        **{
+            f"{record['stage']}_seconds": record["seconds"]
+            for record in metrics.snapshot()
+            if "stage" in record
+        },
+    }
+
+
+def simulated_task(seconds):
+    """
+    调度模式下的模拟同步任务, 需为模块级函数以便在子进程中执行
+    """
+    time.sleep(seconds)
+
+
+def bench_scheduler(args):
+    from sync_start import build_tasks
+    from util.scheduler import DagScheduler, Task
+
+    tasks = build_tasks()
+    tasks.append(Task("stock_table_summary", None, (), [task.name for task in tasks], 1, None))
+    for task in tasks:
+        task.func = simulated_task
+        task.args = (task.cost * args.time_scale,)
+
+    scheduler = DagScheduler(tasks, args.processes)
+    start = time.perf_counter()
+    failed = scheduler.run()
+    elapsed = time.perf_counter() - start
+    lower_bound = max(
+        scheduler.upward_rank({task.name: task.cost * args.time_scale for task in tasks}).values()
+    )
+    return {
+        "module": "sync_start",
+        "status": "失败" if failed or scheduler.skipped else "成功",
+        "wall_seconds": round(elapsed, 3),
+        "critical_path_seconds": round(lower_bound, 3),
+        "total_task_seconds": round(sum(task.cost * args.time_scale for task in tasks), 3),
+        "tasks": len(tasks),
+        "processes": args.processes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline sync benchmark")
+    parser.add_argument("--modules", nargs="*", default=list(MODULES), help=f"同步模块, 可选 {list(MODULES)}")
+    parser.add_argument("--symbols", default=200, type=int, help="模拟股票数量")
+    parser.add_argument("--history-days", default=500, type=int, help="模拟交易日数量")
+    parser.add_argument("--prefill-ratio", default=0.98, type=float, help="预置历史数据比例, 0 表示全量同步")
+    parser.add_argument("--latency-ms", default=50.0, type=float, help="模拟请求延迟中位数(毫秒)")
+    parser.add_argument("--latency-sigma", default=0.5, type=float, help="模拟请求延迟对数正态分布 sigma")
+    parser.add_argument("--error-rate", default=0.0, type=float, help="模拟请求失败概率")
+    parser.add_argument("--retry-wait", default=0.1, type=float, help="模拟失败后的重试间隔秒数")
+    parser.add_argument("--workers", default=5, type=int, help="模块内并发线程数")
+    parser.add_argument("--seed", default=0, type=int, help="随机种子")
+    parser.add_argument("--scheduler", action="store_true", help="调度模式: 模拟执行 sync_start 全部任务")
+    parser.add_argument("--time-scale", default=0.05, type=float, help="调度模式下每分钟预估耗时对应的模拟秒数")
+    parser.add_argument("--processes", default=4, type=int, help="调度模式进程数")
+    parser.add_argument("--rate-limit", action="store_true", help="启用 application.ini 中的数据源限流配置")
+    parser.add_argument("--output", default=None, help="结果输出 JSON 文件")
+    args = parser.parse_args()
+
+    results = []
+    if args.scheduler:
+        results.append(bench_scheduler(args))
+    else:
+        if not args.rate_limit:
+            install_limiters({})
+        # util.tools 中的写入方式配置统一为 to_sql
+        tools.get_write_cfg = no_write_cfg
+        trade_dates = make_trade_dates(args.history_days)
+        trade_codes = make_trade_codes(args.symbols)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = SqliteStandIn(os.path.join(tmp_dir, "bench_sync.db"))
+            print(
+                f"Benchmark Sync Symbols[{args.symbols}] HistoryDays[{args.history_days}] PrefillRatio[{args.prefill_ratio}] "
+                f"Latency[{args.latency_ms}ms] ErrorRate[{args.error_rate}] Workers[{args.workers}]"
+            )
+            for name in args.modules:
+                results.append(bench_module(name, args, db, trade_codes, trade_dates))
+            db.engine.dispose()
+
+    for result in results:
+        print(" ".join(f"{key}[{value}]" for key, value in result.items()))
+    if args.output is not None:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+描述: 离线基准测试使用的模拟 akshare 数据源
+    按股票代码生成确定性的模拟行情 (同一股票、复权方式多次请求结果一致, 增量同步和复权校验逻辑与真实数据源一致),
+    每次请求按对数正态分布模拟网络延迟, 按错误率随机抛出连接异常, 并统计请求次数
+"""
+
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+HIST_COLUMNS = [
+    "日期",
+    "股票代码",
+    "开盘",
+    "收盘",
+    "最高",
+    "最低",
+    "成交量",
+    "成交额",
+    "振幅",
+    "涨跌幅",
+    "涨跌额",
+    "换手率",
+]
+
+PERIOD_FREQ = {"weekly": "W-SUN", "monthly": "M"}
+
+ADJUST_SCALE = {"": 1.0, "qfq": 1.0, "hfq": 8.0}
+
+
+def make_trade_dates(history_days, end_date=None):
+    """
+    模拟交易日历: 截止日期(默认当天)前 history_days 个工作日, YYYYMMDD 字符串
+    """
+    end = pd.Timestamp.now().normalize() if end_date is None else pd.Timestamp(end_date)
+    return list(pd.bdate_range(end=end, periods=history_days).strftime("%Y%m%d"))
+
+
+def make_trade_codes(symbols):
+    """
+    模拟 GlobalData.trade_code_a: 沪深京 A 股代码列表
+    """
+    codes = [f"{(600000 if i % 2 == 0 else 1) + i // 2:06d}" for i in range(symbols)]
+    return pd.DataFrame(
+        {
+            "证券代码": codes,
+            "证券简称": [f"模拟{code}" for code in codes],
+            "交易所": ["SSE" if code.startswith("6") else "SZSE" for code in codes],
+            "板块": ["主板"] * symbols,
+        }
+    )
+
+
+class FakeAkshare:
+    """
+    模拟 akshare 模块, 替换同步模块中的 akshare 引用
+
+    trade_dates: 交易日历, 生成的行情日期范围
+    latency_ms: 请求延迟中位数(毫秒), latency_sigma: 对数正态分布 sigma
+    error_rate: 请求失败概率
+    """
+
+    def __init__(self, trade_dates, latency_ms=50.0, latency_sigma=0.5, error_rate=0.0, seed=0):
+        self.trade_dates = pd.Series(pd.to_datetime(trade_dates, format="%Y%m%d"))
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+
+    def request(self):
+        """
+        模拟一次网络请求: 延迟 + 随机失败
+        """
+        with self.lock:
+            self.calls += 1
+            latency = (
+                self.random.lognormvariate(np.log(self.latency_ms), self.latency_sigma)
+                if self.latency_ms > 0
+                else 0.0
+            )
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(latency / 1000)
+        if failed:
+            raise ConnectionError("Fake Akshare Simulated Connection Error")
+
+    def daily_bars(self, symbol, adjust):
+        """
+        单只股票全部历史日线, 按 (股票代码, 复权方式) 缓存, 随机游走价格以股票代码为种子
+        """
+        key = (symbol, adjust)
+        bars = self.cache.get(key)
+        if bars is not None:
+            return bars
+
+        rows = len(self.trade_dates)
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        change = rng.normal(0, 0.02, rows)
+        close = np.round(10 * ADJUST_SCALE[adjust] * np.exp(np.cumsum(change)), 2)
+        prev_close = np.concatenate([[close[0]], close[:-1]])
+        high = np.round(np.maximum(close, prev_close) * (1 + rng.uniform(0, 0.02, rows)), 2)
+        low = np.round(np.minimum(close, prev_close) * (1 - rng.uniform(0, 0.02, rows)), 2)
+        volume = rng.integers(1_000, 1_000_000, rows)
+        bars = pd.DataFrame(
+            {
+                "日期": self.trade_dates,
+                "股票代码": symbol,
+                "开盘": prev_close,
+                "收盘": close,
+                "最高": high,
+                "最低": low,
+                "成交量": volume,
+                "成交额": np.round(volume * close * 100, 2),
+                "振幅": np.round((high - low) / prev_close * 100, 2),
+                "涨跌幅": np.round((close - prev_close) / prev_close * 100, 2),
+                "涨跌额": np.round(close - prev_close, 2),
+                "换手率": np.round(rng.uniform(0, 10, rows), 2),
+            }
+        )
+        with self.lock:
+            self.cache[key] = bars
+        return bars
+
+    def period_bars(self, symbol, period, adjust):
+        bars = self.daily_bars(symbol, adjust)
+        if period == "daily":
+            return bars
+        key = (symbol, adjust, period)
+        resampled = self.cache.get(key)
+        if resampled is not None:
+            return resampled
+        group = bars["日期"].dt.to_period(PERIOD_FREQ[period])
+        resampled = (
+            bars.groupby(group, sort=True)
+            .agg(
+                日期=("日期", "max"),
+                股票代码=("股票代码", "first"),
+                开盘=("开盘", "first"),
+                收盘=("收盘", "last"),
+                最高=("最高", "max"),
+                最低=("最低", "min"),
+                成交量=("成交量", "sum"),
+                成交额=("成交额", "sum"),
+                振幅=("振幅", "max"),
+                涨跌幅=("涨跌幅", "sum"),
+                涨跌额=("涨跌额", "sum"),
+                换手率=("换手率", "sum"),
+            )
+            .reset_index(drop=True)
+        )
+        with self.lock:
+            self.cache[key] = resampled
+        return resampled
+
+    def stock_zh_a_hist(
+            self,
+            symbol="000001",
+            period="daily",
+            start_date="19700101",
+            end_date="20500101",
+            adjust="",
+            timeout=None,
+    ):
+        """
+        与 akshare.stock_zh_a_hist 返回结构一致, 日期列为 datetime.date
+        """
+        self.request()
+        bars = self.period_bars(symbol, period, adjust)
+        mask = (bars["日期"] >= pd.Timestamp(start_date)) & (
+                bars["日期"] <= pd.Timestamp(end_date)
+        )
+        df = bars.loc[mask, HIST_COLUMNS].reset_index(drop=True)
+        df["日期"] = df["日期"].dt.date
+        with self.lock:
+            self.rows += df.shape[0]
+        return df
+
+    def tool_trade_date_hist_sina(self):
+        self.request()
+        return pd.DataFrame({"trade_date": self.trade_dates.dt.date})
+
+    def stats(self):
+        return {"http_calls": self.calls, "http_errors": self.errors, "http_rows": self.rows}
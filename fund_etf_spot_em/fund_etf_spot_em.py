@@ -23,6 +23,9 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.dates import to_date_str
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -45,10 +48,12 @@ pd.set_option("display.float_format", lambda x: "%.2f" % x)
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def fund_etf_spot_em() -> pd.DataFrame:
     return akshare.fund_etf_spot_em()
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("数据日期"), 20260101) AS max_date FROM FUND_ETF_SPOT_EM'
@@ -82,7 +87,7 @@ def sync(drop_exist=False, enable_proxy=False):
             )
             df = fund_etf_spot_em()
             if not df.empty:
-                df["数据日期"] = df["数据日期"].apply(lambda x: x.strftime("%Y%m%d"))
+                df["数据日期"] = to_date_str(df["数据日期"])
                 df = df[["代码",
                          "名称",
                          "最新价",
@@ -27,7 +27,10 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.snapshot import invalidate_snapshot
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -49,10 +52,12 @@ pd.set_option("display.float_format", lambda x: "%.2f" % x)
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def fund_name_em() -> pd.DataFrame:
     return akshare.fund_name_em()
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("导入日期"), 19900101) AS max_date FROM FUND_NAME_EM'
@@ -62,17 +67,14 @@ def query_last_sync_date(engine, logger):
 
 
 @lru_cache
-def get_last_friday_date():
+def get_last_week_end_date():
     """
-    获取当前时间的上一个星期五的日期，作为数据的最后周日期
-    如果当前日期小于星期五的16:30:00分，则取上周五的日期，否则取这周五的日期
+    最近一个已收盘交易周的最后一个交易日，作为数据的最后周日期
     """
-    now = datetime.datetime.now()
-    weekday = now.weekday()
-    if weekday < 5 or (weekday == 5 and now.strftime("%H:%M:%S") < "16:30:00"):
-        return str((now - datetime.timedelta(days=weekday + 3)).strftime("%Y%m%d"))
-    else:
-        return str((now - datetime.timedelta(days=weekday - 4)).strftime("%Y%m%d"))
+    # global_data 模块导入本模块, 此处延迟导入
+    from global_data.global_data import GlobalData
+
+    return GlobalData().trade_calendar.last_week_end()
 
 
 # 全量初始化表数据
@@ -90,7 +92,7 @@ def sync(drop_exist=False, enable_proxy=False):
 
         engine = get_engine()
         begin_date = query_last_sync_date(engine, logger)
-        end_date = get_last_friday_date()
+        end_date = get_last_week_end_date()
         if begin_date < end_date:
             logger.info(
                 f"Exec Sync FUND_NAME_EM BeginDate[{begin_date}] EndDate[{end_date}]"
@@ -119,6 +121,7 @@ def sync(drop_exist=False, enable_proxy=False):
                     "fund_name_em",
                     str(datetime.datetime.now().strftime("%Y%m%d")),
                 )
+                invalidate_snapshot("fund_basic_info")
         else:
             logger.info(
                 f"Exec Sync FUND_NAME_EM BeginDate[{begin_date}] EndDate[{end_date}], Early Finished, Skip Sync..."
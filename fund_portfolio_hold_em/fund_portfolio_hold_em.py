@@ -28,7 +28,10 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -51,30 +54,18 @@ pd.set_option("display.float_format", lambda x: "%.2f" % x)
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def fund_portfolio_hold_em(symbol: str = "000001", date: str = "2024") -> pd.DataFrame:
     return akshare.fund_portfolio_hold_em(symbol, date)
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger, fund_code):
     query_start_date = f'SELECT NVL(MAX("最新持仓日期"), 20100331) AS max_date FROM FUND_NAME_EM WHERE "基金代码"=\'{fund_code}\''
     logger.info(f"Execute Query SQL [{query_start_date}]")
     return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
 
 
-@lru_cache
-def get_last_friday_date():
-    """
-    获取当前时间的上一个星期五的日期，作为数据的最后周日期
-    如果当前日期小于星期五的16:30:00分，则取上周五的日期，否则取这周五的日期
-    """
-    now = datetime.datetime.now()
-    weekday = now.weekday()
-    if weekday < 5 or (weekday == 5 and now.strftime("%H:%M:%S") < "16:30:00"):
-        return str((now - datetime.timedelta(days=weekday + 3)).strftime("%Y%m%d"))
-    else:
-        return str((now - datetime.timedelta(days=weekday - 4)).strftime("%Y%m%d"))
-
-
 @lru_cache
 def get_quarter_end_date(text):
     match = re.search(r"(\d{4}).*?([1-4])季度", text)
@@ -187,7 +178,7 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=10):
             exec_sql(update_date_sql)
 
         global_data = GlobalData()
-        fund_info = global_data.fund_basic_info
+        fund_info = shard_filter(global_data.fund_basic_info, "基金代码")
 
         # 构建参数列表
         args = []
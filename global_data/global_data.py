@@ -1,11 +1,15 @@
-from functools import lru_cache
+from functools import cached_property, lru_cache
 
 import pandas as pd
 
 from fund_name_em import fund_name_em
 from global_data import tool_trade_date_hist_sina
 from stock_basic_info import stock_basic_info
+from stock_trade_date import stock_trade_date
+from util.dates import to_date_str
+from util.snapshot import load_snapshot
 from util.tools import get_cfg, get_engine, query_table_is_exist
+from util.trade_calendar import TradeCalendar
 from util.tools import get_logger
 
 
@@ -23,65 +27,100 @@ class GlobalData:
     HKSE|港交所 |
     BSE |北交所 |
 
+    各属性在首次访问时加载并缓存在进程内, 加载结果写入本地快照 (util/snapshot.py), 其他进程在快照有效期内直接读取快照
     """
 
     def __init__(self):
-        self.value = None
-        self._initialized = False
-
-    def __get__(self, instance, owner):
-        if not self._initialized:
-            self.initialize()
-            self._initialized = True
-        return self.value
-
-    cfg = get_cfg()
-    logger = get_logger("global_data", cfg["sync-logging"]["filename"])
-    logger.info("Exec Init Global Shared Data...")
-
-    engine = get_engine()
-
-    stock_basic_table_exist = query_table_is_exist("STOCK_BASIC_INFO")
-    if not stock_basic_table_exist:
-        stock_basic_info.sync(False)
-
-    stock_query_sql = (
-        f'SELECT "证券代码", "证券简称", "交易所", "板块" '
-        f"FROM STOCK_BASIC_INFO sbi "
-        'WHERE "证券简称" NOT LIKE \'ST%%\' AND "证券简称" NOT LIKE \'*ST%%\' AND ("证券代码" < 900000 OR "证券代码" > 920000)'
-        f'ORDER BY "证券代码" ASC'
-    )
-    logger.info(f"Execute SQL [{stock_query_sql}]")
-    stock_basic_info = pd.read_sql(stock_query_sql, engine)
-
-    trade_date_a = list(
-        tool_trade_date_hist_sina()["trade_date"].apply(lambda d: d.strftime("%Y%m%d"))
-    )
-    trade_date_a.sort()
-
-    trade_code_a = stock_basic_info[
-        stock_basic_info["交易所"].isin(["SZSE", "SSE", "BSE"])
-    ]
-
-    """ 加载港股基础信息 """
-    query_hk_ggt_sql = (
-        f'SELECT "证券代码", "证券简称", "交易所"'
-        f"FROM STOCK_HK_GGT_COMPONENTS_EM t "
-        f'ORDER BY "证券代码" ASC'
-    )
-    logger.info(f"Execute SQL [{query_hk_ggt_sql}]")
-    hk_ggt_info = pd.read_sql(query_hk_ggt_sql, engine)
-    trade_code_hk = hk_ggt_info
-
-    """  基金初始化数据    """
-    fund_table_exist = query_table_is_exist("FUND_NAME_EM")
-    if not fund_table_exist:
-        fund_name_em.sync(False)
-
-    fund_query_sql = f'SELECT "基金代码", "基金简称", "基金类型" FROM FUND_NAME_EM ORDER BY "基金代码" ASC'
-    logger.info(f"Execute SQL [{fund_query_sql}]")
-
-    fund_basic_info = pd.read_sql(fund_query_sql, engine)
-
-    def initialize(self):
-        pass
+        cfg = get_cfg()
+        self.logger = get_logger("global_data", cfg["sync-logging"]["filename"])
+
+    @cached_property
+    def stock_basic_info(self):
+        return load_snapshot("stock_basic_info", self.load_stock_basic_info, self.logger)
+
+    @cached_property
+    def trade_code_a(self):
+        return self.stock_basic_info[
+            self.stock_basic_info["交易所"].isin(["SZSE", "SSE", "BSE"])
+        ]
+
+    @cached_property
+    def trade_date_a(self):
+        df = load_snapshot("trade_date_a", self.load_trade_date_a, self.logger)
+        return list(df["trade_date"])
+
+    @cached_property
+    def trade_calendar(self):
+        return TradeCalendar(self.trade_date_a)
+
+    @cached_property
+    def trade_date_hk(self):
+        df = load_snapshot("trade_date_hk", self.load_trade_date_hk, self.logger)
+        return list(df["trade_date"])
+
+    @cached_property
+    def hk_trade_calendar(self):
+        return TradeCalendar(self.trade_date_hk)
+
+    @cached_property
+    def trade_code_hk(self):
+        return load_snapshot("trade_code_hk", self.load_trade_code_hk, self.logger)
+
+    @cached_property
+    def fund_basic_info(self):
+        return load_snapshot("fund_basic_info", self.load_fund_basic_info, self.logger)
+
+    def load_stock_basic_info(self):
+        stock_basic_table_exist = query_table_is_exist("STOCK_BASIC_INFO")
+        if not stock_basic_table_exist:
+            stock_basic_info.sync(False)
+
+        stock_query_sql = (
+            f'SELECT "证券代码", "证券简称", "交易所", "板块" '
+            f"FROM STOCK_BASIC_INFO sbi "
+            'WHERE "证券简称" NOT LIKE \'ST%%\' AND "证券简称" NOT LIKE \'*ST%%\' AND ("证券代码" < 900000 OR "证券代码" > 920000)'
+            f'ORDER BY "证券代码" ASC'
+        )
+        self.logger.info(f"Execute SQL [{stock_query_sql}]")
+        return pd.read_sql(stock_query_sql, get_engine())
+
+    def load_trade_date_a(self):
+        trade_date_a = list(
+            to_date_str(tool_trade_date_hist_sina()["trade_date"])
+        )
+        trade_date_a.sort()
+        return pd.DataFrame({"trade_date": trade_date_a})
+
+    def load_trade_date_hk(self):
+        """ 港股交易日历: STOCK_TRADE_DATE 表中交易所为 HKSE 的交易日期, 表不存在或尚无港股交易日时先同步交易日历 """
+        trade_date_table_exist = query_table_is_exist("STOCK_TRADE_DATE")
+        if not trade_date_table_exist:
+            stock_trade_date.sync(False)
+
+        trade_date_sql = 'SELECT "交易日期" as trade_date FROM STOCK_TRADE_DATE WHERE "交易所"=\'HKSE\' ORDER BY "交易日期" ASC'
+        self.logger.info(f"Execute SQL [{trade_date_sql}]")
+        df = pd.read_sql(trade_date_sql, get_engine())
+        if df.empty and trade_date_table_exist:
+            stock_trade_date.sync(False)
+            df = pd.read_sql(trade_date_sql, get_engine())
+        return pd.DataFrame({"trade_date": df["trade_date"].astype(str)})
+
+    def load_trade_code_hk(self):
+        """ 加载港股基础信息 """
+        query_hk_ggt_sql = (
+            f'SELECT "证券代码", "证券简称", "交易所"'
+            f"FROM STOCK_HK_GGT_COMPONENTS_EM t "
+            f'ORDER BY "证券代码" ASC'
+        )
+        self.logger.info(f"Execute SQL [{query_hk_ggt_sql}]")
+        return pd.read_sql(query_hk_ggt_sql, get_engine())
+
+    def load_fund_basic_info(self):
+        """  基金初始化数据    """
+        fund_table_exist = query_table_is_exist("FUND_NAME_EM")
+        if not fund_table_exist:
+            fund_name_em.sync(False)
+
+        fund_query_sql = f'SELECT "基金代码", "基金简称", "基金类型" FROM FUND_NAME_EM ORDER BY "基金代码" ASC'
+        self.logger.info(f"Execute SQL [{fund_query_sql}]")
+        return pd.read_sql(fund_query_sql, get_engine())
@@ -24,7 +24,10 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.snapshot import invalidate_snapshot
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -47,6 +50,7 @@ pd.set_option("display.float_format", lambda x: "%.2f" % x)
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_info_sh_name_code(symbol: str = "主板A股") -> pd.DataFrame:
     return akshare.stock_info_sh_name_code(symbol)
 
@@ -57,6 +61,7 @@ def stock_info_sh_name_code(symbol: str = "主板A股") -> pd.DataFrame:
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("bse")
 def stock_info_bj_name_code() -> pd.DataFrame:
     return akshare.stock_info_bj_name_code()
 
@@ -67,6 +72,7 @@ def stock_info_bj_name_code() -> pd.DataFrame:
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sina")
 def stock_hk_spot() -> pd.DataFrame:
     return akshare.stock_hk_spot()
 
@@ -78,6 +84,7 @@ def stock_hk_spot() -> pd.DataFrame:
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_info_sh_delist(symbol: str = "全部") -> pd.DataFrame:
     return akshare.stock_info_sh_delist(symbol)
 
@@ -88,10 +95,12 @@ def stock_info_sh_delist(symbol: str = "全部") -> pd.DataFrame:
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("szse")
 def stock_info_sz_name_code(symbol: str = "A股列表") -> pd.DataFrame:
     return akshare.stock_info_sz_name_code(symbol)
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger, market, board):
     query_start_date = f"SELECT NVL(MAX(\"数据日期\"), 19900101) AS max_date FROM STOCK_BASIC_INFO WHERE \"交易所\"='{market}' AND 板块 LIKE '%{board}%'"
     logger.info(f"Execute Query SQL  [{query_start_date}]")
@@ -100,7 +109,7 @@ def query_last_sync_date(engine, logger, market, board):
 
 def sync_stock_sh(engine, logger, market, board):
     start_date = query_last_sync_date(engine, logger, market, board)
-    end_date = get_last_friday_date()
+    end_date = get_last_week_end_date()
     if start_date < end_date:
         logger.info(
             f"Exec Sync STOCK_BASIC_INFO [stock_info_sh_name_code] [上交所]  StartDate[{start_date}] EndDate[{end_date}]"
@@ -144,7 +153,7 @@ def sync_stock_sh(engine, logger, market, board):
 
 def sync_stock_sz(engine, logger, market, board):
     start_date = query_last_sync_date(engine, logger, market, board)
-    end_date = get_last_friday_date()
+    end_date = get_last_week_end_date()
     if start_date < end_date:
         logger.info(
             f"Exec Sync STOCK_BASIC_INFO [stock_info_sz_name_code] [深交所]  StartDate[{start_date}] EndDate[{end_date}]"
@@ -198,7 +207,7 @@ def sync_stock_sz(engine, logger, market, board):
 
 def sync_stock_bse(engine, logger, market, board):
     start_date = query_last_sync_date(engine, logger, market, board)
-    end_date = get_last_friday_date()
+    end_date = get_last_week_end_date()
     if start_date < end_date:
         logger.info(
             f"Exec Sync STOCK_BASIC_INFO [stock_info_bj_name_code] [北交所]  StartDate[{start_date}] EndDate[{end_date}]"
@@ -242,7 +251,7 @@ def sync_stock_bse(engine, logger, market, board):
 
 def sync_stock_hk(engine, logger, market, board):
     start_date = query_last_sync_date(engine, logger, market, board)
-    end_date = get_last_friday_date()
+    end_date = get_last_week_end_date()
     if start_date < end_date:
         logger.info(
             f"Exec Sync STOCK_BASIC_INFO [stock_hk_spot] [港交所]  StartDate[{start_date}] EndDate[{end_date}]"
@@ -291,17 +300,14 @@ def stock_info_code_name() -> pd.DataFrame:
 
 
 @lru_cache
-def get_last_friday_date():
+def get_last_week_end_date():
     """
-    获取当前时间的上一个星期五的日期，作为数据的最后周日期
-    如果当前日期小于星期五的16:30:00分，则取上周五的日期，否则取这周五的日期
+    最近一个已收盘交易周的最后一个交易日，作为数据的最后周日期
     """
-    now = datetime.datetime.now()
-    weekday = now.weekday()
-    if weekday < 5 or (weekday == 5 and now.strftime("%H:%M:%S") < "16:30:00"):
-        return str((now - datetime.timedelta(days=weekday + 3)).strftime("%Y%m%d"))
-    else:
-        return str((now - datetime.timedelta(days=weekday - 4)).strftime("%Y%m%d"))
+    # global_data 模块导入本模块, 此处延迟导入
+    from global_data.global_data import GlobalData
+
+    return GlobalData().trade_calendar.last_week_end()
 
 
 # 全量初始化表数据
@@ -334,6 +340,7 @@ def sync(drop_exist=False, enable_proxy=False):
             "stock_basic_info",
             str(datetime.datetime.now().strftime("%Y%m%d")),
         )
+        invalidate_snapshot("stock_basic_info")
     except Exception:
         logger.error(f"Table [stock_basic_info] Sync Failed", exc_info=True)
         update_sync_log_state_to_failed("stock_basic_info", "stock_basic_info")
@@ -20,21 +20,21 @@ import os
 
 import akshare
 import pandas as pd
-from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
+from global_data.global_data import GlobalData
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.board import plan_boards, query_board_watermarks, sync_boards
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     get_cfg,
     get_logger,
     exec_create_table_script,
     get_engine,
-    save_to_database,
-    exec_sql,
 )
 
 
@@ -44,35 +44,40 @@ from util.tools import (
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_board_concept_cons_em(symbol: str = "融资融券") -> pd.DataFrame:
     return akshare.stock_board_concept_cons_em(symbol)
 
 
-def get_last_friday_date():
-    """
-    获取当前时间的上一个星期五的日期，作为数据的最后周日期
-    如果当前日期小于星期五的16:30:00分，则取上周五的日期，否则取这周五的日期
-    """
-    now = datetime.datetime.now()
-    weekday = now.weekday()
-    if weekday < 5 or (weekday == 5 and now.strftime("%H:%M:%S") < "16:30:00"):
-        return (now - datetime.timedelta(days=weekday + 3)).strftime("%Y%m%d")
-    else:
-        return (now - datetime.timedelta(days=weekday - 4)).strftime("%Y%m%d")
-
-
-def query_last_sync_date(board_code, engine, logger):
-    query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_BOARD_CONCEPT_CONS_EM WHERE "板块代码"=\'{board_code}\''
-    logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
-
-
 def load_board_concept_name(engine, logger):
     board_concept_sql = 'SELECT "板块代码" as board_code, "板块名称" as board_name FROM STOCK_BOARD_CONCEPT_NAME_EM'
     logger.info(f"Execute Query SQL  [{board_concept_sql}]")
     return pd.read_sql(sql=board_concept_sql, con=engine)
 
 
+def fetch_board(board, cur_date, logger):
+    """
+    下载并整理单个板块的当前成份股
+    """
+    logger.info(
+        f"Sync Table[stock_board_concept_cons_em] board_code[{board.board_code}] board_name[{board.board_name}] FromDate[{board.start_date}] ToDate[{cur_date}]"
+    )
+    df = stock_board_concept_cons_em(symbol=board.board_name)
+    if not df.empty:
+        df.loc[:, "板块代码"] = board.board_code
+        df.loc[:, "板块名称"] = board.board_name
+        df.loc[:, "日期"] = cur_date
+        df = df[["日期", "板块代码", "板块名称", "代码", "名称"]]
+        df.columns = [
+            "日期",
+            "板块代码",
+            "板块名称",
+            "证券代码",
+            "证券简称",
+        ]
+    return df
+
+
 def sync(drop_exist=False, enable_proxy=False):
     if enable_proxy:
         from util.proxy import Proxy
@@ -89,59 +94,23 @@ def sync(drop_exist=False, enable_proxy=False):
         board_concepts = load_board_concept_name(engine, logger)
         board_size = len(board_concepts)
 
-        """ 控制更新频率，每周五后更新一次 """
-        last_friday_date = get_last_friday_date()
+        """ 控制更新频率，每周最后一个交易日收盘后更新一次 """
+        last_friday_date = GlobalData().trade_calendar.last_week_end()
         cur_date = datetime.datetime.now().strftime("%Y%m%d")
 
-        for row in board_concepts.itertuples(index=True):
-            index = row.Index
-            board_code = row.board_code
-            board_name = row.board_name
-            last_sync_date = query_last_sync_date(board_code, engine, logger)
-            start_date = (
-                    datetime.datetime.strptime(last_sync_date, "%Y%m%d")
-                    + relativedelta(days=1)
-            ).strftime("%Y%m%d")
-
-            if start_date <= last_friday_date:
-
-                logger.info(
-                    f"Exec [{index}/{board_size}]: Sync Table[stock_board_concept_cons_em] board_code[{board_code}] board_name[{board_name}] FromDate[{start_date}] ToDate[{cur_date}]"
-                )
-                df = stock_board_concept_cons_em(symbol=board_name)
-                if not df.empty:
-                    df.loc[:, "板块代码"] = board_code
-                    df.loc[:, "板块名称"] = board_name
-                    df.loc[:, "日期"] = cur_date
-                    df = df[["日期", "板块代码", "板块名称", "代码", "名称"]]
-                    df.columns = [
-                        "日期",
-                        "板块代码",
-                        "板块名称",
-                        "证券代码",
-                        "证券简称",
-                    ]
-
-                    # 清理历史数据
-                    clean_sql = f"DELETE FROM STOCK_BOARD_CONCEPT_CONS_EM WHERE \"板块代码\"='{board_code}'"
-                    logger.info("Execute Clean SQL [%s]" % clean_sql)
-                    exec_sql(clean_sql)
-
-                    save_to_database(
-                        df,
-                        "stock_board_concept_cons_em",
-                        engine,
-                        index=False,
-                        if_exists="append",
-                        chunksize=20000,
-                    )
-                    logger.info(
-                        f"Write [{df.shape[0]}] records into table [stock_board_concept_cons_em] with [{engine.engine}]"
-                    )
-            else:
-                logger.info(
-                    f"Table [stock_board_concept_cons_em] board_code[{board_code}] board_name[{board_name}] FromDate[{start_date}] ToDate[{last_friday_date}] Early Finished, Skip ..."
-                )
+        watermarks = query_board_watermarks("stock_board_concept_cons_em", engine, logger)
+        boards = plan_boards(board_concepts, watermarks, "19700101", last_friday_date)
+        logger.info(
+            f"Table [stock_board_concept_cons_em] Boards[{board_size}] ToDate[{last_friday_date}] Sync[{len(boards)}] Early Finished[{board_size - len(boards)}]"
+        )
+        sync_boards(
+            "stock_board_concept_cons_em",
+            boards,
+            lambda board: fetch_board(board, cur_date, logger),
+            engine,
+            logger,
+            replace=True,
+        )
         update_sync_log_date(
             "stock_board_concept_cons_em", "stock_board_concept_cons_em", cur_date
         )
@@ -27,6 +27,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -49,10 +51,12 @@ pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_board_concept_name_em() -> pd.DataFrame:
     return akshare.stock_board_concept_name_em()
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_BOARD_CONCEPT_NAME_EM'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
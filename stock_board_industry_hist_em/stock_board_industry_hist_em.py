@@ -16,12 +16,10 @@
 
 """
 
-import datetime
 import os
 
 import akshare
 import pandas as pd
-from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
@@ -29,22 +27,18 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.board import plan_boards, query_board_watermarks, sync_boards
+from util.dates import to_date_str
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     get_cfg,
     get_logger,
     exec_create_table_script,
     get_engine,
-    save_to_database,
 )
 
 
-def query_last_sync_date(board_code, engine, logger):
-    query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_BOARD_INDUSTRY_HIST_EM WHERE "板块代码"=\'{board_code}\''
-    logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
-
-
 def load_board_industry_name(engine, logger):
     board_concept_sql = 'SELECT "板块代码" as board_code, "板块名称" as board_name FROM STOCK_BOARD_INDUSTRY_NAME_EM'
     logger.info(f"Execute Query SQL  [{board_concept_sql}]")
@@ -57,6 +51,7 @@ def load_board_industry_name(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_board_industry_hist_em(
         symbol: str = "小金属",
         start_date: str = "20211201",
@@ -69,6 +64,44 @@ def stock_board_industry_hist_em(
     )
 
 
+def fetch_board(board, end_date, logger):
+    """
+    下载并整理单个板块 start_date 至 end_date 的历史行情
+    """
+    logger.info(
+        f"Sync Table[stock_board_industry_hist_em] board_code[{board.board_code}] board_name[{board.board_name}] FromDate[{board.start_date}] ToDate[{end_date}]"
+    )
+    df = stock_board_industry_hist_em(
+        symbol=board.board_name,
+        period="日k",
+        start_date=board.start_date,
+        end_date=end_date,
+        adjust="",
+    )
+    if not df.empty:
+        df["板块代码"] = board.board_code
+        df["板块名称"] = board.board_name
+        df["日期"] = to_date_str(df["日期"])
+        df = df[
+            [
+                "日期",
+                "板块代码",
+                "板块名称",
+                "开盘",
+                "收盘",
+                "最高",
+                "最低",
+                "涨跌幅",
+                "涨跌额",
+                "成交量",
+                "成交额",
+                "振幅",
+                "换手率",
+            ]
+        ]
+    return df
+
+
 def sync(drop_exist=False, enable_proxy=False):
     if enable_proxy:
         from util.proxy import Proxy
@@ -86,73 +119,21 @@ def sync(drop_exist=False, enable_proxy=False):
         board_size = len(board_industry)
 
         global_data = GlobalData()
-        trade_date_set = global_data.trade_date_a
-        cur_date = (
-            str(datetime.datetime.now().strftime("%Y%m%d"))
-            if datetime.datetime.now().strftime("%H:%M:%S") > "15:30:00"
-            else (datetime.datetime.now() + relativedelta(days=-1)).strftime("%Y%m%d")
+        # 最后一个已收盘交易日 (板块行情 15:30:00 后更新)
+        end_date = global_data.trade_calendar.last_session(cutoff="15:30:00")
+
+        watermarks = query_board_watermarks("stock_board_industry_hist_em", engine, logger)
+        boards = plan_boards(board_industry, watermarks, "19700101", end_date)
+        logger.info(
+            f"Table [stock_board_industry_hist_em] Boards[{board_size}] ToDate[{end_date}] Sync[{len(boards)}] Early Finished[{board_size - len(boards)}]"
+        )
+        sync_boards(
+            "stock_board_industry_hist_em",
+            boards,
+            lambda board: fetch_board(board, end_date, logger),
+            engine,
+            logger,
         )
-        # 最后一个交易日
-        end_date = str(max([d for d in trade_date_set if d < cur_date]))
-
-        for row in board_industry.itertuples(index=True):
-            index = row.Index
-            board_code = row.board_code
-            board_name = row.board_name
-            last_sync_date = query_last_sync_date(board_code, engine, logger)
-            start_date = (
-                    datetime.datetime.strptime(last_sync_date, "%Y%m%d")
-                    + relativedelta(days=1)
-            ).strftime("%Y%m%d")
-
-            if start_date <= end_date:
-                logger.info(
-                    f"Exec [{index}/{board_size}]: Sync Table[stock_board_industry_hist_em] board_code[{board_code}] board_name[{board_name}] FromDate[{start_date}] ToDate[{end_date}]"
-                )
-
-                df = stock_board_industry_hist_em(
-                    symbol=board_name,
-                    period="日k",
-                    start_date=start_date,
-                    end_date=end_date,
-                    adjust="",
-                )
-                if not df.empty:
-                    df["板块代码"] = board_code
-                    df["板块名称"] = board_name
-                    df["日期"] = df["日期"].apply(lambda x: x.replace("-", ""))
-                    df = df[
-                        [
-                            "日期",
-                            "板块代码",
-                            "板块名称",
-                            "开盘",
-                            "收盘",
-                            "最高",
-                            "最低",
-                            "涨跌幅",
-                            "涨跌额",
-                            "成交量",
-                            "成交额",
-                            "振幅",
-                            "换手率",
-                        ]
-                    ]
-                    save_to_database(
-                        df,
-                        "stock_board_industry_hist_em",
-                        engine,
-                        index=False,
-                        if_exists="append",
-                        chunksize=20000,
-                    )
-                    logger.info(
-                        f"Write [{df.shape[0]}] records into table [stock_board_industry_hist_em] with [{engine.engine}]"
-                    )
-            else:
-                logger.info(
-                    f"Table [stock_board_industry_hist_em] board_code[{board_code}] board_name[{board_name}] FromDate[{start_date}] ToDate[{end_date}] Early Finished, Skip ..."
-                )
         update_sync_log_date(
             "stock_board_industry_hist_em", "stock_board_industry_hist_em", end_date
         )
@@ -26,6 +26,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -42,6 +44,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_BOARD_INDUSTRY_NAME_EM'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
@@ -54,6 +57,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_board_industry_name_em() -> pd.DataFrame:
     return akshare.stock_board_industry_name_em()
 
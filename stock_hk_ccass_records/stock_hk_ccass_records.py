@@ -14,33 +14,52 @@
 """
 
 import datetime
+import itertools
 import os
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 
+import oracledb
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 import akshare_local
+from global_data.global_data import GlobalData
+from sync_checkpoint.sync_checkpoint import SyncCheckpoint, mark_done_batch
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util import metrics
 from util.config import get_cfg
 from util.logger import get_logger
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
+    bulk_insert,
     exec_create_table_script,
+    get_connection,
     get_engine,
-    save_to_database_v2,
+    get_write_cfg,
 )
 
 
-def query_last_sync_date(trade_code, engine, logger):
-    query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_HK_CCASS_RECORDS_SUMMARY WHERE "证券代码"=\'{trade_code}\''
+@timed("watermark")
+def query_last_sync_dates(engine, logger):
+    """
+    各证券代码的最大日期 {证券代码: YYYYMMDD}
+    """
+    query_start_date = 'SELECT "证券代码" as trade_code, MAX("日期") as max_date FROM STOCK_HK_CCASS_RECORDS_SUMMARY GROUP BY "证券代码"'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
+    df = pd.read_sql(query_start_date, engine)
+    return {
+        trade_code: str(int(max_date))
+        for trade_code, max_date in zip(df["trade_code"], df["max_date"])
+    }
 
 
 def load_ggt_components(engine, logger):
@@ -49,18 +68,112 @@ def load_ggt_components(engine, logger):
     return pd.read_sql(sql=ggt_components_sql, con=engine)
 
 
+def get_ccass_cfg():
+    cfg = get_cfg()
+    return {
+        "max_workers": cfg.getint("ccass", "max_workers", fallback=4),
+        "flush_rows": cfg.getint("ccass", "flush_rows", fallback=50000),
+    }
+
+
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_incrementing(start=5, increment=5, max=60),
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("hkex")
 def stock_hk_ccass_records(
         symbol: str = "01810", date: str = "20251108"
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     return akshare_local.stock_hk_ccass_records(symbol, date)
 
 
+def fetch_in_order(fetch, tasks, max_workers):
+    """
+    线程池并发下载, 按 tasks 顺序返回 (task, 下载结果); 同时下载的任务数不超过 max_workers * 2, 控制内存占用
+    某个任务下载失败时取消未开始的任务并抛出异常, 此前的任务结果均已返回
+    """
+    tasks = iter(tasks)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for task in itertools.islice(tasks, max_workers * 2):
+                pending.append((task, executor.submit(fetch, *task)))
+            while pending:
+                task, future = pending.popleft()
+                result = future.result()
+                for next_task in itertools.islice(tasks, 1):
+                    pending.append((next_task, executor.submit(fetch, *next_task)))
+                yield task, result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+class CcassWriter:
+    """
+    中央结算系统持股记录缓冲写入
+    1. 累积多个 (证券代码, 日期) 的下载结果, 明细记录数达到 flush_rows 时合并为一个事务写入, 每次写入仅提交一次
+    2. 汇总表及明细表使用 oracledb 数组绑定批量写入 (bulk_insert)
+    3. 证券代码的最后一个日期写入后, 在同一事务内将该证券代码标记为已同步至 end_date (SYNC_CHECKPOINT 目标日期), 与其他表的检查点语义一致;
+       进程中途退出时数据与检查点同时回滚, 下次同步仍从表中最大日期继续
+    """
+
+    def __init__(self, flush_rows, end_date, logger):
+        self.flush_rows = flush_rows
+        self.end_date = end_date
+        self.logger = logger
+        self.summaries = []
+        self.bodies = []
+        self.done_codes = []
+        self.rows = 0
+
+    def add(self, trade_code, summary, body, last=False):
+        """
+        缓存单个 (证券代码, 日期) 的下载结果, 按证券代码、日期升序调用, last 表示该证券代码的最后一个日期
+        """
+        if (not summary.empty) and (not body.empty):
+            self.summaries.append(summary)
+            self.bodies.append(body)
+            self.rows += body.shape[0]
+        if last:
+            self.done_codes.append(trade_code)
+        if self.rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.summaries and not self.done_codes:
+            return
+        summary = pd.concat(self.summaries, ignore_index=True) if self.summaries else pd.DataFrame()
+        body = pd.concat(self.bodies, ignore_index=True) if self.bodies else pd.DataFrame()
+        _, batch_size = get_write_cfg()
+        metrics.count("rows_written", summary.shape[0] + body.shape[0])
+        with metrics.timer("db_write"):
+            conn = get_connection()
+            try:
+                bulk_insert(summary, "stock_hk_ccass_records_summary", conn, batch_size)
+                bulk_insert(body, "stock_hk_ccass_records", conn, batch_size)
+                mark_done_batch(
+                    conn,
+                    "STOCK_HK_CCASS_RECORDS",
+                    [(trade_code, self.end_date) for trade_code in self.done_codes],
+                )
+                conn.commit()
+            except oracledb.DatabaseError:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        self.logger.info(
+            f"Write [{summary.shape[0]}/{body.shape[0]}] records into table [stock_hk_ccass_records_summary/stock_hk_ccass_records] DoneSymbols[{len(self.done_codes)}] Pages[{len(self.summaries)}]"
+        )
+        self.summaries = []
+        self.bodies = []
+        self.done_codes = []
+        self.rows = 0
+
+
 def sync(drop_exist=False, enable_proxy=False):
     if enable_proxy:
         from util.proxy import Proxy
@@ -74,59 +187,66 @@ def sync(drop_exist=False, enable_proxy=False):
         exec_create_table_script(dir_path, drop_exist, logger)
 
         engine = get_engine()
-        ggt_components = load_ggt_components(engine, logger)
+        ggt_components = shard_filter(load_ggt_components(engine, logger), "trade_code")
         ggt_size = len(ggt_components)
 
         end_date = (datetime.datetime.now() - relativedelta(days=1)).strftime("%Y%m%d")
-        for row in ggt_components.itertuples(index=True):
-            index = row.Index
-            trade_code = row.trade_code
-            trade_name = row.trade_name
-            last_sync_date = query_last_sync_date(trade_code, engine, logger)
+        # 中央结算系统持股记录仅保留最近一年
+        min_date = (datetime.datetime.now() - relativedelta(years=1)).strftime("%Y%m%d")
+        hk_trade_calendar = GlobalData().hk_trade_calendar
+        last_sync_dates = query_last_sync_dates(engine, logger)
+        # 同步水位以表中最大日期为准, 检查点仅用于跳过本次目标日期内已同步完成的证券代码
+        checkpoint = SyncCheckpoint("STOCK_HK_CCASS_RECORDS", end_date).load(logger)
+
+        # 逐个证券代码按港股交易日排列下载任务, 跳过非交易日
+        tasks = []
+        for row in ggt_components.itertuples(index=False):
+            if not checkpoint.is_pending(row.trade_code):
+                continue
             begin_date = max(
                 (
-                        datetime.datetime.strptime(last_sync_date, "%Y%m%d")
+                        datetime.datetime.strptime(last_sync_dates.get(row.trade_code, "19700101"), "%Y%m%d")
                         + relativedelta(days=1)
                 ).strftime("%Y%m%d"),
-                (datetime.datetime.now() - relativedelta(years=1)).strftime("%Y%m%d"),
+                min_date,
             )
-
-            if begin_date <= end_date:
-                date_list = pd.date_range(
-                    start=begin_date, end=end_date, freq="B"
-                )  # freq="B" 指工作日周一到周五
-                for date in date_list:
-                    trade_date = date.strftime("%Y%m%d")
-                    logger.info(
-                        f"Exec [{index}/{ggt_size}] [{trade_date}/{end_date}]: Sync Table[stock_hk_ccass_records] trade_code[{trade_code}] trade_name[{trade_name}] Date[{trade_date}]"
-                    )
-                    summary, body = stock_hk_ccass_records(trade_code, trade_date)
-                    if (not summary.empty) and (not body.empty):
-                        save_to_database_v2(
-                            summary,
-                            body,
-                            "stock_hk_ccass_records_summary",
-                            "stock_hk_ccass_records",
-                            engine,
-                            index=False,
-                            if_exists="append",
-                            chunksize=20000,
-                        )
-                        logger.info(
-                            f"Write [{summary.shape[0]}] records into table [stock_hk_ccass_records_summary] with [{engine.engine}]"
-                        )
-                        logger.info(
-                            f"Write [{body.shape[0]}] records into table [stock_hk_ccass_records] with [{engine.engine}]"
-                        )
-                    else:
-                        logger.info(
-                            f"Exec [{index}/{ggt_size}] [{trade_date}/{end_date}]: Sync Table[stock_hk_ccass_records] trade_code[{trade_code}] trade_name[{trade_name}] Date[{trade_date}] is Empty ..."
-                        )
-                    time.sleep(10)
+            dates = hk_trade_calendar.range(begin_date, end_date)
+            if dates:
+                tasks.extend(
+                    (row.trade_code, row.trade_name, trade_date, trade_date == dates[-1]) for trade_date in dates
+                )
             else:
                 logger.info(
-                    f"Table [stock_hk_ccass_records] trade_code[{trade_code}] trade_name[{trade_name}] FromDate[{begin_date}] ToDate[{end_date}], Skip ..."
+                    f"Table [stock_hk_ccass_records] trade_code[{row.trade_code}] trade_name[{row.trade_name}] FromDate[{begin_date}] ToDate[{end_date}], Skip ..."
+                )
+
+        ccass_cfg = get_ccass_cfg()
+        max_workers = ccass_cfg["max_workers"]
+        logger.info(
+            f"Sync Table[stock_hk_ccass_records] Symbols[{ggt_size}] Tasks[{len(tasks)}] ToDate[{end_date}] Workers[{max_workers}]"
+        )
+
+        def fetch(trade_code, trade_name, trade_date, last):
+            return stock_hk_ccass_records(trade_code, trade_date)
+
+        # 按 (证券代码, 日期) 顺序缓冲写入, 中途失败时先写入已下载的结果, 各证券代码已写入的日期连续, 下次同步从表中最大日期继续
+        writer = CcassWriter(ccass_cfg["flush_rows"], end_date, logger)
+        task_size = len(tasks)
+        try:
+            for index, (task, (summary, body)) in enumerate(fetch_in_order(fetch, tasks, max_workers)):
+                trade_code, trade_name, trade_date, last = task
+                logger.info(
+                    f"Exec [{index + 1}/{task_size}]: Fetch Table[stock_hk_ccass_records] trade_code[{trade_code}] trade_name[{trade_name}] Date[{trade_date}] Records[{body.shape[0]}]"
                 )
+                writer.add(trade_code, summary, body, last)
+        except Exception:
+            # 写入失败不得覆盖原始异常
+            try:
+                writer.flush()
+            except Exception:
+                logger.error(f"Table [stock_hk_ccass_records] Flush Failed", exc_info=True)
+            raise
+        writer.flush()
         update_sync_log_date(
             "stock_hk_ccass_records", "stock_hk_ccass_records", end_date
         )
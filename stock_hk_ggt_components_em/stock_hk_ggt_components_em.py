@@ -28,7 +28,10 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.snapshot import invalidate_snapshot
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -45,6 +48,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = f'SELECT NVL(MAX("数据日期"), 19900101) as max_date FROM STOCK_HK_GGT_COMPONENTS_EM'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
@@ -57,6 +61,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_hk_ggt_components_em() -> pd.DataFrame:
     return akshare.stock_hk_ggt_components_em()
 
@@ -113,6 +118,7 @@ def sync(drop_exist=False, enable_proxy=False):
                     "stock_hk_ggt_components_em",
                     f"{end_date}",
                 )
+                invalidate_snapshot("trade_code_hk")
 
         else:
             logger.info(
@@ -15,18 +15,21 @@
 
 import datetime
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 import akshare_local
-from akshare_local import split_date_range
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.snapshot import load_snapshot
 from util.tools import (
     get_cfg,
     get_logger,
@@ -36,6 +39,7 @@ from util.tools import (
 )
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 20120820) as max_date FROM STOCK_HK_SHORT_SALE'
@@ -59,18 +63,34 @@ def get_last_week_friday_date():
     before_sleep=log_retry_stats,
     reraise=True,
 )
-def stock_hk_short_sale(
-        start_date: str = "20120801", end_date: str = "20900101"
-) -> pd.DataFrame:
-    return akshare_local.stock_hk_short_sale(start_date, end_date)
+@rate_limited("sfc")
+def get_stock_short_sale_hk_report_list() -> pd.DataFrame:
+    return akshare_local.get_stock_short_sale_hk_report_list()
 
 
-"""
-执行数据下载同步
-"""
+@retry(
+    stop=stop_after_attempt(10),
+    wait=wait_incrementing(start=5, increment=5, max=60),
+    before_sleep=log_retry_stats,
+    reraise=True,
+)
+@rate_limited("sfc")
+def get_stock_short_sale_hk_report(url: str) -> pd.DataFrame:
+    return akshare_local.get_stock_short_sale_hk_report(url)
+
+
+def load_report_list(logger):
+    """
+    港股证监会卖空报告列表 (每周更新), 写入本地快照, 快照有效期内不再重复获取报告列表页面
+    """
+    return load_snapshot(
+        "stock_hk_short_sale_report_list",
+        get_stock_short_sale_hk_report_list,
+        logger,
+    )
 
 
-def sync(drop_exist=False, enable_proxy=False):
+def sync(drop_exist=False, enable_proxy=False, max_workers=4):
     if enable_proxy:
         from util.proxy import Proxy
         Proxy.enable_proxy()
@@ -92,17 +112,20 @@ def sync(drop_exist=False, enable_proxy=False):
         end_date = get_last_week_friday_date()
 
         if begin_date <= end_date:
-            date_ranges = split_date_range(begin_date, end_date, freq="70D")
-            for i, (batch_start, batch_end) in enumerate(date_ranges, 1):
-                logger.info(
-                    f"Exec Sync STOCK_SHORT_SALE_HK Batch[{i}]: StartDate[{batch_start}] EndDate[{batch_end}] "
-                )
-
-                df = stock_hk_short_sale(start_date=batch_start, end_date=batch_end)
-                logger.info(
-                    f"Write [{df.shape[0]}] records into table [stock_hk_short_sale] with [{engine.engine}]"
-                )
-
+            report_list = load_report_list(logger)
+            report_list = report_list[
+                (report_list["报告日期"] >= begin_date) & (report_list["报告日期"] <= end_date)
+                ]
+            logger.info(
+                f"Exec Sync STOCK_SHORT_SALE_HK Reports[{len(report_list)}]: StartDate[{begin_date}] EndDate[{end_date}] Workers[{max_workers}]"
+            )
+
+            # 各周报告 CSV 并发下载 (每个线程复用一个 HTTP 会话), 按报告日期顺序合并后一次写入
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                df_list = list(executor.map(get_stock_short_sale_hk_report, report_list["文件地址"]))
+
+            if df_list:
+                df = pd.concat(df_list, ignore_index=True)
                 number_cols = ["日期", "证券代码", "淡仓股数", "淡仓金额"]
                 df[number_cols] = df[number_cols].apply(pd.to_numeric, errors="coerce")
 
@@ -114,8 +137,15 @@ def sync(drop_exist=False, enable_proxy=False):
                     if_exists="append",
                     chunksize=20000,
                 )
+                logger.info(
+                    f"Write [{df.shape[0]}] records into table [stock_hk_short_sale] with [{engine.engine}]"
+                )
                 update_sync_log_date(
-                    "stock_hk_short_sale", "stock_hk_short_sale", batch_end
+                    "stock_hk_short_sale", "stock_hk_short_sale", report_list["报告日期"].iloc[-1]
+                )
+            else:
+                logger.info(
+                    f"Table [stock_hk_short_sale] No Report Between [{begin_date}] And [{end_date}], Skip ..."
                 )
         else:
             logger.info("Table [stock_hk_short_sale] Early Synced, Skip ...")
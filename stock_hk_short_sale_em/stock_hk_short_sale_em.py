@@ -27,6 +27,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     get_cfg,
@@ -43,6 +45,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)
 
 
+@timed("watermark")
 def query_last_sync_date(trade_code, engine, logger):
     query_start_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_HK_SHORT_SALE_EM where "证券代码"={trade_code}'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
@@ -60,6 +63,7 @@ def query_last_sync_date(trade_code, engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_hk_short_sale_em(
         symbol: str = "01810", start_date: str = "20120801", end_date: str = "20900101"
 ) -> pd.DataFrame:
@@ -80,14 +84,12 @@ def sync(drop_exist=False, enable_proxy=False):
 
         engine = get_engine()
 
-        end_date = (
-            str(datetime.datetime.now().strftime("%Y%m%d"))
-            if datetime.datetime.now().strftime("%H:%M:%S") > "16:30:00"
-            else (datetime.datetime.now() + relativedelta(days=-1)).strftime("%Y%m%d")
-        )
-
         # 查询交易股票列表
         global_data = GlobalData()
+        # 最近一个已收盘的港股交易日
+        hk_trade_calendar = global_data.hk_trade_calendar
+        end_date = hk_trade_calendar.last_session()
+
         trade_code_list = global_data.trade_code_hk
         # trade_code_list = trade_code_list[trade_code_list["证券代码"]=='01810']
         for row_idx in range(trade_code_list.shape[0]):
@@ -104,7 +106,8 @@ def sync(drop_exist=False, enable_proxy=False):
                 (datetime.datetime.now() - relativedelta(years=1)).strftime("%Y%m%d"),
             )
 
-            if start_date <= end_date:
+            # 区间内无港股交易日 (如周末、公众假期) 时跳过
+            if hk_trade_calendar.range(start_date, end_date):
                 logger.info(
                     f"Execute Sync stock_hk_short_sale_em  trade_code[{trade_code}] trade_name[{trade_name}] from [{start_date}] to [{end_date}]"
                 )
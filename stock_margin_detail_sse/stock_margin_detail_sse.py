@@ -15,7 +15,6 @@
 
 import datetime
 import os
-from time import sleep
 
 import akshare
 import pandas as pd
@@ -27,6 +26,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -43,6 +44,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 20140101) as max_date FROM STOCK_MARGIN_DETAIL_SSE'
@@ -57,6 +59,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_margin_detail_sse(date: str = "20230922") -> pd.DataFrame:
     return akshare.stock_margin_detail_sse(date)
 
@@ -84,8 +87,7 @@ def sync(drop_exist=False, enable_proxy=False):
         )
 
         global_data = GlobalData()
-        trade_date_set = global_data.trade_date_a
-        date_set = [d for d in trade_date_set if (end_date > d >= start_date)]
+        date_set = global_data.trade_calendar.range(start_date, end_date, closed="left")
         if len(date_set) > 0:
             for date in date_set:
                 logger.info(f"Exec Sync STOCK_MARGIN_DETAIL_SSE Date[{date}]")
@@ -117,7 +119,6 @@ def sync(drop_exist=False, enable_proxy=False):
                 update_sync_log_date(
                     "stock_margin_detail_sse", "stock_margin_detail_sse", f"{str(date)}"
                 )
-                sleep(2)
         else:
             logger.info(
                 f"Execute Sync stock_margin_detail_sse from [{start_date}] to [{end_date}], Skip Sync ... "
@@ -27,6 +27,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -43,6 +45,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 20130101) as max_date FROM STOCK_MARGIN_SSE'
@@ -57,6 +60,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_margin_sse(
         start_date: str = "20010106", end_date: str = "20230922"
 ) -> pd.DataFrame:
@@ -83,13 +87,12 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
         end_date = datetime.datetime.now().strftime("%Y%m%d")
 
         global_data = GlobalData()
-        trade_date_set = global_data.trade_date_a
 
         if start_date < end_date:
 
             date_ranges = split_date_range(start_date, end_date, freq="365D")
             for i, (start, end) in enumerate(date_ranges, 1):
-                date_set = [d for d in trade_date_set if (end >= d >= start)]
+                date_set = global_data.trade_calendar.range(start, end)
                 if len(date_set) > 0:
                     batch_start = min(date_set)
                     batch_end = max(date_set)
@@ -15,7 +15,6 @@
 
 import datetime
 import os
-from time import sleep
 
 import akshare
 import pandas as pd
@@ -32,6 +31,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -48,6 +49,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 20130101) as max_date FROM STOCK_MARGIN_SZSE'
@@ -63,6 +65,7 @@ def query_last_sync_date(engine, logger):
     reraise=True,
     retry=retry_if_not_exception_type(ValueError),
 )
+@rate_limited("szse")
 def stock_margin_szse(date: str = "20240411") -> pd.DataFrame:
     return akshare.stock_margin_szse(date)
 
@@ -97,8 +100,7 @@ def sync(drop_exist=False, enable_proxy=False):
             )
 
             global_data = GlobalData()
-            trade_date_set = global_data.trade_date_a
-            date_set = [str(d) for d in trade_date_set if (end_date > d >= start_date)]
+            date_set = global_data.trade_calendar.range(start_date, end_date, closed="left")
 
             for date in date_set:
                 logger.info(f"Exec Sync STOCK_MARGIN_SZSE Date[{date}]")
@@ -131,7 +133,6 @@ def sync(drop_exist=False, enable_proxy=False):
                 update_sync_log_date(
                     "stock_margin_szse", "stock_margin_szse", f"{str(date)}"
                 )
-                sleep(1)
         else:
             logger.info(
                 f"Execute Sync stock_margin_szse from [{start_date}] to [{end_date}], Skip Sync ... "
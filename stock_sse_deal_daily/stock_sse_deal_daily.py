@@ -15,12 +15,10 @@
 
 """
 
-import datetime
 import os
 
 import akshare
 import pandas as pd
-from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
@@ -28,6 +26,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -44,6 +44,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 19900101) as max_date FROM STOCK_SSE_DEAL_DAILY'
@@ -58,6 +59,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_sse_deal_daily(date: str = "20241216") -> pd.DataFrame:
     return akshare.stock_sse_deal_daily(date)
 
@@ -76,16 +78,11 @@ def sync(drop_exist=False, enable_proxy=False):
         engine = get_engine()
         query_start_date = query_last_sync_date(engine, logger)
         start_date = str(max(query_start_date, "20211231"))
-        end_date = (
-            str(datetime.datetime.now().strftime("%Y%m%d"))
-            if datetime.datetime.now().strftime("%H:%M:%S") > "16:30:00"
-            else (datetime.datetime.now() + relativedelta(days=-1)).strftime("%Y%m%d")
-        )
 
-        # 查询交易日历
+        # 查询交易日历, 结束日期: 16:30:00 前取上一个交易日，否则取当天之前(含)的最后一个交易日
         global_data = GlobalData()
-        trade_date = global_data.trade_date_a
-        date_list = [date for date in trade_date if start_date < date <= end_date]
+        end_date = global_data.trade_calendar.last_session()
+        date_list = global_data.trade_calendar.range(start_date, end_date, closed="right")
         if len(date_list) > 0:
             logger.info(
                 f"Execute Sync stock_szse_summary From Date[{start_date}] to Date[{end_date}]"
@@ -25,6 +25,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -41,6 +43,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 19900101) as max_date FROM STOCK_SSE_SUMMARY'
@@ -55,6 +58,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sse")
 def stock_sse_summary() -> pd.DataFrame:
     return akshare.stock_sse_summary()
 
@@ -75,11 +79,8 @@ def sync(drop_exist=False, enable_proxy=False):
         start_date = query_last_sync_date(engine, logger)
 
         global_data = GlobalData()
-        trade_date_set = global_data.trade_date_a
         cur_date = str(datetime.datetime.now().strftime("%Y%m%d"))
-        end_date = str(
-            max([d for d in trade_date_set if d < cur_date])
-        )  # 最后一个交易日
+        end_date = global_data.trade_calendar.last_before(cur_date)  # 最后一个交易日
 
         if start_date < end_date:
             dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
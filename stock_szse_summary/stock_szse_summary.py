@@ -30,6 +30,8 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -46,6 +48,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     query_start_date = (
         f'SELECT NVL(MAX("日期"), 19900101) as max_date FROM STOCK_SZSE_SUMMARY'
@@ -60,6 +63,7 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("szse")
 def stock_szse_summary(date: str) -> pd.DataFrame:
     return akshare.stock_szse_summary(date)
 
@@ -77,13 +81,12 @@ def sync(drop_exist=False, enable_proxy=False):
 
         # 查询交易日历
         global_data = GlobalData()
-        trade_date_set = global_data.trade_date_a
         engine = get_engine()
 
         last_sync_date = query_last_sync_date(engine, logger)
         start_date = str(max(last_sync_date, "20100101"))
         end_date = str(datetime.datetime.now().strftime("%Y%m%d"))
-        date_list = [date for date in trade_date_set if start_date < date <= end_date]
+        date_list = global_data.trade_calendar.range(start_date, end_date, closed="right")
         logger.info(
             f"Execute Sync stock_szse_summary From Date[{start_date}] to Date[{end_date}]"
         )
@@ -5,7 +5,7 @@
 # @Author  : PcLiu
 # @FileName: stock_trade_date.py
 ===========================
-描述: 股票交易日历 - A 股票
+描述: 股票交易日历 - A 股票 (SSE/SZSE/BSE), 港股 (HKSE)
 目标表名:  stock_trade_date
 """
 
@@ -21,7 +21,11 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.dates import to_date_number
+from util.metrics import timed
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.snapshot import invalidate_snapshot
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -31,12 +35,18 @@ from util.tools import (
 )
 
 
-def query_last_sync_date(engine, logger):
-    query_start_date = (
-        f'SELECT NVL(MAX("交易日期"), 19900101) as max_date FROM STOCK_TRADE_DATE'
-    )
+@timed("watermark")
+def query_last_sync_dates(engine, logger):
+    """
+    各交易所的最大交易日期 {交易所: YYYYMMDD}
+    """
+    query_start_date = 'SELECT "交易所" as exchange, MAX("交易日期") as max_date FROM STOCK_TRADE_DATE GROUP BY "交易所"'
     logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
+    df = pd.read_sql(query_start_date, engine)
+    return {
+        exchange: str(int(max_date))
+        for exchange, max_date in zip(df["exchange"], df["max_date"])
+    }
 
 
 # 全量初始化表数据
@@ -46,10 +56,81 @@ def query_last_sync_date(engine, logger):
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("sina")
 def tool_trade_date_hist_sina() -> pd.DataFrame:
     return akshare.tool_trade_date_hist_sina()
 
 
+@retry(
+    stop=stop_after_attempt(10),
+    wait=wait_incrementing(start=5, increment=5, max=60),
+    before_sleep=log_retry_stats,
+    reraise=True,
+)
+@rate_limited("sina")
+def stock_hk_index_daily_sina(symbol: str = "HSI") -> pd.DataFrame:
+    return akshare.stock_hk_index_daily_sina(symbol)
+
+
+def sync_trade_date_a(last_date, cur_date, engine, logger):
+    """
+    A 股交易日历 (新浪), 上交所、深交所、北交所各保存一份
+    """
+    trade_date = tool_trade_date_hist_sina()
+    trade_date["trade_date"] = to_date_number(trade_date["trade_date"])
+    sse = pd.DataFrame(
+        {"exchange": "SSE", "trade_date": trade_date["trade_date"]}
+    )
+    szse = pd.DataFrame(
+        {"exchange": "SZSE", "trade_date": trade_date["trade_date"]}
+    )
+    bse = pd.DataFrame(
+        {"exchange": "BSE", "trade_date": trade_date["trade_date"]}
+    )
+    df = pd.concat([sse, szse, bse])
+    df.columns = ["交易所", "交易日期"]
+    df["数据日期"] = cur_date
+    df = df[["交易所", "交易日期", "数据日期"]]
+    df = df[df["交易日期"] > int(last_date)]
+    save_to_database(
+        df,
+        "stock_trade_date",
+        engine,
+        index=False,
+        if_exists="append",
+        chunksize=20000,
+    )
+    logger.info(
+        f"Execute Sync stock_trade_date Exchange[SSE/SZSE/BSE] Date[{cur_date}]"
+        + f" Write[{df.shape[0]}] Records"
+    )
+    invalidate_snapshot("trade_date_a")
+
+
+def sync_trade_date_hk(last_date, cur_date, engine, logger):
+    """
+    港股交易日历: 恒生指数日线的交易日期 (仅包含已收盘交易日), 交易所为 HKSE
+    """
+    trade_date = to_date_number(stock_hk_index_daily_sina("HSI")["date"])
+    df = pd.DataFrame({"交易所": "HKSE", "交易日期": trade_date})
+    df["数据日期"] = cur_date
+    df = df[df["交易日期"] > int(last_date)]
+    if not df.empty:
+        save_to_database(
+            df,
+            "stock_trade_date",
+            engine,
+            index=False,
+            if_exists="append",
+            chunksize=20000,
+        )
+        invalidate_snapshot("trade_date_hk")
+    logger.info(
+        f"Execute Sync stock_trade_date Exchange[HKSE] Date[{cur_date}]"
+        + f" Write[{df.shape[0]}] Records"
+    )
+
+
 def sync(drop_exist=False, enable_proxy=False):
     if enable_proxy:
         from util.proxy import Proxy
@@ -62,45 +143,27 @@ def sync(drop_exist=False, enable_proxy=False):
         dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
         exec_create_table_script(dir_path, drop_exist, logger)
 
-        last_date = query_last_sync_date(engine, logger)
+        last_dates = query_last_sync_dates(engine, logger)
         cur_date = datetime.datetime.now().date().strftime("%Y%m%d")
 
+        # 新浪 A 股交易日历包含当年剩余交易日, 最大交易日期早于今天时更新
+        last_date = min(last_dates.get(exchange, "19900101") for exchange in ("SSE", "SZSE", "BSE"))
         if last_date < cur_date:
-            trade_date = tool_trade_date_hist_sina()
-            trade_date["trade_date"] = trade_date["trade_date"].apply(
-                lambda d: int(d.strftime("%Y%m%d"))
-            )
-            sse = pd.DataFrame(
-                {"exchange": "SSE", "trade_date": trade_date["trade_date"]}
-            )
-            szse = pd.DataFrame(
-                {"exchange": "SZSE", "trade_date": trade_date["trade_date"]}
-            )
-            bse = pd.DataFrame(
-                {"exchange": "BSE", "trade_date": trade_date["trade_date"]}
-            )
-            df = pd.concat([sse, szse, bse])
-            df.columns = ["交易所", "交易日期"]
-            df["数据日期"] = cur_date
-            df = df[["交易所", "交易日期", "数据日期"]]
-            df = df[df["交易日期"] > int(last_date)]
-            save_to_database(
-                df,
-                "stock_trade_date",
-                engine,
-                index=False,
-                if_exists="append",
-                chunksize=20000,
-            )
+            sync_trade_date_a(last_date, cur_date, engine, logger)
+        else:
             logger.info(
-                f"Execute Sync stock_trade_date Date[{cur_date}]"
-                + f" Write[{df.shape[0]}] Records"
+                f"Execute Sync stock_trade_date Exchange[SSE/SZSE/BSE] Date[{cur_date}], Skip Sync ... "
             )
-            update_sync_log_date("stock_trade_date", "stock_trade_date", f"{cur_date}")
+
+        # 港股交易日历仅包含已收盘交易日, 每次同步追加新增交易日
+        last_date_hk = last_dates.get("HKSE", "19900101")
+        if last_date_hk < cur_date:
+            sync_trade_date_hk(last_date_hk, cur_date, engine, logger)
         else:
             logger.info(
-                f"Execute Sync stock_trade_date  Date[{cur_date}], Skip Sync ... "
+                f"Execute Sync stock_trade_date Exchange[HKSE] Date[{cur_date}], Skip Sync ... "
             )
+        update_sync_log_date("stock_trade_date", "stock_trade_date", f"{cur_date}")
 
     except Exception as e:
         logger.error(
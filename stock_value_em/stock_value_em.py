@@ -13,7 +13,6 @@ https://data.eastmoney.com/gzfx/detail/300766.html
 限量: 单次返回指定沪深京 A 股上市公司指定日期的估值数据
 """
 
-import datetime
 import os
 
 import pandas as pd
@@ -25,6 +24,9 @@ from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.metrics import timed
+from util.ratelimit import rate_limited
+from util.response_cache import cached_response, is_before_today
 from util.retry import log_retry_stats
 from util.tools import (
     exec_create_table_script,
@@ -41,6 +43,7 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
+@timed("watermark")
 def query_last_sync_date(engine, logger):
     """
     查询上次同步的数据截止时间
@@ -52,12 +55,14 @@ def query_last_sync_date(engine, logger):
     return str(pd.read_sql(query_last_date, engine).iloc[0, 0])
 
 
+@cached_response("stock_value_em_by_date", immutable=lambda trade_date: is_before_today(trade_date))
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_incrementing(start=5, increment=5, max=60),
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_value_em_by_date(trade_date: str = "20251110") -> pd.DataFrame:
     return akshare_local.stock_value_em_by_date(trade_date)
 
@@ -77,17 +82,11 @@ def sync(drop_exist=False, enable_proxy=False):
         engine = get_engine()
 
         start_date = query_last_sync_date(engine, logger)
-        now = datetime.datetime.now()
-        end_date = (
-            (now - datetime.timedelta(days=1)).strftime("%Y%m%d")
-            if now.strftime("%H:%M:%S") < "16:30:00"
-            else now.strftime("%Y%m%d")
-        )
-
-        # 查询交易股票日历列表
+
+        # 查询交易股票日历列表, 结束日期: 16:30:00 前取上一个交易日，否则取当天之前(含)的最后一个交易日
         global_data = GlobalData()
-        trade_date_list = global_data.trade_date_a
-        date_list = [date for date in trade_date_list if start_date < date <= end_date]
+        end_date = global_data.trade_calendar.last_session()
+        date_list = global_data.trade_calendar.range(start_date, end_date, closed="right")
 
         if len(date_list) > 0:
             logger.info(
@@ -24,11 +24,14 @@ import pandas as pd
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
+from sync_checkpoint.sync_checkpoint import SyncCheckpoint
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.ratelimit import rate_limited
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -37,6 +40,7 @@ from util.tools import (
     exec_sql,
     save_to_database,
 )
+from util.watermark import SyncWatermark
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
@@ -45,50 +49,12 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
-def query_last_sync_info(trade_code, engine, logger):
+def get_end_date(trade_calendar) -> str:
     """
-    查询上次同步的数据截止时间
-    查询上次同步数据的结果数据，检测数据是否发生变动，来判断是否需要重新同步
+    同步截止时间: 最近一个已收盘交易日 (16:30:00 前取上一个交易日) 的 15:00:00
     """
-    result = []
-    query_last_date = f"SELECT TO_CHAR(NVL(MAX(\"时间\"), SYSDATE - 50 ), 'YYYY-MM-DD HH24:MI:SS') as max_date FROM STOCK_ZH_A_HIST_30MIN_HFQ WHERE \"股票代码\"='{trade_code}'"
-    logger.info(f"Execute Query SQL  [{query_last_date}]")
-    last_date = str(pd.read_sql(query_last_date, engine).iloc[0, 0])
-    result.append(last_date)
-
-    query_last_close = f"SELECT \"收盘\" FROM STOCK_ZH_A_HIST_30MIN_HFQ WHERE \"股票代码\"='{trade_code}' AND \"时间\"=TO_DATE('{last_date}', 'YYYY-MM-DD HH24:MI:SS')"
-    logger.info(f"Execute Query SQL  [{query_last_close}]")
-    last_close = pd.read_sql(query_last_close, engine)
-    if last_close.shape[0] > 0:
-        result.append(last_close.iloc[0, 0])
-    else:
-        result.append(None)
-
-    return result
-
-
-def get_end_date(trade_date_list) -> str:
-    now = datetime.datetime.now()
-    if now.strftime("%H:%M:%S") > "16:30:00":
-        until_date = now.strftime("%Y%m%d")
-        date_list = [date for date in trade_date_list if date <= until_date]
-        return (
-                datetime.datetime.strptime(max(date_list), "%Y%m%d").strftime("%Y-%m-%d")
-                + " 15:00:00"
-        )
-    elif now.strftime("%H:%M:%S") < "9:30:00":
-        until_date = (now - datetime.timedelta(days=1)).strftime("%Y%m%d")
-        date_list = [date for date in trade_date_list if date <= until_date]
-        return (
-                datetime.datetime.strptime(max(date_list), "%Y%m%d").strftime("%Y-%m-%d")
-                + " 15:00:00"
-        )
-    else:
-        now_date = datetime.datetime.now()
-        hour = now_date.hour
-        minute = "30" if now_date.minute > 30 else "00"
-        end_date = now_date.strftime("%Y-%m-%d") + f" {hour:02}:{minute:02}:00"
-    return end_date
+    end_date = trade_calendar.last_session()
+    return f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:]} 15:00:00"
 
 
 @retry(
@@ -97,6 +63,7 @@ def get_end_date(trade_date_list) -> str:
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_zh_a_hist_min_em(
         symbol: str = "000001",
         start_date: str = "1979-09-01 09:32:00",
@@ -108,9 +75,9 @@ def stock_zh_a_hist_min_em(
 
 
 def exec_sync(args):
-    engine, logger, trade_code, trade_name, end_date = args
+    engine, logger, watermark, trade_code, trade_name, end_date = args
 
-    last_sync_info = query_last_sync_info(trade_code, engine, logger)
+    last_sync_info = watermark.get_last_sync_info(trade_code)
     last_sync_date = last_sync_info[0]
     last_sync_close = last_sync_info[1]
     start_date = last_sync_date
@@ -155,9 +122,7 @@ def exec_sync(args):
                 )
                 exec_sql(clean_sql)
 
-                last_sync_info = query_last_sync_info(trade_code, engine, logger)
-                last_sync_date = last_sync_info[0]
-                start_date = last_sync_date
+                start_date = watermark.default_date
                 df = stock_zh_a_hist_min_em(
                     symbol=trade_code,
                     start_date=start_date,
@@ -203,16 +168,26 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
         dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
         exec_create_table_script(dir_path, drop_exist, logger)
 
+        # 批量加载各股票代码的同步水位, 默认从 50 天前开始同步
+        watermark = SyncWatermark(
+            "STOCK_ZH_A_HIST_30MIN_HFQ",
+            (datetime.datetime.now() - datetime.timedelta(days=50)).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            date_column="时间",
+            close_column="收盘",
+            date_format="YYYY-MM-DD HH24:MI:SS",
+        ).load(engine, logger)
+
         # 查询交易股票列表 过滤去除 900000-920000 之间的 SSE 交易所 B 股代码 (东方财富数据不存在)
         global_data = GlobalData()
-        trade_code_list = global_data.trade_code_a
+        trade_code_list = shard_filter(global_data.trade_code_a, "证券代码")
         trade_code_list = trade_code_list[
             (trade_code_list["证券代码"] < "900000")
             | (trade_code_list["证券代码"] > "920000")
             ]
-        trade_date_list = global_data.trade_date_a
         # 结束日期: 16:30:00 前取前一天的日期，否则取当天的日期
-        end_date = get_end_date(trade_date_list)
+        end_date = get_end_date(global_data.trade_calendar)
 
         # 构建参数列表
         args = []
@@ -220,11 +195,17 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
             row = trade_code_list.iloc[row_idx]
             trade_code = row.iloc[0]
             trade_name = row.iloc[1]
-            args.append((engine, logger, trade_code, trade_name, end_date))
+            args.append((engine, logger, watermark, trade_code, trade_name, end_date))
+
+        # 跳过本次目标日期已完成的股票, 仅同步未完成及失败的股票
+        checkpoint = SyncCheckpoint("STOCK_ZH_A_HIST_30MIN_HFQ", end_date).load(logger)
+        args = checkpoint.filter(args, key=lambda arg: arg[3])
 
         # 并发执行
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(exec_sync, args)
+            results = executor.map(
+                checkpoint.track(exec_sync, key=lambda arg: arg[3]), args
+            )
             try:
                 for result in results:
                     logger.info(f"Result: {result}")
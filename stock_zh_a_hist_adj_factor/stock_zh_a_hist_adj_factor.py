@@ -0,0 +1,219 @@
+"""
+描述: 沪深京 A 股复权因子, 由已同步的不复权日线表和后复权日线表计算, 不访问外部数据源
+    复权因子 f(t) = 后复权收盘价(t) / 不复权收盘价(t)
+    前复权价格(t) = 不复权价格(t) * f(t) / f(最新交易日)
+
+用途: 前复权数据因分红除权发生变动时, 由不复权数据和复权因子在本地重新计算该股票的前复权历史数据, 不再从 19700101 起重新下载;
+    周线/月线前复权数据由同周期的后复权数据按 前复权价格 = 后复权价格 / f(最新交易日) 重新计算
+"""
+
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from global_data.global_data import GlobalData
+from sync_logs.sync_logs import (
+    update_sync_log_date,
+    update_sync_log_state_to_failed,
+)
+from util.tools import (
+    bulk_insert,
+    exec_create_table_script,
+    get_cfg,
+    get_connection,
+    get_logger,
+)
+from util.resample import in_condition
+from util.shard import get_shard, shard_filter
+
+PRICE_COLUMNS = ["开盘", "收盘", "最高", "最低"]
+
+
+def sync(drop_exist=False):
+    """
+    增量计算复权因子: 不复权表与后复权表按 (股票代码, 日期) 关联, 写入因子表中不存在的记录, 由数据库端单条 INSERT ... SELECT 完成
+    多主机分片同步时各分片在本分片日线表同步完成后执行, 仅计算本分片负责的股票
+    """
+    cfg = get_cfg()
+    logger = get_logger("stock_zh_a_hist_adj_factor", cfg["sync-logging"]["filename"])
+
+    try:
+        dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+        exec_create_table_script(dir_path, drop_exist, logger)
+
+        insert_sql = (
+            'INSERT INTO STOCK_ZH_A_HIST_ADJ_FACTOR ("日期", "股票代码", "复权因子") '
+            'SELECT b."日期", b."股票代码", h."收盘" / b."收盘" '
+            "FROM STOCK_ZH_A_HIST_DAILY_BFQ b "
+            'JOIN STOCK_ZH_A_HIST_DAILY_HFQ h ON h."股票代码" = b."股票代码" AND h."日期" = b."日期" '
+            'WHERE b."收盘" > 0 AND h."收盘" > 0 AND NOT EXISTS ('
+            'SELECT 1 FROM STOCK_ZH_A_HIST_ADJ_FACTOR f WHERE f."股票代码" = b."股票代码" AND f."日期" = b."日期")'
+        )
+        _, shard_count = get_shard()
+        if shard_count > 1:
+            trade_codes = shard_filter(GlobalData().trade_code_a, "证券代码")["证券代码"]
+            insert_sql += f" AND {in_condition('股票代码', trade_codes, alias='b')}"
+        logger.info(f"Execute SQL  [{insert_sql}]")
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(insert_sql)
+                count = cursor.rowcount
+            conn.commit()
+        logger.info(
+            f"Execute Sync stock_zh_a_hist_adj_factor Write[{count}] Records"
+        )
+
+        update_sync_log_date(
+            "stock_zh_a_hist_adj_factor",
+            "stock_zh_a_hist_adj_factor",
+            datetime.datetime.now().strftime("%Y%m%d"),
+        )
+    except Exception:
+        logger.error(f"Table [stock_zh_a_hist_adj_factor] Sync  Failed", exc_info=True)
+        update_sync_log_state_to_failed(
+            "stock_zh_a_hist_adj_factor", "stock_zh_a_hist_adj_factor"
+        )
+
+
+def load_bfq_with_factor(trade_code, end_date, engine):
+    """
+    读取单只股票截止日期(含)前的不复权日线数据及对应复权因子
+    """
+    query = (
+        'SELECT b."日期", b."股票代码", b."开盘", b."收盘", b."最高", b."最低", b."成交量", b."成交额", '
+        'b."振幅", b."涨跌幅", b."涨跌额", b."换手率", f."复权因子" '
+        "FROM STOCK_ZH_A_HIST_DAILY_BFQ b "
+        'LEFT JOIN STOCK_ZH_A_HIST_ADJ_FACTOR f ON f."股票代码" = b."股票代码" AND f."日期" = b."日期" '
+        f'WHERE b."股票代码" = \'{trade_code}\' AND b."日期" <= {end_date} '
+        'ORDER BY b."日期" ASC'
+    )
+    df = pd.read_sql(query, engine)
+    df["日期"] = df["日期"].astype("int64").astype(str)
+    return df
+
+
+def to_qfq(bfq, latest_factor):
+    """
+    不复权数据按复权因子向量化计算前复权数据; 涨跌额按价格同比例缩放, 成交量/成交额/振幅/涨跌幅/换手率与不复权数据一致
+    """
+    ratio = bfq["复权因子"].to_numpy(dtype="float64") / latest_factor
+    qfq = bfq.drop(columns=["复权因子"]).copy()
+    for column in PRICE_COLUMNS + ["涨跌额"]:
+        qfq[column] = np.round(qfq[column].to_numpy(dtype="float64") * ratio, 2)
+    return qfq
+
+
+def replace_qfq_history(table_name, trade_code, rebuilt, df, latest_factor, logger, tolerance):
+    """
+    校验本地重新计算的前复权数据与下载数据的重叠部分, 通过后在同一事务中替换该股票的全部前复权数据
+
+    :param rebuilt: 本地重新计算的前复权历史数据, 列与前复权表一致
+    :return: 成功返回写入记录数; 校验不通过时返回 None
+    """
+    window_start = df["日期"].min()
+    check = rebuilt.merge(df[["日期", "收盘"]], on="日期", suffixes=("", "_qfq"))
+    max_diff = float(np.abs(check["收盘"] - check["收盘_qfq"]).max())
+
+    history = rebuilt[rebuilt["日期"] < window_start]
+    count_sql = f'SELECT COUNT(1) FROM {table_name} WHERE "股票代码" = \'{trade_code}\' AND "日期" < {window_start}'
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(count_sql)
+            stored = int(cursor.fetchone()[0])
+    if max_diff > tolerance or history.shape[0] < stored:
+        logger.info(
+            f"Rebuild [{table_name}] trade_code[{trade_code}] From Adjust Factor Rejected, MaxDiff[{max_diff:.4f}] Rows[{history.shape[0]}/{stored}]"
+        )
+        return None
+
+    # 本地计算的历史数据 + 下载的新数据, 在同一事务中替换该股票的全部前复权数据
+    rows = pd.concat([history, df[history.columns]], ignore_index=True)
+    clean_sql = f'DELETE FROM {table_name} WHERE "股票代码" = \'{trade_code}\''
+    logger.info(f"Execute SQL  [{clean_sql}]")
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(clean_sql)
+        bulk_insert(rows, table_name, conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    logger.info(
+        f"Rebuild [{table_name}] trade_code[{trade_code}] From Adjust Factor, LatestFactor[{latest_factor:.6f}] MaxDiff[{max_diff:.4f}] Write[{rows.shape[0]}] Records"
+    )
+    return rows.shape[0]
+
+
+def rebuild_qfq_history(table_name, trade_code, df, engine, logger, tolerance=0.011):
+    """
+    前复权数据发生变动时, 由不复权数据和复权因子在本地重新计算单只股票的前复权历史数据
+
+    :param table_name: 前复权日线表名
+    :param df: 本次从数据源下载的前复权数据(已是新的复权基准), 至少包含上次同步的最后一个交易日
+    :return: 成功返回写入记录数; 复权因子缺失或校验不通过时返回 None, 由调用方回退为全量重新下载
+    """
+    history = load_bfq_with_factor(trade_code, df["日期"].max(), engine)
+    history = history[history["复权因子"].notna()]
+    overlap = history.merge(df[["日期"] + PRICE_COLUMNS], on="日期", suffixes=("", "_qfq"))
+    if overlap.empty:
+        return None
+
+    # 以下载数据与本地数据的重叠交易日校准最新复权因子: f(最新) = 不复权价格 * f(t) / 前复权价格
+    bfq_value = (
+            overlap[PRICE_COLUMNS].to_numpy(dtype="float64").T
+            * overlap["复权因子"].to_numpy(dtype="float64")
+    ).sum()
+    qfq_value = overlap[[f"{c}_qfq" for c in PRICE_COLUMNS]].to_numpy(dtype="float64").sum()
+    if qfq_value <= 0:
+        return None
+    latest_factor = bfq_value / qfq_value
+
+    return replace_qfq_history(
+        table_name, trade_code, to_qfq(history, latest_factor), df, latest_factor, logger, tolerance
+    )
+
+
+def rebuild_qfq_from_hfq(table_name, hfq_table_name, trade_code, df, engine, logger, tolerance=0.011):
+    """
+    周线/月线前复权数据发生变动时, 由同周期的后复权数据在本地重新计算单只股票的前复权历史数据
+    前复权价格 = 后复权价格 / f(最新交易日), 周期内最高/最低价及涨跌额同比例缩放, 成交量/成交额/振幅/涨跌幅/换手率与后复权数据一致
+
+    :param table_name: 前复权周线/月线表名
+    :param hfq_table_name: 同周期的后复权表名
+    :param df: 本次从数据源下载的前复权数据(已是新的复权基准), 至少包含上次同步的最后一个周期
+    :return: 成功返回写入记录数; 后复权数据缺失或校验不通过时返回 None, 由调用方回退为全量重新下载
+    """
+    columns = ", ".join(f'"{column}"' for column in df.columns)
+    query = (
+        f"SELECT {columns} FROM {hfq_table_name} "
+        f'WHERE "股票代码" = \'{trade_code}\' AND "日期" <= {df["日期"].max()} '
+        'ORDER BY "日期" ASC'
+    )
+    history = pd.read_sql(query, engine)
+    if history.empty:
+        return None
+    history["日期"] = history["日期"].astype("int64").astype(str)
+    overlap = history.merge(df[["日期"] + PRICE_COLUMNS], on="日期", suffixes=("", "_qfq"))
+    if overlap.empty:
+        return None
+
+    # 以下载数据与本地后复权数据的重叠周期校准最新复权因子: f(最新) = 后复权价格 / 前复权价格
+    hfq_value = overlap[PRICE_COLUMNS].to_numpy(dtype="float64").sum()
+    qfq_value = overlap[[f"{c}_qfq" for c in PRICE_COLUMNS]].to_numpy(dtype="float64").sum()
+    if qfq_value <= 0:
+        return None
+    latest_factor = hfq_value / qfq_value
+
+    rebuilt = history.copy()
+    for column in PRICE_COLUMNS + ["涨跌额"]:
+        rebuilt[column] = np.round(rebuilt[column].to_numpy(dtype="float64") / latest_factor, 2)
+    return replace_qfq_history(table_name, trade_code, rebuilt, df, latest_factor, logger, tolerance)
+
+
+if __name__ == "__main__":
+    sync(False)
@@ -0,0 +1,22 @@
+BEGIN
+   EXECUTE IMMEDIATE 'DROP TABLE STOCK_ZH_A_HIST_ADJ_FACTOR';
+EXCEPTION
+   WHEN OTHERS THEN NULL;
+END;
+
+CREATE TABLE "STOCK_ZH_A_HIST_ADJ_FACTOR"
+   (	"ID" NUMBER(10,0) GENERATED BY DEFAULT AS IDENTITY MINVALUE 1 MAXVALUE 9999999999999999999999999999 INCREMENT BY 1 START WITH 1 CACHE 20 NOORDER  NOCYCLE  NOKEEP  NOSCALE  NOT NULL ENABLE,
+		"日期" NUMBER(8,0) DEFAULT NULL,
+		"股票代码" VARCHAR2(8) DEFAULT NULL,
+		"复权因子" NUMBER(24,10) DEFAULT NULL,
+	    CONSTRAINT "STOCK_ZH_A_HIST_ADJ_FACTOR_PK" PRIMARY KEY ("ID")  USING INDEX PCTFREE 10 INITRANS 2 MAXTRANS 255 COMPUTE STATISTICS  TABLESPACE "AKSHARE"  ENABLE
+   ) SEGMENT CREATION DEFERRED
+  PCTFREE 10 PCTUSED 40 INITRANS 1 MAXTRANS 255
+ NOCOMPRESS LOGGING
+ TABLESPACE "AKSHARE";
+
+COMMENT ON TABLE STOCK_ZH_A_HIST_ADJ_FACTOR IS 'Akshare 沪深京A股日频率数据-后复权因子(后复权收盘价/不复权收盘价)';
+
+ALTER TABLE STOCK_ZH_A_HIST_ADJ_FACTOR ADD CONSTRAINT STOCK_ZH_A_HIST_ADJ_FACTOR_UNIQUE UNIQUE ("日期","股票代码") ENABLE;
+
+CREATE INDEX STOCK_ZH_A_HIST_ADJ_FACTOR_股票代码_IDX ON STOCK_ZH_A_HIST_ADJ_FACTOR ("股票代码","日期");
@@ -14,6 +14,7 @@
 限量: 单次返回指定沪深京 A 股上市公司、指定周期和指定日期间的历史行情日频率数据
 """
 
+import asyncio
 import datetime
 import os
 from concurrent.futures import ThreadPoolExecutor
@@ -24,11 +25,21 @@ from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
+from sync_checkpoint.sync_checkpoint import SyncCheckpoint
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.async_fetch import (
+    is_async_fetch_enabled,
+    run_pipeline,
+    stock_zh_a_hist as async_stock_zh_a_hist,
+)
+from util.dates import to_date_str
+from util.ratelimit import rate_limited
+from util.response_cache import cached_response, kline_immutable, kline_range
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -36,6 +47,7 @@ from util.tools import (
     get_cfg,
     save_to_database,
 )
+from util.watermark import SyncWatermark
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
@@ -44,18 +56,14 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
-def query_last_sync_date(trade_code, engine, logger):
-    query_start_date = f'SELECT NVL(MAX("日期"), 19900101) as max_date FROM STOCK_ZH_A_HIST_DAILY_BFQ WHERE "股票代码"=\'{trade_code}\''
-    logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
-
-
+@cached_response("stock_zh_a_hist", immutable=kline_immutable, ranged=kline_range)
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_incrementing(start=5, increment=5, max=60),
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_zh_a_hist(
         symbol: str,
         period: str,
@@ -70,9 +78,9 @@ def stock_zh_a_hist(
 
 
 def exec_sync(args):
-    engine, logger, trade_code, trade_name, end_date = args
+    engine, logger, watermark, trade_code, trade_name, end_date = args
 
-    last_sync_date = query_last_sync_date(trade_code, engine, logger)
+    last_sync_date = watermark.get_last_sync_date(trade_code)
     start_date = (
             datetime.datetime.strptime(last_sync_date, "%Y%m%d") + relativedelta(days=1)
     ).strftime("%Y%m%d")
@@ -90,7 +98,7 @@ def exec_sync(args):
             timeout=20,
         )
         if not df.empty:
-            df["日期"] = df["日期"].apply(lambda x: x.strftime("%Y%m%d"))
+            df["日期"] = to_date_str(df["日期"])
             save_to_database(
                 df,
                 "stock_zh_a_hist_daily_bfq",
@@ -109,6 +117,58 @@ def exec_sync(args):
         )
 
 
+def exec_async_sync(engine, logger, watermark, trade_code_list, end_date):
+    """
+    异步抓取流水线: 协程并发下载各股票数据, 独立写库线程依次写入数据库
+    """
+    items = []
+    for row_idx in range(trade_code_list.shape[0]):
+        row = trade_code_list.iloc[row_idx]
+        trade_code = row.iloc[0]
+        start_date = (
+                datetime.datetime.strptime(watermark.get_last_sync_date(trade_code), "%Y%m%d")
+                + relativedelta(days=1)
+        ).strftime("%Y%m%d")
+        if start_date <= end_date:
+            items.append((trade_code, row.iloc[1], start_date))
+
+    # 跳过本次目标日期已完成的股票, 仅同步未完成及失败的股票
+    checkpoint = SyncCheckpoint("STOCK_ZH_A_HIST_DAILY_BFQ", end_date).load(logger)
+    items = checkpoint.filter(items, key=lambda item: item[0])
+
+    async def fetch(session, item):
+        trade_code, trade_name, start_date = item
+        logger.info(
+            f"Execute Sync stock_zh_a_hist_daily_bfq  trade_code[{trade_code}] trade_name[{trade_name}] from [{start_date}] to [{end_date}]"
+        )
+        try:
+            return await async_stock_zh_a_hist(
+                session, trade_code, "daily", start_date, end_date, ""
+            )
+        except Exception:
+            # 检查点写入为阻塞的数据库操作, 在线程中执行, 不阻塞事件循环
+            await asyncio.to_thread(checkpoint.mark_failed, trade_code)
+            raise
+
+    def write(item, df):
+        if not df.empty:
+            save_to_database(
+                df,
+                "stock_zh_a_hist_daily_bfq",
+                engine,
+                index=False,
+                if_exists="append",
+                chunksize=20000,
+            )
+            logger.info(
+                f"Execute Sync stock_zh_a_hist_daily_bfq trade_code[{item[0]}]"
+                + f" Write[{df.shape[0]}] Records"
+            )
+        checkpoint.mark_done(item[0])
+
+    run_pipeline(items, fetch, write, logger)
+
+
 def sync(drop_exist=False, enable_proxy=False, max_workers=5):
     if enable_proxy:
         from util.proxy import Proxy
@@ -122,38 +182,43 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
         dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
         exec_create_table_script(dir_path, drop_exist, logger)
 
+        # 批量加载各股票代码的同步水位
+        watermark = SyncWatermark("STOCK_ZH_A_HIST_DAILY_BFQ", "19900101").load(engine, logger)
+
         # 查询交易股票列表
         global_data = GlobalData()
-        trade_code_list = global_data.trade_code_a
-        trade_date_lit = global_data.trade_date_a
-
-        # 结束日期: 16:30:00 前取前一天的日期，否则取当天的日期
-        last_date = (
-            str(datetime.datetime.now().strftime("%Y%m%d"))
-            if datetime.datetime.now().strftime("%H:%M:%S") > "16:30:00"
-            else (datetime.datetime.now() + relativedelta(days=-1)).strftime("%Y%m%d")
-        )
-        date_list = [date for date in trade_date_lit if date <= last_date]
-        end_date = max(date_list)
-
-        # 构建参数列表
-        args = []
-        for row_idx in range(trade_code_list.shape[0]):
-            row = trade_code_list.iloc[row_idx]
-            trade_code = row.iloc[0]
-            trade_name = row.iloc[1]
-            args.append((engine, logger, trade_code, trade_name, end_date))
-
-        # 并发执行
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(exec_sync, args)
-            try:
-                for result in results:
-                    logger.info(f"Result: {result}")
-            except Exception as e:
-                logger.error(f"Found Exception: {e}")
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise e
+        trade_code_list = shard_filter(global_data.trade_code_a, "证券代码")
+
+        # 结束日期: 16:30:00 前取上一个交易日，否则取当天之前(含)的最后一个交易日
+        end_date = global_data.trade_calendar.last_session()
+
+        if is_async_fetch_enabled():
+            exec_async_sync(engine, logger, watermark, trade_code_list, end_date)
+        else:
+            # 构建参数列表
+            args = []
+            for row_idx in range(trade_code_list.shape[0]):
+                row = trade_code_list.iloc[row_idx]
+                trade_code = row.iloc[0]
+                trade_name = row.iloc[1]
+                args.append((engine, logger, watermark, trade_code, trade_name, end_date))
+
+            # 跳过本次目标日期已完成的股票, 仅同步未完成及失败的股票
+            checkpoint = SyncCheckpoint("STOCK_ZH_A_HIST_DAILY_BFQ", end_date).load(logger)
+            args = checkpoint.filter(args, key=lambda arg: arg[3])
+
+            # 并发执行
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    checkpoint.track(exec_sync, key=lambda arg: arg[3]), args
+                )
+                try:
+                    for result in results:
+                        logger.info(f"Result: {result}")
+                except Exception as e:
+                    logger.error(f"Found Exception: {e}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise e
 
         update_sync_log_date(
             "stock_zh_a_hist", "stock_zh_a_hist_daily_bfq", f"{str(end_date)}"
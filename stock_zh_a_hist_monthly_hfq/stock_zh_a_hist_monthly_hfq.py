@@ -25,11 +25,17 @@ from dateutil.relativedelta import relativedelta
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
+from sync_checkpoint.sync_checkpoint import SyncCheckpoint
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.dates import to_date_str
+from util.ratelimit import rate_limited
+from util.resample import is_resample_enabled, sync_resampled
+from util.response_cache import cached_response, kline_immutable, kline_range
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -37,6 +43,7 @@ from util.tools import (
     get_cfg,
     save_to_database,
 )
+from util.watermark import SyncWatermark
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
@@ -45,26 +52,14 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
-def query_last_sync_date(trade_code, engine, logger):
-    query_start_date = f'SELECT NVL(MAX("日期"), 19900101) as max_date FROM stock_zh_a_hist_monthly_hfq WHERE "股票代码"=\'{trade_code}\''
-    logger.info(f"Execute Query SQL  [{query_start_date}]")
-    return str(pd.read_sql(query_start_date, engine).iloc[0, 0])
-
-
-def get_last_month_date():
-    """
-    获取当前时间的上一月的最后一天作为数据同步的截止时间
-    """
-    today = datetime.date.today()
-    return (today - datetime.timedelta(days=today.day)).strftime("%Y%m%d")
-
-
+@cached_response("stock_zh_a_hist", immutable=kline_immutable, ranged=kline_range)
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_incrementing(start=5, increment=5, max=60),
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_zh_a_hist(
         symbol: str,
         period: str,
@@ -79,9 +74,9 @@ def stock_zh_a_hist(
 
 
 def exec_sync(args):
-    engine, logger, trade_code, trade_name, end_date = args
+    engine, logger, watermark, trade_code, trade_name, end_date = args
 
-    last_sync_date = query_last_sync_date(trade_code, engine, logger)
+    last_sync_date = watermark.get_last_sync_date(trade_code)
     start_date = (
             datetime.datetime.strptime(last_sync_date, "%Y%m%d") + relativedelta(days=1)
     ).strftime("%Y%m%d")
@@ -99,7 +94,7 @@ def exec_sync(args):
             timeout=20,
         )
         if not df.empty:
-            df["日期"] = df["日期"].apply(lambda x: x.strftime("%Y%m%d"))
+            df["日期"] = to_date_str(df["日期"])
             save_to_database(
                 df,
                 "stock_zh_a_hist_monthly_hfq",
@@ -133,28 +128,50 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
 
         # 查询交易股票列表
         global_data = GlobalData()
-        trade_code_list = global_data.trade_code_a
-        # 结束日期: 最近的周五日期
-        end_date = get_last_month_date()
-
-        # 构建参数列表
-        args = []
-        for row_idx in range(trade_code_list.shape[0]):
-            row = trade_code_list.iloc[row_idx]
-            trade_code = row.iloc[0]
-            trade_name = row.iloc[1]
-            args.append((engine, logger, trade_code, trade_name, end_date))
-
-        # 并发执行
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(exec_sync, args)
-            try:
-                for result in results:
-                    logger.info(f"Result: {result}")
-            except Exception as e:
-                logger.error(f"Found Exception: {e}")
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise e
+        trade_code_list = shard_filter(global_data.trade_code_a, "证券代码")
+        # 结束日期: 最近一个已收盘交易月的最后一个交易日
+        end_date = global_data.trade_calendar.last_month_end()
+
+        if is_resample_enabled():
+            # 由日线表按交易日历重采样生成月线, 不再逐个股票从东方财富下载
+            sync_resampled(
+                "STOCK_ZH_A_HIST_MONTHLY_HFQ",
+                "STOCK_ZH_A_HIST_DAILY_HFQ",
+                "monthly",
+                end_date,
+                global_data.trade_date_a,
+                list(trade_code_list["证券代码"]),
+                engine,
+                logger,
+            )
+        else:
+            # 批量加载各股票代码的同步水位
+            watermark = SyncWatermark("STOCK_ZH_A_HIST_MONTHLY_HFQ", "19900101").load(engine, logger)
+
+            # 构建参数列表
+            args = []
+            for row_idx in range(trade_code_list.shape[0]):
+                row = trade_code_list.iloc[row_idx]
+                trade_code = row.iloc[0]
+                trade_name = row.iloc[1]
+                args.append((engine, logger, watermark, trade_code, trade_name, end_date))
+
+            # 跳过本次目标日期已完成的股票, 仅同步未完成及失败的股票
+            checkpoint = SyncCheckpoint("STOCK_ZH_A_HIST_MONTHLY_HFQ", end_date).load(logger)
+            args = checkpoint.filter(args, key=lambda arg: arg[3])
+
+            # 并发执行
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    checkpoint.track(exec_sync, key=lambda arg: arg[3]), args
+                )
+                try:
+                    for result in results:
+                        logger.info(f"Result: {result}")
+                except Exception as e:
+                    logger.error(f"Found Exception: {e}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise e
 
         update_sync_log_date(
             "stock_zh_a_hist", "stock_zh_a_hist_monthly_hfq", f"{str(end_date)}"
@@ -14,7 +14,6 @@
 限量: 单次返回指定沪深京 A 股上市公司、指定周期和指定日期间的历史行情日频率数据
 """
 
-import datetime
 import os
 from concurrent.futures import ThreadPoolExecutor
 
@@ -23,11 +22,18 @@ import pandas as pd
 from tenacity import retry, stop_after_attempt, wait_incrementing
 
 from global_data.global_data import GlobalData
+from stock_zh_a_hist_adj_factor.stock_zh_a_hist_adj_factor import rebuild_qfq_from_hfq
+from sync_checkpoint.sync_checkpoint import SyncCheckpoint
 from sync_logs.sync_logs import (
     update_sync_log_date,
     update_sync_log_state_to_failed,
 )
+from util.dates import to_date_str
+from util.ratelimit import rate_limited
+from util.resample import is_resample_enabled, sync_resampled
+from util.response_cache import cached_response, kline_immutable, kline_range
 from util.retry import log_retry_stats
+from util.shard import shard_filter
 from util.tools import (
     exec_create_table_script,
     get_engine,
@@ -36,6 +42,7 @@ from util.tools import (
     exec_sql,
     save_to_database,
 )
+from util.watermark import SyncWatermark
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
@@ -44,42 +51,14 @@ pd.set_option("display.max_colwidth", None)
 pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
 
 
-def query_last_sync_info(trade_code, engine, logger):
-    """
-    查询上次同步的数据截止时间
-    查询上次同步数据的结果数据，检测数据是否发生变动，来判断是否需要重新同步前复权数据
-    """
-    result = []
-    query_last_date = f'SELECT NVL(MAX("日期"), 19700101) as max_date FROM STOCK_ZH_A_HIST_MONTHLY_QFQ WHERE "股票代码"=\'{trade_code}\''
-    logger.info(f"Execute Query SQL  [{query_last_date}]")
-    last_date = str(pd.read_sql(query_last_date, engine).iloc[0, 0])
-    result.append(last_date)
-
-    query_last_close = f'SELECT "收盘" FROM STOCK_ZH_A_HIST_MONTHLY_QFQ WHERE "股票代码"=\'{trade_code}\' AND "日期"=\'{last_date}\''
-    logger.info(f"Execute Query SQL  [{query_last_close}]")
-    last_close = pd.read_sql(query_last_close, engine)
-    if last_close.shape[0] > 0:
-        result.append(last_close.iloc[0, 0])
-    else:
-        result.append(None)
-
-    return result
-
-
-def get_last_month_date():
-    """
-    获取当前时间的上一月的最后一天作为数据同步的截止时间
-    """
-    today = datetime.date.today()
-    return (today - datetime.timedelta(days=today.day)).strftime("%Y%m%d")
-
-
+@cached_response("stock_zh_a_hist", immutable=kline_immutable, ranged=kline_range)
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_incrementing(start=5, increment=5, max=60),
     before_sleep=log_retry_stats,
     reraise=True,
 )
+@rate_limited("eastmoney")
 def stock_zh_a_hist(
         symbol: str,
         period: str,
@@ -94,9 +73,9 @@ def stock_zh_a_hist(
 
 
 def exec_sync(args):
-    engine, logger, trade_code, trade_name, end_date = args
+    engine, logger, watermark, trade_code, trade_name, end_date = args
 
-    last_sync_info = query_last_sync_info(trade_code, engine, logger)
+    last_sync_info = watermark.get_last_sync_info(trade_code)
     last_sync_date = last_sync_info[0]
     last_sync_close = last_sync_info[1]
     start_date = last_sync_date
@@ -114,7 +93,7 @@ def exec_sync(args):
             timeout=20,
         )
         if not df.empty:
-            df["日期"] = df["日期"].apply(lambda x: x.strftime("%Y%m%d"))
+            df["日期"] = to_date_str(df["日期"])
             """ 判断前复权的数据是否发生变动 """
             if (
                     last_sync_close is None
@@ -133,7 +112,13 @@ def exec_sync(args):
                     f"Execute Sync stock_zh_a_hist_monthly_qfq trade_code[{trade_code}]"
                     + f" Write[{df.shape[0]}] Records"
                 )
-            else:
+            elif (
+                    rebuild_qfq_from_hfq(
+                        "STOCK_ZH_A_HIST_MONTHLY_QFQ", "STOCK_ZH_A_HIST_MONTHLY_HFQ", trade_code, df, engine, logger
+                    )
+                    is None
+            ):
+                """ 由同周期的后复权数据本地重算失败时, 清理历史数据后全量重新下载 """
                 clean_sql = f"DELETE FROM stock_zh_a_hist_monthly_qfq WHERE \"股票代码\"='{trade_code}'"
                 logger.info(
                     f"Execute Sync stock_zh_a_hist_monthly_qfq, Detect QFQ data updated, Clean History Data With SQL [{clean_sql}], Recall Sync"
@@ -150,7 +135,7 @@ def exec_sync(args):
                     timeout=20,
                 )
                 if not df.empty:
-                    df["日期"] = df["日期"].apply(lambda x: x.strftime("%Y%m%d"))
+                    df["日期"] = to_date_str(df["日期"])
                     save_to_database(
                         df,
                         "stock_zh_a_hist_monthly_qfq",
@@ -184,28 +169,52 @@ def sync(drop_exist=False, enable_proxy=False, max_workers=5):
 
         # 查询交易股票列表
         global_data = GlobalData()
-        trade_code_list = global_data.trade_code_a
-        # 结束日期: 最近的上月日期
-        end_date = get_last_month_date()
-
-        # 构建参数列表
-        args = []
-        for row_idx in range(trade_code_list.shape[0]):
-            row = trade_code_list.iloc[row_idx]
-            trade_code = row.iloc[0]
-            trade_name = row.iloc[1]
-            args.append((engine, logger, trade_code, trade_name, end_date))
-
-        # 并发执行
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(exec_sync, args)
-            try:
-                for result in results:
-                    logger.info(f"Result: {result}")
-            except Exception as e:
-                logger.error(f"Found Exception: {e}")
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise e
+        trade_code_list = shard_filter(global_data.trade_code_a, "证券代码")
+        # 结束日期: 最近一个已收盘交易月的最后一个交易日
+        end_date = global_data.trade_calendar.last_month_end()
+
+        if is_resample_enabled():
+            # 由日线表按交易日历重采样生成月线, 不再逐个股票从东方财富下载
+            sync_resampled(
+                "STOCK_ZH_A_HIST_MONTHLY_QFQ",
+                "STOCK_ZH_A_HIST_DAILY_QFQ",
+                "monthly",
+                end_date,
+                global_data.trade_date_a,
+                list(trade_code_list["证券代码"]),
+                engine,
+                logger,
+            )
+        else:
+            # 批量加载各股票代码的同步水位
+            watermark = SyncWatermark(
+                "STOCK_ZH_A_HIST_MONTHLY_QFQ", "19700101", close_column="收盘"
+            ).load(engine, logger)
+
+            # 构建参数列表
+            args = []
+            for row_idx in range(trade_code_list.shape[0]):
+                row = trade_code_list.iloc[row_idx]
+                trade_code = row.iloc[0]
+                trade_name = row.iloc[1]
+                args.append((engine, logger, watermark, trade_code, trade_name, end_date))
+
+            # 跳过本次目标日期已完成的股票, 仅同步未完成及失败的股票
+            checkpoint = SyncCheckpoint("STOCK_ZH_A_HIST_MONTHLY_QFQ", end_date).load(logger)
+            args = checkpoint.filter(args, key=lambda arg: arg[3])
+
+            # 并发执行
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(
+                    checkpoint.track(exec_sync, key=lambda arg: arg[3]), args
+                )
+                try:
+                    for result in results:
+                        logger.info(f"Result: {result}")
+                except Exception as e:
+                    logger.error(f"Found Exception: {e}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise e
 
         update_sync_log_date(
             "stock_zh_a_hist", "stock_zh_a_hist_monthly_qfq", f"{str(end_date)}"
@@ -0,0 +1,152 @@
+"""
+描述: 按股票代码同步的进度检查点, 记录 (表名, 股票代码) 最近一次同步的目标日期、状态 (完成/失败) 及尝试次数
+    1. 同步开始时单次查询加载该表全部检查点, 目标日期相同且已完成的股票直接跳过, 仅同步未完成及失败的股票
+    2. 每只股票同步成功/失败后立即写入检查点, 同步进程中途退出后重新执行可从断点继续
+    3. 同一目标日期失败次数达到 application.ini [checkpoint] max_attempts 的股票不再重试, 避免个别股票反复失败拖慢整表同步
+    4. 批量写入数据的模块可调用 mark_done_batch 在写入数据的同一事务内记录检查点, 数据与检查点同时提交或回滚
+    5. SYNC_CHECKPOINT 表由 sync_start.py 在调度同步任务前创建 (init_create_table_sync_checkpoint), 各同步进程仅查询及写入,
+       避免并发启动的进程同时执行建表脚本 (DROP TABLE + CREATE TABLE) 互相删除对方已写入的检查点
+"""
+
+import functools
+import os
+
+from util.config import get_cfg
+from util.logger import get_logger
+from util.tools import exec_create_table_script, get_connection
+
+STATE_DONE = "完成"
+STATE_FAILED = "失败"
+
+MERGE_SQL = (
+    "MERGE INTO SYNC_CHECKPOINT t "
+    'USING (SELECT :1 AS "表名", :2 AS "股票代码", :3 AS "目标日期", :4 AS "状态" FROM DUAL) s '
+    'ON (t."表名" = s."表名" AND t."股票代码" = s."股票代码") '
+    'WHEN MATCHED THEN UPDATE SET t."状态" = s."状态", t."更新时间" = SYSDATE, '
+    't."尝试次数" = CASE WHEN t."目标日期" = s."目标日期" THEN t."尝试次数" + 1 ELSE 1 END, '
+    't."目标日期" = s."目标日期" '
+    'WHEN NOT MATCHED THEN INSERT ("表名", "股票代码", "目标日期", "状态", "尝试次数", "更新时间") '
+    'VALUES (s."表名", s."股票代码", s."目标日期", s."状态", 1, SYSDATE)'
+)
+
+
+def init_create_table_sync_checkpoint():
+    cfg = get_cfg()
+    logger = get_logger("sync_checkpoint", cfg["sync-logging"]["filename"])
+    dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+    exec_create_table_script(dir_path, False, logger)
+
+
+def mark_done_batch(connection, table_name, checkpoints):
+    """
+    在调用方的事务内批量写入已完成检查点, 由调用方提交事务
+
+    :param checkpoints: [(股票代码, 已完成日期)]
+    """
+    rows = [[table_name.upper(), trade_code, str(date), STATE_DONE] for trade_code, date in checkpoints]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(MERGE_SQL, rows)
+    return len(rows)
+
+
+def get_max_attempts():
+    cfg = get_cfg()
+    return cfg.getint("checkpoint", "max_attempts", fallback=5)
+
+
+class SyncCheckpoint:
+    """
+    单张表的同步检查点
+
+    table_name: 表名, 统一按大写保存, 与 exec_create_table_script 重建表时清理检查点使用的表名一致
+    end_date: 本次同步的目标日期
+    """
+
+    def __init__(self, table_name, end_date):
+        self.table_name = table_name.upper()
+        self.end_date = str(end_date)
+        self.max_attempts = get_max_attempts()
+        self.checkpoints = {}
+
+    def load(self, logger):
+        """
+        单次查询加载该表全部股票的检查点, SYNC_CHECKPOINT 表需已由 init_create_table_sync_checkpoint 创建
+        """
+        query = 'SELECT "股票代码", "目标日期", "状态", "尝试次数" FROM SYNC_CHECKPOINT WHERE "表名" = :1'
+        logger.info(f"Execute Query SQL  [{query}] [{self.table_name}]")
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, [self.table_name])
+                self.checkpoints = {
+                    row[0]: (row[1], row[2], int(row[3] or 0)) for row in cursor
+                }
+
+        done = sum(1 for code in self.checkpoints if not self.is_pending(code))
+        logger.info(
+            f"Load Sync Checkpoint Of Table [{self.table_name}] EndDate[{self.end_date}] Size [{len(self.checkpoints)}] Finished [{done}]"
+        )
+        return self
+
+    def is_pending(self, trade_code):
+        """
+        股票是否需要同步: 无检查点、目标日期不同, 或本目标日期未完成且失败次数未达上限
+        """
+        checkpoint = self.checkpoints.get(trade_code)
+        if checkpoint is None or checkpoint[0] != self.end_date:
+            return True
+        state, attempts = checkpoint[1], checkpoint[2]
+        return state != STATE_DONE and attempts < self.max_attempts
+
+    def filter(self, args, key):
+        """
+        过滤出需要同步的任务参数, key 从任务参数中取出股票代码
+        """
+        pending = [arg for arg in args if self.is_pending(key(arg))]
+        skipped = [
+            key(arg)
+            for arg in args
+            if key(arg) in self.checkpoints
+               and self.checkpoints[key(arg)][0] == self.end_date
+               and self.checkpoints[key(arg)][1] == STATE_FAILED
+               and not self.is_pending(key(arg))
+        ]
+        if skipped:
+            cfg = get_cfg()
+            logger = get_logger("sync_checkpoint", cfg["sync-logging"]["filename"])
+            logger.warning(
+                f"Table [{self.table_name}] Skip [{len(skipped)}] Symbols Failed [{self.max_attempts}] Times: {skipped[:50]}"
+            )
+        return pending
+
+    def mark(self, trade_code, state):
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    MERGE_SQL, [self.table_name, trade_code, self.end_date, state]
+                )
+            conn.commit()
+
+    def mark_done(self, trade_code):
+        self.mark(trade_code, STATE_DONE)
+
+    def mark_failed(self, trade_code):
+        self.mark(trade_code, STATE_FAILED)
+
+    def track(self, func, key):
+        """
+        包装单只股票的同步函数, 执行成功/失败后写入检查点, 异常继续抛出
+        """
+
+        @functools.wraps(func)
+        def wrapper(arg):
+            trade_code = key(arg)
+            try:
+                result = func(arg)
+            except Exception:
+                self.mark_failed(trade_code)
+                raise
+            self.mark_done(trade_code)
+            return result
+
+        return wrapper
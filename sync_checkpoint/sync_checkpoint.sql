@@ -0,0 +1,21 @@
+BEGIN
+   EXECUTE IMMEDIATE 'DROP TABLE SYNC_CHECKPOINT';
+EXCEPTION
+   WHEN OTHERS THEN NULL;
+END;
+
+CREATE TABLE "AKSHARE"."SYNC_CHECKPOINT"
+   (	"表名" VARCHAR2(64) NOT NULL ENABLE,
+		"股票代码" VARCHAR2(16) NOT NULL ENABLE,
+		"目标日期" VARCHAR2(20) DEFAULT NULL,
+		"状态" VARCHAR2(12) DEFAULT NULL,
+		"尝试次数" NUMBER(6,0) DEFAULT 0,
+		"更新时间" DATE DEFAULT NULL,
+	    CONSTRAINT "SYNC_CHECKPOINT_PK" PRIMARY KEY ("表名", "股票代码")  USING INDEX PCTFREE 10 INITRANS 2 MAXTRANS 255 COMPUTE STATISTICS  TABLESPACE "AKSHARE"  ENABLE
+   ) SEGMENT CREATION DEFERRED
+  PCTFREE 10 PCTUSED 40 INITRANS 1 MAXTRANS 255
+ NOCOMPRESS LOGGING
+ TABLESPACE "AKSHARE";
+
+
+COMMENT ON TABLE SYNC_CHECKPOINT IS '按股票代码同步的进度检查点表';
@@ -15,13 +15,18 @@ import os
 
 import pandas as pd
 
+from util import metrics
 from util.config import get_cfg
 from util.logger import get_logger
 from util.tools import (
     exec_create_table_script,
-    get_engine,
     get_connection,
 )
+from util.pool import get_pool_stats
+from util.shard import is_primary_shard
+
+# 0 号分片基础数据表同步完成的就绪标记 (SYNC_LOGS 中的接口名/表名)
+GLOBAL_DATA_READY = "global_data_ready"
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
@@ -49,15 +54,19 @@ def str_date_day_add(str_date, days):
 def update_sync_log_date(api_name, table_name, date):
     """
     执行成功后，更新 SYNC_LOGS 表的同步日期和状态
+    多主机分片同步时非 0 号分片只同步了部分股票, 不更新整张表的同步日期 (各股票的完成情况记录在 SYNC_CHECKPOINT)
     """
     cfg = get_cfg()
     logger = get_logger("sync_logs", cfg["sync-logging"]["filename"])
-    engine = get_engine()
+    if not is_primary_shard():
+        logger.info(f"Skip Update SYNC_LOGS [{api_name}/{table_name}] Date[{date}] On Non-Primary Shard")
+        return
     conn = get_connection()
     cursor = conn.cursor()
 
     query_exits = f"SELECT COUNT(1) as cnt FROM sync_logs WHERE \"接口名\"='{api_name}' AND \"表名\"='{table_name}'"
-    if int(pd.read_sql(query_exits, engine).iloc[0, 0]) == 0:
+    cursor.execute(query_exits)
+    if int(cursor.fetchone()[0]) == 0:
         insert_sql = f"INSERT INTO SYNC_LOGS (\"接口名\", \"表名\",\"日期\",\"状态\") VALUES ('{api_name}', '{table_name}', '{date}', '成功')"
         logger.info(f"Execute SQL  [{insert_sql}]")
         cursor.execute(insert_sql)
@@ -68,17 +77,19 @@ def update_sync_log_date(api_name, table_name, date):
     conn.commit()
     cursor.close()
     conn.close()
+    logger.info(f"Oracle Pool Stats [{get_pool_stats()}]")
 
 
 def update_sync_log_state_to_failed(api_name, table_name):
+    metrics.count("sync_failed")
     cfg = get_cfg()
     logger = get_logger("sync_logs", cfg["sync-logging"]["filename"])
-    engine = get_engine()
     conn = get_connection()
     cursor = conn.cursor()
 
     query_exits = f"SELECT COUNT(1) as cnt FROM sync_logs WHERE \"接口名\"='{api_name}' AND \"表名\"='{table_name}'"
-    if int(pd.read_sql(query_exits, engine).iloc[0, 0]) == 0:
+    cursor.execute(query_exits)
+    if int(cursor.fetchone()[0]) == 0:
         insert_sql = f"INSERT INTO SYNC_LOGS (\"接口名\", \"表名\",\"日期\",\"状态\") VALUES ('{api_name}', '{table_name}', '19700101', '失败')"
         logger.info(f"Execute SQL  [{insert_sql}]")
         cursor.execute(insert_sql)
@@ -89,6 +100,32 @@ def update_sync_log_state_to_failed(api_name, table_name):
     conn.commit()
     cursor.close()
     conn.close()
+    logger.info(f"Oracle Pool Stats [{get_pool_stats()}]")
+
+
+def query_sync_log_date(table_name):
+    """
+    查询表最近一次同步成功的日期 (YYYYMMDD), 未同步成功时返回 None
+    """
+    query_sql = f"SELECT \"日期\" FROM SYNC_LOGS WHERE \"表名\"='{table_name}' AND \"状态\"='成功'"
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query_sql)
+            row = cursor.fetchone()
+            return str(row[0]) if row else None
+    finally:
+        conn.close()
+
+
+def mark_global_data_ready():
+    """
+    0 号分片基础数据表 (交易日历、股票列表等) 本次同步成功后写入当天的就绪标记, 非 0 号分片据此判断是否可以开始同步;
+    部分基础数据表按周更新, 当天跳过同步时不会更新其同步日期, 因此不能以各表的同步日期判断
+    """
+    update_sync_log_date(
+        GLOBAL_DATA_READY, GLOBAL_DATA_READY, datetime.datetime.now().strftime("%Y%m%d")
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""
+描述: 数据同步运行记录, 每次 sync_start.py 执行后按任务写入开始/结束时间、耗时、状态、写入记录数、HTTP 请求数、重试次数、下载字节数、HTTP 及数据库耗时
+    HTTP 耗时、数据库耗时为任务内各线程的累计耗时, 可能大于任务耗时
+
+用途: 查询最慢的同步任务及各任务按周的吞吐量变化趋势, 用于评估夜间同步窗口的容量
+
+执行: python -m sync_run_logs.sync_run_logs --days 7 --weeks 8
+"""
+
+import argparse
+import datetime
+import os
+
+import pandas as pd
+
+from util.config import get_cfg
+from util.logger import get_logger
+from util.metrics import get_counter, get_stage_seconds
+from util.tools import exec_create_table_script, get_engine, save_to_database
+
+pd.set_option("display.max_columns", None)
+pd.set_option("display.max_rows", None)
+pd.set_option("display.width", None)
+pd.set_option("display.max_colwidth", None)
+pd.set_option("display.float_format", lambda x: "%.2f" % x)  #
+
+
+def init_create_table_sync_run_logs():
+    cfg = get_cfg()
+    logger = get_logger("sync_run_logs", cfg["sync-logging"]["filename"])
+    dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+    exec_create_table_script(dir_path, False, logger)
+
+
+def build_run_logs(scheduler):
+    """
+    由 DagScheduler 的任务起止时间、失败任务及统计快照生成运行记录, 未启动的任务不记录
+    """
+    rows = []
+    for name, start_time in scheduler.start_time.items():
+        end_time = scheduler.end_time.get(name)
+        failed = name in scheduler.failed
+        rows.append(
+            {
+                "任务名": name,
+                "开始时间": datetime.datetime.fromtimestamp(start_time),
+                "结束时间": datetime.datetime.fromtimestamp(end_time) if end_time else None,
+                "耗时": round(end_time - start_time, 3) if end_time else None,
+                "状态": "失败" if failed else "成功",
+                "写入记录数": get_counter(scheduler.metrics, name, "rows_written"),
+                "HTTP请求数": get_counter(scheduler.metrics, name, "http_requests"),
+                "HTTP失败数": get_counter(scheduler.metrics, name, "http_errors"),
+                "重试次数": get_counter(scheduler.metrics, name, "retries"),
+                "下载字节数": get_counter(scheduler.metrics, name, "http_bytes"),
+                "HTTP耗时": round(get_stage_seconds(scheduler.metrics, name, "http"), 3),
+                "数据库耗时": round(
+                    get_stage_seconds(scheduler.metrics, name, "db_write", "db_exec", "watermark"), 3
+                ),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def save_run_logs(scheduler):
+    """
+    写入本次同步的运行记录
+    """
+    cfg = get_cfg()
+    logger = get_logger("sync_run_logs", cfg["sync-logging"]["filename"])
+    try:
+        init_create_table_sync_run_logs()
+        df = build_run_logs(scheduler)
+        if not df.empty:
+            save_to_database(
+                df,
+                "sync_run_logs",
+                get_engine(),
+                index=False,
+                if_exists="append",
+                chunksize=20000,
+            )
+        logger.info(f"Write [{df.shape[0]}] Records Into Table [SYNC_RUN_LOGS]")
+    except Exception:
+        logger.error(f"Table [sync_run_logs] Write Failed", exc_info=True)
+
+
+def query_slowest_tables(days=7, top=10):
+    """
+    最近 days 天平均耗时最长的 top 个同步任务
+    """
+    query = (
+        'SELECT "任务名", COUNT(1) AS "执行次数", AVG("耗时") AS "平均耗时", MAX("耗时") AS "最大耗时", '
+        'AVG("写入记录数") AS "平均写入记录数", AVG("HTTP耗时") AS "平均HTTP耗时", AVG("数据库耗时") AS "平均数据库耗时", '
+        'SUM(CASE WHEN "状态" = \'失败\' THEN 1 ELSE 0 END) AS "失败次数" '
+        f'FROM SYNC_RUN_LOGS WHERE "开始时间" >= SYSDATE - {int(days)} AND "耗时" IS NOT NULL '
+        'GROUP BY "任务名" '
+        f'ORDER BY "平均耗时" DESC FETCH FIRST {int(top)} ROWS ONLY'
+    )
+    return pd.read_sql(query, get_engine())
+
+
+def query_throughput_trend(weeks=8):
+    """
+    各同步任务按周(ISO 周)汇总的耗时及吞吐量(写入记录数/秒), 及与上一周相比的变化率
+    """
+    query = (
+        'SELECT "任务名", TO_CHAR(TRUNC("开始时间", \'IW\'), \'YYYYMMDD\') AS "周", '
+        'SUM("耗时") AS "耗时", SUM("写入记录数") AS "写入记录数", SUM("下载字节数") AS "下载字节数" '
+        f'FROM SYNC_RUN_LOGS WHERE "开始时间" >= TRUNC(SYSDATE, \'IW\') - {7 * (int(weeks) - 1)} AND "耗时" IS NOT NULL '
+        'GROUP BY "任务名", TRUNC("开始时间", \'IW\') '
+        'ORDER BY "任务名", "周"'
+    )
+    df = pd.read_sql(query, get_engine())
+    df["吞吐量"] = df["写入记录数"] / df["耗时"].where(df["耗时"] > 0)
+    df["吞吐量环比"] = df.groupby("任务名")["吞吐量"].pct_change() * 100
+    df["耗时环比"] = df.groupby("任务名")["耗时"].pct_change() * 100
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sync run logs report")
+    parser.add_argument("--days", default=7, type=int, help="最慢任务统计天数")
+    parser.add_argument("--top", default=10, type=int, help="最慢任务数量")
+    parser.add_argument("--weeks", default=8, type=int, help="吞吐量趋势统计周数")
+    args = parser.parse_args()
+
+    print(f"Slowest Tables In Last [{args.days}] Days")
+    print(query_slowest_tables(args.days, args.top))
+    print(f"Weekly Throughput Trend In Last [{args.weeks}] Weeks")
+    print(query_throughput_trend(args.weeks))
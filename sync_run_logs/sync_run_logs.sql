@@ -0,0 +1,30 @@
+BEGIN
+   EXECUTE IMMEDIATE 'DROP TABLE SYNC_RUN_LOGS';
+EXCEPTION
+   WHEN OTHERS THEN NULL;
+END;
+
+CREATE TABLE "AKSHARE"."SYNC_RUN_LOGS"
+   (	"ID" NUMBER(10,0) GENERATED BY DEFAULT AS IDENTITY MINVALUE 1 MAXVALUE 9999999999999999999999999999 INCREMENT BY 1 START WITH 1 CACHE 20 NOORDER  NOCYCLE  NOKEEP  NOSCALE  NOT NULL ENABLE,
+		"任务名" VARCHAR2(64) DEFAULT NULL,
+		"开始时间" DATE DEFAULT NULL,
+		"结束时间" DATE DEFAULT NULL,
+		"耗时" NUMBER(12,3) DEFAULT NULL,
+		"状态" VARCHAR2(12) DEFAULT NULL,
+		"写入记录数" NUMBER(14,0) DEFAULT NULL,
+		"HTTP请求数" NUMBER(12,0) DEFAULT NULL,
+		"HTTP失败数" NUMBER(12,0) DEFAULT NULL,
+		"重试次数" NUMBER(12,0) DEFAULT NULL,
+		"下载字节数" NUMBER(16,0) DEFAULT NULL,
+		"HTTP耗时" NUMBER(12,3) DEFAULT NULL,
+		"数据库耗时" NUMBER(12,3) DEFAULT NULL,
+	    CONSTRAINT "SYNC_RUN_LOGS_PK" PRIMARY KEY ("ID")  USING INDEX PCTFREE 10 INITRANS 2 MAXTRANS 255 COMPUTE STATISTICS  TABLESPACE "AKSHARE"  ENABLE
+   ) SEGMENT CREATION DEFERRED
+  PCTFREE 10 PCTUSED 40 INITRANS 1 MAXTRANS 255
+ NOCOMPRESS LOGGING
+ TABLESPACE "AKSHARE";
+
+
+COMMENT ON TABLE SYNC_RUN_LOGS IS '数据同步运行记录表';
+
+CREATE INDEX SYNC_RUN_LOGS_IDX ON AKSHARE.SYNC_RUN_LOGS ("开始时间", "任务名");
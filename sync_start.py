@@ -3,11 +3,12 @@
 """
 
 import argparse
-import multiprocessing
+import datetime
 
 from fund_etf_spot_em import fund_etf_spot_em
 from fund_name_em import fund_name_em
 from fund_portfolio_hold_em import fund_portfolio_hold_em
+from global_data.global_data import GlobalData
 from stock_basic_info import stock_basic_info
 from stock_board_concept_cons_em import stock_board_concept_cons_em
 from stock_board_concept_hist_em import stock_board_concept_hist_em
@@ -40,6 +41,7 @@ from stock_yysj_em import stock_yysj_em
 from stock_zcfz_em import stock_zcfz_em
 from stock_zh_a_hist_30min_hfq import stock_zh_a_hist_30min_hfq
 from stock_zh_a_hist_30min_qfq import stock_zh_a_hist_30min_qfq
+from stock_zh_a_hist_adj_factor import stock_zh_a_hist_adj_factor
 from stock_zh_a_hist_daily_bfq import stock_zh_a_hist_daily_bfq
 from stock_zh_a_hist_daily_hfq import stock_zh_a_hist_daily_hfq
 from stock_zh_a_hist_daily_qfq import stock_zh_a_hist_daily_qfq
@@ -47,72 +49,174 @@ from stock_zh_a_hist_monthly_hfq import stock_zh_a_hist_monthly_hfq
 from stock_zh_a_hist_monthly_qfq import stock_zh_a_hist_monthly_qfq
 from stock_zh_a_hist_weekly_hfq import stock_zh_a_hist_weekly_hfq
 from stock_zh_a_hist_weekly_qfq import stock_zh_a_hist_weekly_qfq
+from sync_checkpoint.sync_checkpoint import init_create_table_sync_checkpoint
+from sync_logs.sync_logs import GLOBAL_DATA_READY, mark_global_data_ready, query_sync_log_date
+from sync_run_logs.sync_run_logs import init_create_table_sync_run_logs, save_run_logs
+from util.config import get_cfg
+from util.logger import get_logger
+from util.metrics import write_summary
+from util.ratelimit import create_shared_limiters, install_limiters
+from util.resample import is_resample_enabled
+from util.response_cache import prune_cache, set_replay
+from util.scheduler import DagScheduler, Task
+from util.shard import get_shard, set_shard, wait_for_primary
+
+
+# 基础数据: 交易日历、股票列表、港股通成份股、基金列表, GlobalData 依赖这些表
+GLOBAL_DATA_DEPS = [
+    "stock_trade_date",
+    "stock_basic_info",
+    "stock_hk_ggt_components_em",
+    "fund_name_em",
+]
+
+# 按股票代码分片同步的任务, 多主机分片时非 0 号分片仅执行这些任务
+SHARDED_TASKS = {
+    "stock_hk_ccass_records",
+    "stock_zh_a_hist_30min_qfq",
+    "stock_zh_a_hist_30min_hfq",
+    "stock_zh_a_hist_daily_bfq",
+    "stock_zh_a_hist_daily_qfq",
+    "stock_zh_a_hist_daily_hfq",
+    "stock_zh_a_hist_weekly_qfq",
+    "stock_zh_a_hist_weekly_hfq",
+    "stock_zh_a_hist_monthly_qfq",
+    "stock_zh_a_hist_monthly_hfq",
+    "stock_zh_a_hist_adj_factor",
+    "fund_portfolio_hold_em",
+}
+
+
+def build_tasks():
+    """
+    同步任务 DAG: Task(任务名, 同步函数, 参数, 依赖任务, 预估耗时(分钟), 数据源主机)
+    """
+    # 周线/月线由日线表重采样生成时, 依赖对应复权方式的日线表同步完成
+    resample_deps = (
+        {"qfq": ["stock_zh_a_hist_daily_qfq"], "hfq": ["stock_zh_a_hist_daily_hfq"]}
+        if is_resample_enabled()
+        else {"qfq": [], "hfq": []}
+    )
+    return [
+        Task("stock_trade_date", stock_trade_date.sync, (False, False), [], 1, "sina"),  # 交易日历
+        Task("stock_basic_info", stock_basic_info.sync, (False, False), ["stock_trade_date"], 2, "exchange"),  # 股票基本信息: 股票代码、股票名称、交易所、板块
+        Task("stock_hk_ggt_components_em", stock_hk_ggt_components_em.sync, (False, False), [], 1, "eastmoney"),  # 东方财富网-行情中心-港股市场-港股通成份股
+        Task("stock_board_concept_name_em", stock_board_concept_name_em.sync, (False, False), [], 1, "eastmoney"),  # 东方财富网-行情中心-沪深京板块-概念板块
+        Task("stock_board_industry_name_em", stock_board_industry_name_em.sync, (False, False), [], 1, "eastmoney"),  # 东方财富网-行情中心-沪深京板块-行业板块
+        Task("fund_name_em", fund_name_em.sync, (), [], 1, "eastmoney"),  # 东方财富网-天天基金网-基金数据-所有基金的基本信息数据
+        Task(GLOBAL_DATA_READY, mark_global_data_ready, (), GLOBAL_DATA_DEPS, 0, None),  # 基础数据表同步完成, 写入就绪标记供非 0 号分片等待
+        Task("fund_etf_spot_em", fund_etf_spot_em.sync, (False, True), [], 1, "eastmoney"),  # 东方财富网- ETF 实时行情
+        Task("stock_table_api_summary", stock_table_api_summary.sync, (False, False), [], 1, "akshare"),  # 表 API 接口信息
+        Task("stock_hk_short_sale", stock_hk_short_sale.sync, (False, False), [], 10, "sfc"),  # 港股 HK 淡仓申报
+        Task("stock_hk_ccass_records", stock_hk_ccass_records.sync, (False, False), ["stock_trade_date", "stock_hk_ggt_components_em"], 180, "hkex"),  # 香港证监会公示数据-中央结算系統持股记录
+        Task("stock_sse_summary", stock_sse_summary.sync, (False, False), GLOBAL_DATA_DEPS, 1, "sse"),  # 上海证券交易所-股票数据总貌
+        Task("stock_szse_summary", stock_szse_summary.sync, (False, False), GLOBAL_DATA_DEPS, 5, "szse"),  # 深圳证券交易所-市场总貌-证券类别统计
+        Task("stock_szse_area_summary", stock_szse_area_summary.sync, (False, False), [], 2, "szse"),  # 深圳证券交易所-市场总貌-地区交易排序
+        Task("stock_szse_sector_summary", stock_szse_sector_summary.sync, (False, False), [], 2, "szse"),  # 深圳证券交易所-统计资料-股票行业成交数据
+        Task("stock_sse_deal_daily", stock_sse_deal_daily.sync, (False, False), GLOBAL_DATA_DEPS, 5, "sse"),  # 上海证券交易所-数据-股票数据-成交概况-股票成交概况-每日股票情况
+        Task("stock_board_concept_cons_em", stock_board_concept_cons_em.sync, (False, True), ["stock_board_concept_name_em"], 10, "eastmoney"),  # 东方财富-沪深板块-概念板块-板块成份
+        Task("stock_board_concept_hist_em", stock_board_concept_hist_em.sync, (False, True), ["stock_board_concept_name_em"] + GLOBAL_DATA_DEPS, 20, "eastmoney"),  # 东方财富-沪深板块-概念板块-历史行情数据
+        Task("stock_board_industry_cons_em", stock_board_industry_cons_em.sync, (False, True), ["stock_board_industry_name_em"], 5, "eastmoney"),  # 东方财富-沪深板块-行业板块-板块成份
+        Task("stock_board_industry_hist_em", stock_board_industry_hist_em.sync, (False, True), ["stock_board_industry_name_em"] + GLOBAL_DATA_DEPS, 10, "eastmoney"),  # 东方财富-沪深板块-行业板块-历史行情数据
+        Task("stock_value_em", stock_value_em.sync, (False, True), GLOBAL_DATA_DEPS, 10, "eastmoney"),  # 东方财富网-数据中心-估值分析-每日互动-每日互动-估值分析
+        Task("stock_yjbb_em", stock_yjbb_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩报表
+        Task("stock_yjkb_em", stock_yjkb_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩快报
+        Task("stock_yjyg_em", stock_yjyg_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩预告
+        Task("stock_yysj_em", stock_yysj_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-预约披露时间
+        Task("stock_zcfz_em", stock_zcfz_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩快报-资产负债表
+        Task("stock_lrb_em", stock_lrb_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩快报-利润表
+        Task("stock_xjll_em", stock_xjll_em.sync, (False, True), [], 5, "eastmoney"),  # 东方财富-数据中心-年报季报-业绩快报-现金流量表
+        Task("stock_zh_a_hist_30min_qfq", stock_zh_a_hist_30min_qfq.sync, (False, True, 5), GLOBAL_DATA_DEPS, 90, "eastmoney"),  # 东方财富网-行情首页-港股-每日分时行情-30分钟-前复权
+        Task("stock_zh_a_hist_30min_hfq", stock_zh_a_hist_30min_hfq.sync, (False, True, 5), GLOBAL_DATA_DEPS, 90, "eastmoney"),  # 东方财富网-行情首页-港股-每日分时行情-30分钟-后复权
+        Task("stock_zh_a_hist_daily_bfq", stock_zh_a_hist_daily_bfq.sync, (False, True, 5), GLOBAL_DATA_DEPS, 120, "eastmoney"),  # 东方财富-沪深京 A 股日频率数据 - 不复权
+        Task("stock_zh_a_hist_daily_qfq", stock_zh_a_hist_daily_qfq.sync, (False, True, 5), GLOBAL_DATA_DEPS, 120, "eastmoney"),  # 东方财富-沪深京 A 股日频率数据 - 前复权
+        Task("stock_zh_a_hist_daily_hfq", stock_zh_a_hist_daily_hfq.sync, (False, True, 5), GLOBAL_DATA_DEPS, 120, "eastmoney"),  # 东方财富-沪深京 A 股日频率数据 - 后复权
+        Task("stock_zh_a_hist_adj_factor", stock_zh_a_hist_adj_factor.sync, (False,), ["stock_zh_a_hist_daily_bfq", "stock_zh_a_hist_daily_hfq"], 5, None),  # 沪深京 A 股复权因子 (由不复权/后复权日线表计算)
+        Task("stock_zh_a_hist_weekly_qfq", stock_zh_a_hist_weekly_qfq.sync, (False, True, 5), GLOBAL_DATA_DEPS + resample_deps["qfq"], 60, "eastmoney"),  # 东方财富-沪深京 A 股周频率数据 - 前复权
+        Task("stock_zh_a_hist_weekly_hfq", stock_zh_a_hist_weekly_hfq.sync, (False, True, 5), GLOBAL_DATA_DEPS + resample_deps["hfq"], 60, "eastmoney"),  # 东方财富-沪深京 A 股周频率数据 - 后复权
+        Task("stock_zh_a_hist_monthly_qfq", stock_zh_a_hist_monthly_qfq.sync, (False, True, 5), GLOBAL_DATA_DEPS + resample_deps["qfq"], 60, "eastmoney"),  # 东方财富-沪深京 A 股月频率数据 - 前复权
+        Task("stock_zh_a_hist_monthly_hfq", stock_zh_a_hist_monthly_hfq.sync, (False, True, 5), GLOBAL_DATA_DEPS + resample_deps["hfq"], 60, "eastmoney"),  # 东方财富-沪深京 A 股月频率数据 - 后复权
+        # Task("fund_portfolio_hold_em", fund_portfolio_hold_em.sync, (False, True, 15), GLOBAL_DATA_DEPS, 60, "eastmoney"),  # 东方财富网-天天基金网-基金数据-所有基金的基本信息数据
+        Task("stock_margin_sse", stock_margin_sse.sync, (False, False), GLOBAL_DATA_DEPS, 2, "sse"),  # 上海证券交易所-融资融券数据-融资融券汇总数据
+        Task("stock_margin_detail_sse", stock_margin_detail_sse.sync, (False, False), GLOBAL_DATA_DEPS, 20, "sse"),  # 上海证券交易所-融资融券数据-融资融券明细数据
+        Task("stock_margin_szse", stock_margin_szse.sync, (False, False), GLOBAL_DATA_DEPS, 5, "szse"),  # 深圳证券交易所-融资融券数据-融资融券汇总数据
+        Task("stock_margin_detail_szse", stock_margin_detail_szse.sync, (False, False), GLOBAL_DATA_DEPS, 20, "szse"),  # 深圳证券交易所-融资融券数据-融资融券交易明细数据
+    ]
+
+
+def select_shard_tasks(tasks):
+    """
+    非 0 号分片仅保留按股票代码分片的任务, 基础数据表由 0 号分片同步, 去掉对其他任务的依赖
+    """
+    names = {task.name for task in tasks if task.name in SHARDED_TASKS}
+    selected = [task for task in tasks if task.name in names]
+    for task in selected:
+        task.deps = [dep for dep in task.deps if dep in names]
+    return selected
+
+
+def reset_global_data():
+    """
+    清理子进程内缓存的全局数据, 子进程复用时每个任务重新读取基础数据表 (快照)
+    """
+    GlobalData.cache_clear()
+
+
+def wait_for_global_data(logger):
+    """
+    非 0 号分片等待 0 号分片写入当天的基础数据就绪标记 (global_data_ready 任务), 超时后抛出 TimeoutError
+    """
+    cur_date = datetime.datetime.now().strftime("%Y%m%d")
+    wait_for_primary(lambda: query_sync_log_date(GLOBAL_DATA_READY), cur_date, logger)
 
 
 # 全量历史初始化
 def sync(processes_size):
-    stock_trade_date.sync(False, False)  # 交易日历
-    stock_basic_info.sync(False, False)  # 股票基本信息: 股票代码、股票名称、交易所、板块
-    stock_hk_ggt_components_em.sync(False, False)  # 东方财富网-行情中心-港股市场-港股通成份股
-    stock_board_concept_name_em.sync(False, False)  # 东方财富网-行情中心-沪深京板块-概念板块
-    stock_board_industry_name_em.sync(False, False)  # 东方财富网-行情中心-沪深京板块-行业板块
-
-    fund_name_em.sync()  # 东方财富网-天天基金网-基金数据-所有基金的基本信息数据
-    fund_etf_spot_em.sync(False, True) # 东方财富网- ETF 实时行情
-
-    """ 创建执行的线程池对象, 并指定线程池大小, 并提交数据同步task任务  """
-    pool = multiprocessing.Pool(processes=processes_size)
-
-    functions = {
-        stock_table_api_summary.sync: (False, False),  # 表 API 接口信息
-        stock_hk_short_sale.sync: (False, False),  # 港股 HK 淡仓申报
-        stock_hk_ccass_records.sync: (False, False),  # 香港证监会公示数据-中央结算系統持股记录
-        stock_sse_summary.sync: (False, False),  # 上海证券交易所-股票数据总貌
-        stock_szse_summary.sync: (False, False),  # 深圳证券交易所-市场总貌-证券类别统计
-        stock_szse_area_summary.sync: (False, False),  # 深圳证券交易所-市场总貌-地区交易排序
-        stock_szse_sector_summary.sync: (False, False),  # 深圳证券交易所-统计资料-股票行业成交数据
-        stock_sse_deal_daily.sync: (False, False),  # 上海证券交易所-数据-股票数据-成交概况-股票成交概况-每日股票情况
-        stock_board_concept_cons_em.sync: (False, True),  # 东方财富-沪深板块-概念板块-板块成份
-        stock_board_concept_hist_em.sync: (False, True),  # 东方财富-沪深板块-概念板块-历史行情数据
-        stock_board_industry_cons_em.sync: (False, True),  # 东方财富-沪深板块-行业板块-板块成份
-        stock_board_industry_hist_em.sync: (False, True),  # 东方财富-沪深板块-行业板块-历史行情数据
-        stock_value_em.sync: (False, True),  # 东方财富网-数据中心-估值分析-每日互动-每日互动-估值分析
-        stock_yjbb_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩报表
-        stock_yjkb_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩快报
-        stock_yjyg_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩预告
-        stock_yysj_em.sync: (False, True),  # 东方财富-数据中心-年报季报-预约披露时间
-        stock_zcfz_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩快报-资产负债表
-        stock_lrb_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩快报-利润表
-        stock_xjll_em.sync: (False, True),  # 东方财富-数据中心-年报季报-业绩快报-现金流量表
-        stock_zh_a_hist_30min_qfq.sync: (False, True, 5),  # 东方财富网-行情首页-港股-每日分时行情-30分钟-前复权
-        stock_zh_a_hist_30min_hfq.sync: (False, True, 5),  # 东方财富网-行情首页-港股-每日分时行情-30分钟-后复权
-        stock_zh_a_hist_daily_bfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股日频率数据 - 不复权
-        stock_zh_a_hist_daily_qfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股日频率数据 - 前复权
-        stock_zh_a_hist_daily_hfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股日频率数据 - 后复权
-        stock_zh_a_hist_weekly_qfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股周频率数据 - 前复权
-        stock_zh_a_hist_weekly_hfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股周频率数据 - 后复权
-        stock_zh_a_hist_monthly_qfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股月频率数据 - 前复权
-        stock_zh_a_hist_monthly_hfq.sync: (False, True, 5),  # 东方财富-沪深京 A 股月频率数据 - 后复权
-        # fund_portfolio_hold_em.sync: (False, True, 15),  # 东方财富网-天天基金网-基金数据-所有基金的基本信息数据
-        stock_margin_sse.sync: (False, False),  # 上海证券交易所-融资融券数据-融资融券汇总数据
-        stock_margin_detail_sse.sync: (False, False),  # 上海证券交易所-融资融券数据-融资融券明细数据
-        stock_margin_szse.sync: (False, False, 5),  # 深圳证券交易所-融资融券数据-融资融券汇总数据
-        stock_margin_detail_szse.sync: (False, False),  # 深圳证券交易所-融资融券数据-融资融券交易明细数据
-    }
-
-    results = [pool.apply_async(function, args=param) for function, param in functions.items()]
-
-    """ 关闭进程池，不再接受新的任务"""
-    pool.close()
-
-    """ 等待所有任务完成 """
-    pool.join()
-
-    """ 收集任务结果 """
-    for result in results:
-        print(result.get())
-
-    stock_table_summary.sync()  # Stock 表汇总信息
+    tasks = build_tasks()
+    index, count = get_shard()
+    if index != 0:
+        tasks = select_shard_tasks(tasks)
+    print(f"Sync Shard [{index}/{count}] Tasks [{len(tasks)}]")
+
+    cfg = get_cfg()
+    if index != 0:
+        """ 基础数据表 (交易日历、股票列表等) 由 0 号分片同步, 等待其当天同步完成后再执行 """
+        wait_for_global_data(get_logger("shard", cfg["sync-logging"]["filename"]))
+
+    """ 同步进程共用的检查点表及运行记录表在调度前创建, 同步进程不再执行建表脚本 """
+    init_create_table_sync_checkpoint()
+    init_create_table_sync_run_logs()
+
+    """ 清理过期的原始响应缓存 """
+    prune_cache(get_logger("response_cache", cfg["sync-logging"]["filename"]))
+
+    """ 各数据源主机的限流器由所有同步进程共享 """
+    limiters = create_shared_limiters()
+
+    """ 按任务依赖关系调度执行, 关键路径长的任务优先启动 """
+    scheduler = DagScheduler(
+        tasks,
+        processes_size,
+        initializer=install_limiters,
+        initargs=(limiters,),
+        before_task=reset_global_data,
+    )
+    failed = scheduler.run()
+    for name, error in failed.items():
+        print(f"Task [{name}] Failed: {error}")
+
+    if index == 0:
+        """ Stock 表汇总信息, 调度结束后执行, 部分任务失败时仍汇总已同步的表 """
+        try:
+            stock_table_summary.sync()
+        except Exception as error:
+            print(f"Task [stock_table_summary] Failed: {error}")
+
+    """ 输出各任务阶段耗时及计数统计 """
+    write_summary(scheduler.metrics, get_logger("metrics", cfg["sync-logging"]["filename"]))
+
+    """ 各任务运行记录写入 SYNC_RUN_LOGS 表 """
+    save_run_logs(scheduler)
 
 
 def use_age():
@@ -122,8 +226,14 @@ def use_age():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="sync mode args")
     parser.add_argument("--processes", default=12, type=int, help="同步并发线程池大小")
+    parser.add_argument("--shard", default=None, help="多主机分片同步 i/N (i 从 0 开始), 默认读取 application.ini [shard]")
+    parser.add_argument("--replay", action="store_true", help="回放模式: 仅从本地响应缓存读取数据, 不访问网络")
     args = parser.parse_args()
     processes = args.processes
-    print(f"Exec With Args:--processes [{processes}]")
+    print(f"Exec With Args:--processes [{processes}] --shard [{args.shard}] --replay [{args.replay}]")
+    if args.shard is not None:
+        set_shard(args.shard)
+    if args.replay:
+        set_replay()
 
     sync(processes)
@@ -0,0 +1,67 @@
+"""
+多主机分片同步: 非 0 号分片等待 0 号分片基础数据就绪标记
+
+执行: python -m unittest discover -s tests -t .
+"""
+
+import logging
+import unittest
+
+from util.shard import wait_for_primary
+
+TODAY = "20261019"
+LAST_WEEK = "20261012"
+
+
+class FakeClock:
+    """
+    模拟时钟, sleep 时推进时间, 不实际等待
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class WaitForPrimaryTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.logger = logging.getLogger("test_shard")
+
+    def wait(self, query_ready_date):
+        return wait_for_primary(
+            query_ready_date, TODAY, self.logger, sleep=self.clock.sleep, clock=self.clock.clock
+        )
+
+    def test_skip_day_does_not_block(self):
+        # 按周更新的基础数据表当天跳过同步, SYNC_LOGS 中的日期停留在上周, 0 号分片仍写入当天的就绪标记
+        sync_logs = {
+            "stock_trade_date": TODAY,
+            "stock_basic_info": TODAY,
+            "stock_hk_ggt_components_em": LAST_WEEK,
+            "fund_name_em": LAST_WEEK,
+            "global_data_ready": TODAY,
+        }
+        self.assertEqual(self.wait(lambda: sync_logs.get("global_data_ready")), TODAY)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_wait_until_marker_written(self):
+        dates = iter([None, LAST_WEEK, TODAY])
+        self.assertEqual(self.wait(lambda: next(dates)), TODAY)
+        self.assertEqual(len(self.clock.sleeps), 2)
+
+    def test_timeout_without_marker(self):
+        with self.assertRaises(TimeoutError):
+            self.wait(lambda: LAST_WEEK)
+        self.assertGreater(len(self.clock.sleeps), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+"""
+异步抓取 + 独立写库线程流水线
+1. 抓取阶段: asyncio + aiohttp 在单个进程内并发请求, 共享 ClientSession 复用 HTTP keep-alive 连接, 并发数由 asyncio.Semaphore 控制,
+   同时受限流器进程间并发信号量 ([rate-limit.<host>] concurrency) 约束
+2. 写库阶段: 独立线程从有界队列中读取抓取结果写入数据库, 抓取协程不占用数据库连接; 队列已满时抓取协程等待, 控制内存占用
+3. 请求参数与 akshare 一致 (东方财富 push2his K 线接口), 每次请求(含重试)均经过 util/ratelimit.py 的主机限流
+配置读取 application.ini [async-fetch]
+"""
+
+import asyncio
+import functools
+import json
+import queue
+import threading
+
+import aiohttp
+import pandas as pd
+from tenacity import retry, stop_after_attempt, wait_incrementing
+
+from util import metrics
+from util.config import get_cfg
+from util.ratelimit import get_limiter, is_backpressure
+from util.retry import log_retry_stats
+
+EM_KLINE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+
+EM_PERIOD = {"daily": "101", "weekly": "102", "monthly": "103"}
+
+EM_ADJUST = {"": "0", "qfq": "1", "hfq": "2"}
+
+HIST_COLUMNS = [
+    "日期",
+    "开盘",
+    "收盘",
+    "最高",
+    "最低",
+    "成交量",
+    "成交额",
+    "振幅",
+    "涨跌幅",
+    "涨跌额",
+    "换手率",
+]
+
+_STOP = object()
+
+# 协程轮询限流器并发名额的间隔秒数
+ACQUIRE_POLL_INTERVAL = 0.05
+
+
+def is_async_fetch_enabled():
+    """
+    按股票代码同步的表是否使用异步抓取流水线, 读取 application.ini [async-fetch] enabled 配置
+    """
+    cfg = get_cfg()
+    return cfg.getboolean("async-fetch", "enabled", fallback=False)
+
+
+def get_async_fetch_cfg():
+    """
+    读取异步抓取配置: 并发请求数、结果队列大小、单次请求超时秒数
+    """
+    cfg = get_cfg()
+    return (
+        cfg.getint("async-fetch", "concurrency", fallback=8),
+        cfg.getint("async-fetch", "queue_size", fallback=64),
+        cfg.getfloat("async-fetch", "timeout", fallback=20),
+    )
+
+
+def async_rate_limited(host):
+    """
+    协程限流装饰器, 需置于 @retry 之下; 令牌桶等待使用 asyncio.sleep, 不阻塞事件循环,
+    进程间并发信号量以非阻塞方式轮询获取, 与其他同步进程共享同一主机的并发数上限
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            metrics.count("http_requests")
+            limiter = get_limiter(host)
+            if limiter is None:
+                with metrics.timer("http", kwargs.get("symbol")):
+                    return await func(*args, **kwargs)
+            await asyncio.sleep(limiter.reserve())
+            while not limiter.try_acquire():
+                await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+            try:
+                with metrics.timer("http", kwargs.get("symbol")):
+                    result = await func(*args, **kwargs)
+            except Exception as error:
+                metrics.count("http_errors")
+                if is_backpressure(error):
+                    limiter.on_failure()
+                raise
+            finally:
+                limiter.release()
+            limiter.on_success()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@retry(
+    stop=stop_after_attempt(10),
+    wait=wait_incrementing(start=5, increment=5, max=60),
+    before_sleep=log_retry_stats,
+    reraise=True,
+)
+@async_rate_limited("eastmoney")
+async def stock_zh_a_hist(
+        session: aiohttp.ClientSession,
+        symbol: str,
+        period: str,
+        start_date: str,
+        end_date: str,
+        adjust: str,
+) -> pd.DataFrame:
+    """
+    东方财富-沪深京 A 股历史行情, 请求参数及返回格式与 akshare.stock_zh_a_hist 一致, 日期列为 YYYYMMDD 字符串
+    """
+    params = {
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f116",
+        "ut": "7eea3edcaed734bea9cbfc24409ed989",
+        "klt": EM_PERIOD[period],
+        "fqt": EM_ADJUST[adjust],
+        "secid": f"{1 if symbol.startswith('6') else 0}.{symbol}",
+        "beg": start_date,
+        "end": end_date,
+    }
+    async with session.get(EM_KLINE_URL, params=params) as response:
+        response.raise_for_status()
+        body = await response.read()
+    metrics.count("http_bytes", len(body))
+    data_json = json.loads(body)
+    if not (data_json["data"] and data_json["data"]["klines"]):
+        return pd.DataFrame()
+
+    df = pd.DataFrame(
+        [item.split(",")[: len(HIST_COLUMNS)] for item in data_json["data"]["klines"]],
+        columns=HIST_COLUMNS,
+    )
+    df["日期"] = df["日期"].str.replace("-", "", regex=False)
+    for column in HIST_COLUMNS[1:]:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df.insert(1, "股票代码", symbol)
+    return df
+
+
+async def fetch_all(items, fetch, results, concurrency, timeout, errors):
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            trust_env=True,
+    ) as session:
+
+        async def worker(item):
+            async with semaphore:
+                # 写库失败后不再发起新的请求
+                if errors:
+                    return
+                result = await fetch(session, item)
+                # 队列已满时在线程中等待且不释放并发名额, 抓取速度受写库速度约束, 不阻塞事件循环
+                await asyncio.to_thread(results.put, (item, result))
+
+        # 任一抓取任务失败时取消其余任务并等待其结束, 再抛出首个异常
+        tasks = [asyncio.ensure_future(worker(item)) for item in items]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+def run_pipeline(items, fetch, write, logger, concurrency=None, queue_size=None, timeout=None):
+    """
+    执行异步抓取 + 写库流水线
+
+    :param items: 抓取任务参数列表
+    :param fetch: 抓取协程 async def fetch(session, item), 返回抓取结果
+    :param write: 写库函数 def write(item, result), 在写库线程中依次执行
+    :return: 写库成功的任务数
+    """
+    default_concurrency, default_queue_size, default_timeout = get_async_fetch_cfg()
+    concurrency = concurrency or default_concurrency
+    queue_size = queue_size or default_queue_size
+    timeout = timeout or default_timeout
+
+    results = queue.Queue(maxsize=queue_size)
+    errors = []
+    written = [0]
+
+    def writer():
+        while True:
+            entry = results.get()
+            if entry is _STOP:
+                return
+            # 写库失败后继续取出队列数据, 避免抓取协程阻塞在已满的队列上
+            if errors:
+                continue
+            try:
+                write(*entry)
+                written[0] += 1
+            except Exception as e:
+                logger.error(f"Async Pipeline Write Failed, Item [{entry[0]}]", exc_info=True)
+                errors.append(e)
+
+    logger.info(
+        f"Exec Async Pipeline Items [{len(items)}] Concurrency [{concurrency}] QueueSize [{queue_size}]"
+    )
+    thread = threading.Thread(target=writer, name="async-fetch-writer", daemon=True)
+    thread.start()
+    try:
+        asyncio.run(fetch_all(items, fetch, results, concurrency, timeout, errors))
+    finally:
+        results.put(_STOP)
+        thread.join()
+    if errors:
+        raise errors[0]
+    logger.info(f"Finish Async Pipeline Items [{len(items)}] Written [{written[0]}]")
+    return written[0]
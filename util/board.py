@@ -0,0 +1,117 @@
+"""
+板块数据并发同步
+1. 概念板块、行业板块的历史行情及成份股表共用, 按板块代码逐个下载
+2. 同步水位 (各板块最大日期) 由一次 GROUP BY 查询获取, 替代逐个板块查询 MAX("日期")
+3. 各板块数据在线程池中并发下载 (并发数读取 application.ini [board-sync] max_workers, 数据源限流仍由 @rate_limited 控制),
+   下载结果按 batch_boards 个板块合并后在同一事务内写入; 成份股表按板块代码先删除历史数据再写入
+4. 某个板块下载失败时, 已下载完成的板块先写入数据库再抛出异常, 下次同步按各板块水位继续
+"""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from util.config import get_cfg
+from util.metrics import timed
+from util.resample import in_condition
+from util.tools import replace_to_database, save_to_database
+
+
+def get_board_sync_cfg():
+    cfg = get_cfg()
+    return {
+        "max_workers": cfg.getint("board-sync", "max_workers", fallback=8),
+        "batch_boards": cfg.getint("board-sync", "batch_boards", fallback=50),
+    }
+
+
+@timed("watermark")
+def query_board_watermarks(table_name, engine, logger):
+    """
+    各板块的最大日期 {板块代码: YYYYMMDD}
+    """
+    query_sql = f'SELECT "板块代码" as board_code, MAX("日期") as max_date FROM {table_name.upper()} GROUP BY "板块代码"'
+    logger.info(f"Execute Query SQL  [{query_sql}]")
+    df = pd.read_sql(query_sql, engine)
+    return {
+        board_code: str(int(max_date))
+        for board_code, max_date in zip(df["board_code"], df["max_date"])
+    }
+
+
+def plan_boards(boards, watermarks, default_date, end_date):
+    """
+    按同步水位计算各板块的开始日期 (水位次日), 返回开始日期不晚于 end_date 的板块 (board_code, board_name, start_date)
+    """
+    boards = boards.copy()
+    boards["start_date"] = [
+        (
+                datetime.datetime.strptime(watermarks.get(board_code, default_date), "%Y%m%d")
+                + relativedelta(days=1)
+        ).strftime("%Y%m%d")
+        for board_code in boards["board_code"]
+    ]
+    return boards[boards["start_date"] <= end_date].reset_index(drop=True)
+
+
+def write_boards(table_name, frames, engine, replace):
+    df = pd.concat([df for _, df in frames], ignore_index=True)
+    if replace:
+        # Oracle IN 列表最多 1000 项, batch_boards 配置较大时由 in_condition 拆分
+        replace_to_database(df, table_name, engine, in_condition("板块代码", [board_code for board_code, _ in frames]))
+    elif not df.empty:
+        save_to_database(
+            df,
+            table_name,
+            engine,
+            index=False,
+            if_exists="append",
+            chunksize=20000,
+        )
+    return df.shape[0]
+
+
+def sync_boards(table_name, boards, fetch, engine, logger, replace=False, max_workers=None, batch_boards=None):
+    """
+    并发下载各板块的数据, 按批次合并写入
+
+    :param boards: 待同步的板块 (board_code, board_name, start_date), 参考 plan_boards
+    :param fetch: 下载并整理单个板块的数据, fetch(board) -> DataFrame, board 为 boards 的一行 (itertuples)
+    :param replace: 写入前按板块代码删除历史数据 (成份股表), 否则追加写入 (历史行情表); 返回空数据的板块不删除历史数据
+    """
+    board_cfg = get_board_sync_cfg()
+    max_workers = max_workers or board_cfg["max_workers"]
+    batch_boards = batch_boards or board_cfg["batch_boards"]
+    board_size = len(boards)
+    logger.info(
+        f"Sync Table[{table_name}] Boards[{board_size}] Workers[{max_workers}] BatchBoards[{batch_boards}]"
+    )
+    frames = []
+    written = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, board): board for board in boards.itertuples(index=False)}
+        try:
+            for index, future in enumerate(as_completed(futures)):
+                board = futures[future]
+                df = future.result()
+                logger.info(
+                    f"Exec [{index + 1}/{board_size}]: Fetch Table[{table_name}] board_code[{board.board_code}] board_name[{board.board_name}] Records[{df.shape[0]}]"
+                )
+                if not df.empty:
+                    frames.append((board.board_code, df))
+                if len(frames) >= batch_boards:
+                    written += write_boards(table_name, frames, engine, replace)
+                    frames = []
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            if frames:
+                written += write_boards(table_name, frames, engine, replace)
+            raise
+        if frames:
+            written += write_boards(table_name, frames, engine, replace)
+    logger.info(
+        f"Write [{written}] records into table [{table_name}] Boards[{board_size}]"
+    )
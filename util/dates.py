@@ -0,0 +1,22 @@
+"""
+日期列向量化转换
+数据库日期列为 NUMBER(8) YYYYMMDD, 数据源返回的日期列为 datetime.date / Timestamp / YYYY-MM-DD 字符串,
+整列一次转换为 datetime64 后按 年*10000 + 月*100 + 日 计算, 避免逐行调用 strftime / replace
+"""
+
+import pandas as pd
+
+
+def to_date_number(values):
+    """
+    日期列转换为 YYYYMMDD 整数 (int64), 保留原索引
+    """
+    dates = pd.to_datetime(pd.Series(values))
+    return (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype("int64")
+
+
+def to_date_str(values):
+    """
+    日期列转换为 YYYYMMDD 字符串, 保留原索引
+    """
+    return to_date_number(values).astype(str)
@@ -0,0 +1,221 @@
+"""
+同步阶段耗时及计数统计
+1. timer(stage) 上下文管理器统计各阶段耗时 (http / db_write / db_exec / watermark ...), count(name) 累加计数 (记录数、重试次数 ...)
+2. 统计数据按 (同步模块, 阶段) 在进程内汇总, 线程安全; 带股票代码的阶段同时按股票代码汇总耗时
+3. DagScheduler 在子进程中执行任务时设置当前同步模块, 任务结束后将统计快照返回父进程
+4. sync_start.py 执行结束后汇总输出 JSON Lines 及 Prometheus textfile, 路径读取 application.ini [metrics]
+"""
+
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from util.config import get_cfg
+
+_lock = threading.Lock()
+_module = None
+_stages = {}
+_counters = {}
+_symbols = {}
+
+
+def set_module(name):
+    """
+    设置当前进程正在执行的同步模块, 并清空上一个任务的统计数据
+    """
+    global _module
+    with _lock:
+        _module = name
+        _stages.clear()
+        _counters.clear()
+        _symbols.clear()
+
+
+def get_module():
+    return _module or "unknown"
+
+
+@contextmanager
+def timer(stage, symbol=None):
+    """
+    统计代码块耗时, 异常时同样计入
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        module = get_module()
+        with _lock:
+            stat = _stages.setdefault((module, stage), [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+            if symbol is not None:
+                key = (module, stage, symbol)
+                _symbols[key] = _symbols.get(key, 0.0) + elapsed
+
+
+def timed(stage):
+    """
+    函数耗时统计装饰器, 如 @timed("watermark") 统计同步水位查询耗时
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value=1):
+    module = get_module()
+    with _lock:
+        _counters[(module, name)] = _counters.get((module, name), 0) + value
+
+
+def snapshot(top_symbols=10):
+    """
+    当前进程的统计数据, 每个阶段输出耗时最长的 top_symbols 个股票代码
+    """
+    with _lock:
+        records = [
+            {
+                "module": module,
+                "stage": stage,
+                "calls": stat[0],
+                "seconds": round(stat[1], 3),
+                "max_seconds": round(stat[2], 3),
+                "top_symbols": [
+                    [symbol, round(seconds, 3)]
+                    for (m, s, symbol), seconds in sorted(
+                        _symbols.items(), key=lambda item: item[1], reverse=True
+                    )
+                    if m == module and s == stage
+                ][:top_symbols],
+            }
+            for (module, stage), stat in _stages.items()
+        ]
+        records.extend(
+            {"module": module, "counter": name, "value": value}
+            for (module, name), value in _counters.items()
+        )
+    return records
+
+
+def install_http_metrics():
+    """
+    统计 requests 下载字节数 (akshare 内部使用 requests), 每个进程安装一次
+    """
+    from requests.adapters import HTTPAdapter
+
+    if getattr(HTTPAdapter.send, "metrics_installed", False):
+        return
+    send = HTTPAdapter.send
+
+    @functools.wraps(send)
+    def send_with_metrics(self, request, stream=False, **kwargs):
+        response = send(self, request, stream=stream, **kwargs)
+        if stream:
+            size = int(response.headers.get("Content-Length", 0) or 0)
+        else:
+            size = len(response.content)
+        count("http_bytes", size)
+        return response
+
+    send_with_metrics.metrics_installed = True
+    HTTPAdapter.send = send_with_metrics
+
+
+def get_counter(records, module, name):
+    """
+    从统计快照中读取计数, 不存在时返回 0
+    """
+    for record in records:
+        if record["module"] == module and record.get("counter") == name:
+            return record["value"]
+    return 0
+
+
+def get_stage_seconds(records, module, *stages):
+    """
+    从统计快照中读取阶段耗时合计
+    """
+    return sum(
+        record["seconds"]
+        for record in records
+        if record["module"] == module and record.get("stage") in stages
+    )
+
+
+def get_metrics_path(key, default_name):
+    cfg = get_cfg()
+    path = cfg.get("metrics", key, fallback="")
+    if path == "":
+        path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "..",
+            "logs",
+            str(datetime.datetime.now().strftime("%Y-%m-%d")),
+            default_name,
+        )
+    return os.path.abspath(path)
+
+
+def to_prometheus(records):
+    lines = [
+        "# TYPE akshare_sync_stage_seconds_total counter",
+        "# TYPE akshare_sync_stage_calls_total counter",
+        "# TYPE akshare_sync_stage_max_seconds gauge",
+        "# TYPE akshare_sync_counter_total counter",
+    ]
+    for record in records:
+        if "stage" in record:
+            labels = f'module="{record["module"]}",stage="{record["stage"]}"'
+            lines.append(f"akshare_sync_stage_seconds_total{{{labels}}} {record['seconds']}")
+            lines.append(f"akshare_sync_stage_calls_total{{{labels}}} {record['calls']}")
+            lines.append(f"akshare_sync_stage_max_seconds{{{labels}}} {record['max_seconds']}")
+        else:
+            labels = f'module="{record["module"]}",name="{record["counter"]}"'
+            lines.append(f"akshare_sync_counter_total{{{labels}}} {record['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_summary(records, logger):
+    """
+    输出统计汇总: JSON Lines (每行一条记录) 及 Prometheus textfile (node_exporter textfile collector 格式)
+    """
+    json_file = get_metrics_path("json_file", "metrics.jsonl")
+    prom_file = get_metrics_path("prom_file", "metrics.prom")
+    for path in (json_file, prom_file):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(json_file, "a", encoding="UTF-8") as file:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for record in records:
+            file.write(json.dumps({"time": timestamp, **record}, ensure_ascii=False) + "\n")
+
+    # 先写临时文件再替换, 避免 textfile collector 读到不完整的文件
+    tmp_file = f"{prom_file}.tmp"
+    with open(tmp_file, "w", encoding="UTF-8") as file:
+        file.write(to_prometheus(records))
+    os.replace(tmp_file, prom_file)
+
+    stages = sorted(
+        (record for record in records if "stage" in record),
+        key=lambda record: record["seconds"],
+        reverse=True,
+    )
+    for record in stages[:20]:
+        logger.info(
+            f"Metrics Module [{record['module']:<32}] Stage [{record['stage']:<10}] Calls [{record['calls']:8}] Cost [{record['seconds']:10.1f}s] Max [{record['max_seconds']:8.1f}s]"
+        )
+    logger.info(f"Write Metrics [{len(records)}] Records To [{json_file}] [{prom_file}]")
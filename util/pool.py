@@ -0,0 +1,127 @@
+"""
+Oracle 进程级连接池
+1. 每个进程持有一个 oracledb 连接池, 连接池大小读取 application.ini [oracle] pool_min / pool_max / pool_increment 配置
+2. get_engine / get_connection / exec_sql 等共享函数均从连接池获取连接, 连接 close 后归还连接池
+3. multiprocessing 子进程 fork 后重建连接池, 不复用父进程的连接
+4. 统计连接池命中(复用空闲连接)/未命中(新建连接)次数及获取连接的等待时间
+5. 默认使用 oracledb Thin 模式, 无需安装 Oracle Instant Client; [oracle] thick_mode=true 时加载 client_win / client_macos / client_linux
+   指定的 Instant Client 使用 Thick 模式
+"""
+
+import os
+import platform
+import threading
+import time
+
+import oracledb
+
+from util.config import get_cfg
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_stats = {}
+
+
+def _reset_stats():
+    _stats.update(
+        {
+            "acquire": 0,
+            "hit": 0,
+            "miss": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+    )
+
+
+def _reset_after_fork():
+    """
+    fork 后的子进程丢弃父进程的连接池引用, 首次使用时重新创建
+    """
+    global _lock, _pool, _pool_pid
+    _lock = threading.Lock()
+    _pool = None
+    _pool_pid = None
+    _reset_stats()
+
+
+def init_thick_mode(cfg):
+    """
+    按配置启用 Thick 模式, 进程内只能初始化一次 (fork 的子进程继承父进程的初始化状态)
+    """
+    if not cfg.getboolean("oracle", "thick_mode", fallback=False) or not oracledb.is_thin_mode():
+        return
+    option = {"Darwin": "client_macos", "Windows": "client_win"}.get(platform.system(), "client_linux")
+    lib_dir = cfg.get("oracle", option, fallback=None) or None
+    oracledb.init_oracle_client(lib_dir=lib_dir)
+
+
+_reset_stats()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool():
+    """
+    获取当前进程的连接池, 不存在时创建
+    """
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            cfg = get_cfg()
+            init_thick_mode(cfg)
+            params = oracledb.PoolParams(
+                host=cfg["oracle"]["host"],
+                port=int(cfg["oracle"]["port"]),
+                service_name=cfg["oracle"]["service_name"],
+                min=cfg.getint("oracle", "pool_min", fallback=1),
+                max=cfg.getint("oracle", "pool_max", fallback=16),
+                increment=cfg.getint("oracle", "pool_increment", fallback=1),
+                getmode=oracledb.POOL_GETMODE_WAIT,
+            )
+            _pool = oracledb.create_pool(
+                user=cfg["oracle"]["user"],
+                password=cfg["oracle"]["password"],
+                params=params,
+            )
+            _pool_pid = os.getpid()
+            _reset_stats()
+    return _pool
+
+
+def acquire():
+    """
+    从连接池获取连接, 连接 close() 后归还连接池
+    """
+    pool = get_pool()
+    opened = pool.opened
+    start = time.perf_counter()
+    conn = pool.acquire()
+    wait = time.perf_counter() - start
+    with _lock:
+        _stats["acquire"] += 1
+        # 连接池打开的连接数增加说明本次未命中空闲连接 (并发获取时为近似值)
+        if pool.opened > opened:
+            _stats["miss"] += 1
+        else:
+            _stats["hit"] += 1
+        _stats["wait_seconds"] += wait
+        _stats["max_wait_seconds"] = max(_stats["max_wait_seconds"], wait)
+    return conn
+
+
+def get_pool_stats():
+    """
+    当前进程连接池统计信息
+    """
+    with _lock:
+        stats = dict(_stats)
+    if _pool is not None and _pool_pid == os.getpid():
+        stats["opened"] = _pool.opened
+        stats["busy"] = _pool.busy
+        stats["max"] = _pool.max
+    stats["pid"] = os.getpid()
+    return stats
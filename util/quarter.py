@@ -0,0 +1,73 @@
+"""
+年报季报数据按季报日期并发同步
+1. 业绩报表、业绩快报、业绩预告、预约披露时间、资产负债表、利润表、现金流量表等按季报日期下载的表共用
+2. 各季报日期的数据在线程池中并发下载及整理, 并发数读取 application.ini [quarter-sync] max_workers (数据源限流仍由 @rate_limited 控制)
+3. 按季报日期顺序逐季写入, 每个季报日期在同一事务内删除历史数据并写入新数据 (replace_to_database);
+   某个季报日期下载失败时不再写入其后的季报日期, 保证表中最大季报日期之前的数据完整, 下次同步从最大季报日期继续
+"""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from dateutil.relativedelta import relativedelta
+
+from util.config import get_cfg
+from util.tools import replace_to_database
+
+
+def get_quarter_workers():
+    cfg = get_cfg()
+    return cfg.getint("quarter-sync", "max_workers", fallback=4)
+
+
+def get_sync_date_list(start_date, end_date, forward=-1):
+    """
+    start_date 所在季度 (向前 forward 个季度) 至 end_date 之前的各季报日期 (季度最后一天, YYYYMMDD)
+    """
+    start_month = datetime.datetime.strptime(
+        str(start_date)[0:6], "%Y%m"
+    ) + relativedelta(months=forward * 3)
+    date_list = []
+    while start_month.strftime("%Y%m") < str(end_date)[0:6]:
+        date_list.append(start_month.strftime("%Y%m"))
+        start_month = start_month + relativedelta(months=3)
+    for index, element in enumerate(date_list):
+        date_list[index] = (
+            date_list[index] + "31"
+            if (date_list[index][-2:] == "03" or date_list[index][-2:] == "12")
+            else date_list[index] + "30"
+        )
+    return date_list
+
+
+def sync_quarters(table_name, date_list, fetch, engine, logger, on_quarter=None, max_workers=None):
+    """
+    并发下载各季报日期的数据, 按季报日期顺序逐季替换写入
+
+    :param table_name: 表名
+    :param date_list: 季报日期列表 (升序)
+    :param fetch: 下载并整理单个季报日期的数据, fetch(date) -> DataFrame, 空 DataFrame 不写入
+    :param on_quarter: 每个季报日期写入完成后调用, on_quarter(date)
+    """
+    if not date_list:
+        return
+    max_workers = max_workers or get_quarter_workers()
+    logger.info(
+        f"Sync Table[{table_name}] Quarters[{date_list[0]} - {date_list[-1]}] Size[{len(date_list)}] Workers[{max_workers}]"
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch, date) for date in date_list]
+        try:
+            for date, future in zip(date_list, futures):
+                df = future.result()
+                if df is not None and not df.empty:
+                    replace_to_database(df, table_name, engine, f'"季报日期"={date}')
+                    logger.info(
+                        f"Write [{df.shape[0]}] records into table [{table_name}] 季报日期[{date}]"
+                    )
+                if on_quarter is not None:
+                    on_quarter(date)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
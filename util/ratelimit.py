@@ -0,0 +1,212 @@
+"""
+数据源主机请求限流
+1. 按数据源主机(eastmoney / sse / szse / sfc / hkex ...)限流, 配置读取 application.ini [rate-limit.<host>]
+2. 令牌桶及并发数在 sync_start.py 启动的所有同步进程间共享 (multiprocessing 共享内存), 未配置的主机不限流
+3. 自适应限速(AIMD): 请求成功后速率线性增加, 连接异常、超时及 HTTP 429/5xx 后速率减半, 在 [min_rate, max_rate] 区间内寻找数据源可承受的最大速率;
+   停牌/退市股票无数据等解析异常 (KeyError / TypeError / ValueError ...) 不视为数据源压力, 不降速
+4. rate_limited 装饰器置于 tenacity @retry 之下, 每次重试均经过限流, 并统计请求次数及耗时 (util/metrics.py)
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import time
+
+import requests
+
+from util import metrics
+from util.config import get_cfg
+from util.logger import get_logger
+
+SECTION_PREFIX = "rate-limit."
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_limiters = None
+
+
+class HostLimiter:
+    """
+    单个数据源主机的令牌桶和并发控制, 状态保存在进程间共享内存中
+
+    rate: 初始速率(每秒请求数)
+    min_rate / max_rate: 自适应速率上下限
+    burst: 令牌桶容量, 允许的瞬时突发请求数
+    concurrency: 所有进程合计的最大并发请求数
+    increase: 每次请求成功后速率增加值
+    decrease: 请求失败后速率乘数
+    cooldown: 两次降速的最小间隔秒数, 避免并发失败时速率被连续减半
+    """
+
+    def __init__(
+            self,
+            host,
+            rate,
+            min_rate,
+            max_rate,
+            burst=1,
+            concurrency=8,
+            increase=0.05,
+            decrease=0.5,
+            cooldown=5.0,
+    ):
+        self.host = host
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.lock = multiprocessing.Lock()
+        self.semaphore = multiprocessing.BoundedSemaphore(concurrency)
+        self.rate = multiprocessing.Value("d", rate, lock=False)
+        self.tokens = multiprocessing.Value("d", burst, lock=False)
+        self.updated = multiprocessing.Value("d", time.time(), lock=False)
+        self.last_decrease = multiprocessing.Value("d", 0.0, lock=False)
+
+    def reserve(self):
+        """
+        预约一个令牌, 返回获得令牌前需等待的秒数; 令牌不足时记为欠额, 后续请求依次顺延
+        """
+        with self.lock:
+            now = time.time()
+            rate = self.rate.value
+            tokens = min(
+                self.burst, self.tokens.value + (now - self.updated.value) * rate
+            )
+            tokens -= 1
+            self.tokens.value = tokens
+            self.updated.value = now
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    def acquire(self):
+        time.sleep(self.reserve())
+        self.semaphore.acquire()
+
+    def try_acquire(self):
+        """
+        非阻塞获取并发名额, 供协程轮询使用
+        """
+        return self.semaphore.acquire(block=False)
+
+    def release(self):
+        self.semaphore.release()
+
+    def on_success(self):
+        with self.lock:
+            self.rate.value = min(self.max_rate, self.rate.value + self.increase)
+
+    def on_failure(self):
+        with self.lock:
+            now = time.time()
+            if now - self.last_decrease.value < self.cooldown:
+                return
+            self.last_decrease.value = now
+            self.rate.value = max(self.min_rate, self.rate.value * self.decrease)
+            rate = self.rate.value
+        cfg = get_cfg()
+        logger = get_logger("ratelimit", cfg["sync-logging"]["filename"])
+        logger.warning(f"Host [{self.host}] Request Failed, Slow Down To [{rate:.2f}] Requests/Second")
+
+
+def load_limiters():
+    """
+    按 application.ini 中的 [rate-limit.<host>] 配置创建各主机限流器
+    """
+    cfg = get_cfg()
+    limiters = {}
+    for section in cfg.sections():
+        if not section.startswith(SECTION_PREFIX):
+            continue
+        host = section[len(SECTION_PREFIX):]
+        rate = cfg.getfloat(section, "rate")
+        limiters[host] = HostLimiter(
+            host,
+            rate=rate,
+            min_rate=cfg.getfloat(section, "min_rate", fallback=rate / 10),
+            max_rate=cfg.getfloat(section, "max_rate", fallback=rate),
+            burst=cfg.getint(section, "burst", fallback=1),
+            concurrency=cfg.getint(section, "concurrency", fallback=8),
+            increase=cfg.getfloat(section, "increase", fallback=0.05),
+            decrease=cfg.getfloat(section, "decrease", fallback=0.5),
+            cooldown=cfg.getfloat(section, "cooldown", fallback=5.0),
+        )
+    return limiters
+
+
+def install_limiters(limiters):
+    """
+    设置当前进程使用的限流器, 作为进程池 initializer 使子进程共享父进程创建的限流器
+    """
+    global _limiters
+    _limiters = limiters
+
+
+def create_shared_limiters():
+    """
+    在父进程中创建限流器, 返回值需通过进程池 initializer(install_limiters) 传递给子进程
+    """
+    limiters = load_limiters()
+    install_limiters(limiters)
+    return limiters
+
+
+def get_limiter(host):
+    """
+    获取主机限流器, 未经父进程共享时(单独执行某个模块)在当前进程内创建
+    """
+    if _limiters is None:
+        install_limiters(load_limiters())
+    return _limiters.get(host)
+
+
+def is_backpressure(error):
+    """
+    异常是否表示数据源主机压力: 连接异常、超时、HTTP 429 及 5xx (requests / aiohttp)
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    if aiohttp is not None:
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status == 429 or error.status >= 500
+        if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError)):
+            return True
+    return False
+
+
+def rate_limited(host):
+    """
+    限流装饰器, 需置于 @retry 之下, 使每次请求(含重试)都经过令牌桶限流和并发控制
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics.count("http_requests")
+            limiter = get_limiter(host)
+            if limiter is None:
+                with metrics.timer("http", kwargs.get("symbol")):
+                    return func(*args, **kwargs)
+            limiter.acquire()
+            try:
+                with metrics.timer("http", kwargs.get("symbol")):
+                    result = func(*args, **kwargs)
+            except Exception as error:
+                metrics.count("http_errors")
+                if is_backpressure(error):
+                    limiter.on_failure()
+                raise
+            finally:
+                limiter.release()
+            limiter.on_success()
+            return result
+
+        return wrapper
+
+    return decorator
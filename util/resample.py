@@ -0,0 +1,228 @@
+"""
+日线数据重采样生成周线/月线
+1. 基于已同步的日线表(STOCK_ZH_A_HIST_DAILY_QFQ/HFQ)按交易日历生成周线/月线, 代替逐个股票从东方财富下载周线/月线数据
+2. 按 (股票代码, 周期) 分组向量化聚合: 开盘取首日、收盘取末日、最高/最低取极值、成交量/成交额/换手率求和, 日期取该股票周期内最后交易日
+3. 涨跌额、涨跌幅、振幅以上一周期收盘价(周期首日收盘价 - 首日涨跌额)为基准计算
+4. 仅生成截止日期前已结束的周期(按交易日历判断周期最后交易日)
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from util.config import get_cfg
+from util.tools import replace_to_database, save_to_database
+from util.watermark import SyncWatermark
+
+PERIOD_FREQ = {"weekly": "W-SUN", "monthly": "M"}
+
+# 增量重采样的水位回看天数, 水位早于该范围的股票(如长期停牌)整体重建
+LOOKBACK_DAYS = {"weekly": 62, "monthly": 124}
+
+BAR_COLUMNS = [
+    "日期",
+    "股票代码",
+    "开盘",
+    "收盘",
+    "最高",
+    "最低",
+    "成交量",
+    "成交额",
+    "振幅",
+    "涨跌幅",
+    "涨跌额",
+    "换手率",
+]
+
+
+def is_resample_enabled():
+    """
+    周线/月线表是否由日线表重采样生成, 读取 application.ini [resample] enabled 配置
+    """
+    cfg = get_cfg()
+    return cfg.getboolean("resample", "enabled", fallback=False)
+
+
+def to_period(dates, period):
+    return pd.to_datetime(dates, format="%Y%m%d").dt.to_period(PERIOD_FREQ[period])
+
+
+def period_start_date(date, period):
+    """
+    日期所在周期的第一天
+    """
+    return (
+        pd.Timestamp(date).to_period(PERIOD_FREQ[period]).start_time.strftime("%Y%m%d")
+    )
+
+
+def resample_bars(daily, period, trade_dates, end_date):
+    """
+    日线数据重采样为周线/月线
+    :param daily: 日线数据, 日期为 YYYYMMDD 字符串
+    :param period: weekly | monthly
+    :param trade_dates: 交易日历 (YYYYMMDD 字符串列表), 用于判断周期是否已结束
+    :param end_date: 截止日期, 仅返回周期最后交易日不晚于截止日期的数据
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    df = daily.sort_values(["股票代码", "日期"], kind="stable").reset_index(drop=True)
+    df["周期"] = to_period(df["日期"], period)
+    df["前收盘"] = df["收盘"] - df["涨跌额"]
+
+    bars = (
+        df.groupby(["股票代码", "周期"], sort=False)
+        .agg(
+            日期=("日期", "max"),
+            开盘=("开盘", "first"),
+            收盘=("收盘", "last"),
+            最高=("最高", "max"),
+            最低=("最低", "min"),
+            成交量=("成交量", "sum"),
+            成交额=("成交额", "sum"),
+            换手率=("换手率", "sum"),
+            前收盘=("前收盘", "first"),
+        )
+        .reset_index()
+    )
+
+    # 按交易日历过滤未结束的周期
+    calendar = pd.Series(sorted(trade_dates))
+    period_end = calendar.groupby(to_period(calendar, period)).max()
+    bar_period_end = bars["周期"].map(period_end)
+    bars = bars[bar_period_end.notna() & (bar_period_end <= end_date)].copy()
+
+    prev_close = bars["前收盘"].replace(0, np.nan)
+    bars["涨跌额"] = (bars["收盘"] - bars["前收盘"]).round(2)
+    bars["涨跌幅"] = (bars["涨跌额"] / prev_close * 100).round(2)
+    bars["振幅"] = ((bars["最高"] - bars["最低"]) / prev_close * 100).round(2)
+    bars["换手率"] = bars["换手率"].round(2)
+    bars["成交额"] = bars["成交额"].round(2)
+    return bars[BAR_COLUMNS].reset_index(drop=True)
+
+
+def in_condition(column, values, alias=None):
+    """
+    生成 IN 条件, Oracle IN 列表最多 1000 项, 超出时拆分为多个 IN 条件; alias 为多表关联时的表别名
+    """
+    values = list(values)
+    column = f'{alias}."{column}"' if alias else f'"{column}"'
+    items = [
+        ", ".join(f"'{v}'" for v in values[i: i + 1000])
+        for i in range(0, len(values), 1000)
+    ]
+    return "(" + " OR ".join(f"{column} IN ({item})" for item in items) + ")"
+
+
+def load_daily(daily_table, engine, logger, start_date=None, trade_codes=None):
+    """
+    读取日线数据, 可按起始日期及股票代码过滤
+    """
+    conditions = []
+    if start_date is not None:
+        conditions.append(f'"日期" >= {start_date}')
+    if trade_codes is not None:
+        conditions.append(in_condition("股票代码", trade_codes))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = (
+        f'SELECT "日期", "股票代码", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "涨跌额", "换手率" '
+        f"FROM {daily_table}{where}"
+    )
+    logger.info(f"Execute Query SQL  [{query[:500]}]")
+    df = pd.read_sql(query, engine)
+    df["日期"] = df["日期"].astype("int64").astype(str)
+    return df
+
+
+def sync_resampled(
+        table_name,
+        daily_table,
+        period,
+        end_date,
+        trade_dates,
+        trade_codes,
+        engine,
+        logger,
+        rebuild_batch=200,
+):
+    """
+    由日线表增量生成周线/月线表数据
+
+    增量: 周线/月线水位在 LOOKBACK_DAYS 之内的股票, 读取水位所在周期起的日线数据统一重采样,
+        水位所在周期重采样结果的日期和收盘价与表中最后一条记录一致时, 写入水位之后的周期
+    重建: 表中无数据、水位过旧或水位所在周期不一致(复权数据已变动)的股票, 删除后由全部日线数据重新生成, 按 rebuild_batch 个股票分批处理
+    """
+    watermark = SyncWatermark(table_name, "19700101", close_column="收盘").load(
+        engine, logger
+    )
+    daily_watermark = SyncWatermark(daily_table, "19700101").load(engine, logger)
+    cutoff = (
+            datetime.datetime.strptime(end_date, "%Y%m%d")
+            - datetime.timedelta(days=LOOKBACK_DAYS[period])
+    ).strftime("%Y%m%d")
+
+    incremental = []
+    rebuild = []
+    for trade_code in trade_codes:
+        daily_last = daily_watermark.get_last_sync_date(trade_code)
+        last_date = watermark.get_last_sync_date(trade_code)
+        if daily_last <= last_date:
+            continue
+        if last_date >= cutoff:
+            incremental.append(trade_code)
+        else:
+            rebuild.append(trade_code)
+    logger.info(
+        f"Resample [{daily_table}] To [{table_name}] EndDate[{end_date}] Incremental[{len(incremental)}] Rebuild[{len(rebuild)}]"
+    )
+
+    total = 0
+    if incremental:
+        start_date = period_start_date(
+            min(watermark.get_last_sync_date(c) for c in incremental), period
+        )
+        daily = load_daily(daily_table, engine, logger, start_date=start_date)
+        daily = daily[daily["股票代码"].isin(incremental)]
+        bars = resample_bars(daily, period, trade_dates, end_date)
+
+        last_date = bars["股票代码"].map(watermark.get_last_sync_date)
+        last_close = (
+            bars["股票代码"]
+            .map(lambda c: watermark.get_last_sync_info(c)[1])
+            .astype("float64")
+        )
+        anchor = (bars["日期"] == last_date) & np.isclose(
+            bars["收盘"], last_close, atol=0.005
+        )
+        matched = set(bars.loc[anchor, "股票代码"])
+        rebuild.extend(code for code in incremental if code not in matched)
+
+        bars = bars[bars["股票代码"].isin(matched) & (bars["日期"] > last_date)]
+        if not bars.empty:
+            save_to_database(
+                bars,
+                table_name.lower(),
+                engine,
+                index=False,
+                if_exists="append",
+                chunksize=20000,
+            )
+        total += bars.shape[0]
+
+    for i in range(0, len(rebuild), rebuild_batch):
+        trade_code_batch = rebuild[i: i + rebuild_batch]
+        daily = load_daily(daily_table, engine, logger, trade_codes=trade_code_batch)
+        bars = resample_bars(daily, period, trade_dates, end_date)
+        # 同一事务内删除该批股票的历史数据并写入重采样结果, 中途失败时不会丢失历史数据
+        where = in_condition("股票代码", trade_code_batch)
+        logger.info(f"Execute Replace [{table_name}] Where [{where[:500]}]")
+        replace_to_database(bars, table_name.lower(), engine, where)
+        total += bars.shape[0]
+        logger.info(
+            f"Resample [{table_name}] Rebuild [{i + len(trade_code_batch)}/{len(rebuild)}] Symbols"
+        )
+
+    logger.info(f"Resample [{table_name}] Write[{total}] Records")
+    return total
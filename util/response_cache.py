@@ -0,0 +1,220 @@
+"""
+数据源原始响应本地缓存
+1. @cached_response 包装数据下载函数 (置于 @retry 之外), 按 函数名 + 参数 的 sha256 作为缓存键, 下载结果写入压缩 Parquet 文件,
+   重试、重新执行及修改表结构后重新初始化时直接读取缓存, 不再重复下载
+2. 缓存有效期按接口规则区分: immutable 规则判定为已固定的历史数据 (如截止日期早于今天的不复权行情) 永久有效,
+   其他数据 (当日未收盘数据、前复权数据等) 按 application.ini [response-cache] ttl 过期
+3. 回放模式 (replay) 仅读取缓存, 不访问网络, 忽略有效期; 缓存未命中时, 按日期区间下载的接口由同一分区 (如同一股票、周期、复权方式)
+   的全部缓存拼接后按日期截取, 否则抛出 ResponseCacheMiss; 前复权数据随分红除权整体变动, 不同时间下载的缓存不可拼接, 不做区间回放
+4. 缓存文件先写入临时文件再原子替换, 多进程并发写入时读取方不会读到不完整的文件
+5. 超过 application.ini [response-cache] max_age 天未更新的缓存文件 (含已固定的历史数据) 由 prune_cache 删除, sync_start.py 启动时执行
+"""
+
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import pandas as pd
+
+from util import metrics
+from util.config import get_cfg
+from util.logger import get_logger
+
+ENV_REPLAY = "AKSHARE_SYNC_REPLAY"
+
+
+class ResponseCacheMiss(LookupError):
+    """
+    回放模式下缓存未命中
+    """
+
+
+def get_response_cache_cfg():
+    """
+    读取缓存开关、回放模式、缓存目录(相对路径基于项目根目录)、有效期秒数及压缩方式
+    """
+    cfg = get_cfg()
+    cache_dir = cfg.get("response-cache", "cache_dir", fallback=".cache/responses")
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.abspath(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", cache_dir)
+        )
+    replay = os.environ.get(ENV_REPLAY)
+    return {
+        "enabled": cfg.getboolean("response-cache", "enabled", fallback=False),
+        "replay": replay == "1" if replay is not None else cfg.getboolean("response-cache", "replay", fallback=False),
+        "cache_dir": cache_dir,
+        "ttl": cfg.getint("response-cache", "ttl", fallback=3600),
+        "compression": cfg.get("response-cache", "compression", fallback="zstd"),
+        "max_age": cfg.getint("response-cache", "max_age", fallback=90),
+    }
+
+
+def set_replay(replay=True):
+    """
+    设置当前进程及其子进程的回放模式
+    """
+    os.environ[ENV_REPLAY] = "1" if replay else "0"
+
+
+def cache_key(name, arguments):
+    text = json.dumps([name, arguments], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_cache(path):
+    return pd.read_parquet(path, memory_map=True)
+
+
+def write_cache(df, path, compression, logger):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False, compression=compression)
+        os.replace(tmp_path, path)
+    except Exception:
+        logger.warning(f"Write Response Cache [{path}] Failed", exc_info=True)
+
+
+def prune_cache(logger):
+    """
+    删除超过 max_age 天未更新的缓存文件及残留的临时文件, max_age 为 0 时不清理; 回放模式下不清理
+    """
+    cfg = get_response_cache_cfg()
+    if not cfg["enabled"] or cfg["replay"] or cfg["max_age"] <= 0:
+        return 0
+    expire_time = time.time() - cfg["max_age"] * 86400
+    removed = 0
+    for pattern in ("*.parquet", "*.tmp"):
+        for path in glob.glob(os.path.join(cfg["cache_dir"], "*", "*", pattern)):
+            try:
+                if os.path.getmtime(path) < expire_time:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                logger.warning(f"Remove Response Cache [{path}] Failed", exc_info=True)
+    logger.info(f"Prune Response Cache [{cfg['cache_dir']}] MaxAge[{cfg['max_age']}] Days Removed[{removed}]")
+    return removed
+
+
+def replay_range(partition_dir, date_column, start_date, end_date):
+    """
+    拼接分区内全部缓存, 按日期截取 [start_date, end_date], 同一日期保留最近写入的记录
+    """
+    paths = sorted(glob.glob(os.path.join(partition_dir, "*.parquet")), key=os.path.getmtime)
+    if not paths:
+        return None
+    df = pd.concat([read_cache(path) for path in paths], ignore_index=True)
+    if df.empty:
+        return df
+    dates = pd.to_datetime(df[date_column])
+    df = df[
+        (dates >= pd.to_datetime(start_date, format="%Y%m%d"))
+        & (dates <= pd.to_datetime(end_date, format="%Y%m%d"))
+    ]
+    df = df.drop_duplicates(subset=[date_column], keep="last")
+    return df.sort_values(date_column, key=pd.to_datetime).reset_index(drop=True)
+
+
+def cached_response(name, immutable=None, ranged=None, date_column="日期", ignore=("timeout",)):
+    """
+    下载结果缓存装饰器, 规则函数以下载函数的参数(关键字参数形式)调用
+
+    :param name: 接口名, 作为缓存目录名
+    :param immutable: 判断下载结果是否为已固定的历史数据, 是则缓存永久有效
+    :param ranged: 按日期区间下载的接口返回 (分区参数, 开始日期, 结束日期), 回放模式下由同一分区的缓存拼接; 返回 None 时不拼接
+    :param date_column: 按日期区间下载的接口结果中的日期列
+    :param ignore: 不影响下载结果的参数, 不参与缓存键计算
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cfg = get_response_cache_cfg()
+            if not cfg["enabled"] and not cfg["replay"]:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in ignore}
+            partition = "_"
+            date_range = ranged(**bound.arguments) if ranged is not None else None
+            if date_range is not None:
+                partition_args, start_date, end_date = date_range
+                partition = cache_key(name, partition_args)[:16]
+            partition_dir = os.path.join(cfg["cache_dir"], name, partition)
+            key = cache_key(name, arguments)
+            fixed_path = os.path.join(partition_dir, f"{key}.immutable.parquet")
+            path = os.path.join(partition_dir, f"{key}.parquet")
+
+            logger = get_logger("response_cache", get_cfg()["sync-logging"]["filename"])
+            for candidate in (fixed_path, path):
+                if not os.path.exists(candidate):
+                    continue
+                if (
+                        candidate == path
+                        and not cfg["replay"]
+                        and time.time() - os.path.getmtime(candidate) >= cfg["ttl"]
+                ):
+                    continue
+                try:
+                    df = read_cache(candidate)
+                    metrics.count("cache_hits")
+                    return df
+                except Exception:
+                    logger.warning(f"Read Response Cache [{candidate}] Failed", exc_info=True)
+
+            if cfg["replay"]:
+                if date_range is not None:
+                    df = replay_range(partition_dir, date_column, start_date, end_date)
+                    if df is not None:
+                        metrics.count("cache_hits")
+                        return df
+                raise ResponseCacheMiss(f"Response Cache Miss [{name}] args[{arguments}]")
+
+            metrics.count("cache_misses")
+            df = func(*args, **kwargs)
+            if isinstance(df, pd.DataFrame):
+                is_fixed = immutable is not None and immutable(**bound.arguments)
+                write_cache(df, fixed_path if is_fixed else path, cfg["compression"], logger)
+            return df
+
+        return wrapper
+
+    return decorator
+
+
+def is_before_today(date):
+    """
+    日期 (YYYYMMDD) 早于今天, 即该日期的数据已收盘固定
+    """
+    return str(date) < time.strftime("%Y%m%d")
+
+
+def is_days_before(date, days):
+    """
+    日期 (YYYYMMDD) 早于今天 days 天以上
+    """
+    return str(date) < time.strftime("%Y%m%d", time.localtime(time.time() - days * 86400))
+
+
+def kline_immutable(symbol, period, start_date, end_date, adjust, **kwargs):
+    """
+    K 线行情: 截止日期早于今天的不复权/后复权数据已固定, 前复权数据随分红除权变动
+    """
+    return adjust != "qfq" and is_before_today(end_date)
+
+
+def kline_range(symbol, period, start_date, end_date, adjust, **kwargs):
+    """
+    K 线行情: 按 股票代码、周期、复权方式 分区; 前复权数据的历史价格随除权变动, 不同时间下载的缓存不可拼接, 不分区回放
+    """
+    if adjust == "qfq":
+        return None
+    return (symbol, period, adjust), start_date, end_date
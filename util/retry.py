@@ -1,7 +1,9 @@
+from util import metrics
 from util.logger import get_logger
 
 
 def log_retry_stats(retry_state):
+    metrics.count("retries")
     logger = get_logger("retry", "data-sync")
     fn_name = retry_state.fn.__name__
     attempt = retry_state.attempt_number
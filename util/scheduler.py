@@ -0,0 +1,246 @@
+"""
+同步任务 DAG 调度
+1. 声明式任务图: 任务名、同步函数、参数、依赖任务、预估耗时(分钟)、数据源主机
+2. 依赖满足的任务按关键路径长度(自身耗时 + 下游最长耗时)优先启动, 长耗时任务链最先执行
+3. 按数据源主机限制并发任务数, 避免同一数据源被过多进程同时访问
+4. 执行结束后输出各任务耗时、实际关键路径和理论关键路径
+5. 任务在子进程中按任务名汇总阶段耗时及计数 (util/metrics.py), 统计快照返回父进程保存在 metrics 中
+6. 同步模块捕获异常后记录 sync_failed 计数 (不向外抛出), 任务结束时计数大于 0 则视为失败 (TaskFailed), 依赖该任务的下游任务不再执行
+7. 子进程在多个任务间复用, 每个任务执行前调用 before_task (如清理进程内缓存的全局数据), 避免读取前序任务更新前的数据
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from util import metrics
+from util.config import get_cfg
+from util.logger import get_logger
+
+
+class Task:
+    """
+    DAG 任务节点
+
+    name: 任务名, 一般为表名
+    func: 同步函数, 需为模块级函数 (子进程中执行)
+    args: 同步函数参数
+    deps: 依赖的任务名列表, 依赖任务全部成功后才会启动
+    cost: 预估耗时(分钟), 用于计算调度优先级
+    host: 数据源主机, 用于限制同一数据源的并发任务数
+    """
+
+    def __init__(self, name, func, args=(), deps=(), cost=1, host=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = list(deps)
+        self.cost = cost
+        self.host = host
+
+
+class TaskFailed(RuntimeError):
+    """
+    同步模块内部已捕获并记录的失败 (sync_failed 计数大于 0), 携带任务的统计快照
+    """
+
+    def __init__(self, name, records):
+        super().__init__(f"Task [{name}] Sync Failed")
+        self.name = name
+        self.records = records
+
+    def __reduce__(self):
+        return TaskFailed, (self.name, self.records)
+
+
+def run_task(name, func, args, before_task=None):
+    """
+    子进程中执行任务, 返回任务的阶段耗时及计数统计; 模块记录了同步失败时抛出 TaskFailed
+    """
+    if before_task is not None:
+        before_task()
+    metrics.set_module(name)
+    metrics.install_http_metrics()
+    with metrics.timer("task"):
+        func(*args)
+    records = metrics.snapshot()
+    if metrics.get_counter(records, name, "sync_failed") > 0:
+        raise TaskFailed(name, records)
+    return records
+
+
+def get_host_limits():
+    """
+    读取 application.ini [scheduler] 中各数据源主机的最大并发任务数, 未配置的主机不限制
+    """
+    cfg = get_cfg()
+    if not cfg.has_section("scheduler"):
+        return {}
+    return {host: int(limit) for host, limit in cfg.items("scheduler")}
+
+
+class DagScheduler:
+    def __init__(self, tasks, max_workers, host_limits=None, initializer=None, initargs=(), before_task=None):
+        cfg = get_cfg()
+        self.logger = get_logger("scheduler", cfg["sync-logging"]["filename"])
+        self.tasks = {task.name: task for task in tasks}
+        self.max_workers = max_workers
+        self.host_limits = get_host_limits() if host_limits is None else host_limits
+        # 子进程初始化函数, 如共享父进程创建的限流器
+        self.initializer = initializer
+        self.initargs = initargs
+        # 每个任务执行前在子进程中调用的函数, 需为模块级函数
+        self.before_task = before_task
+        self.dependents = {name: [] for name in self.tasks}
+        for task in tasks:
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task [{task.name}] depends on unknown task [{dep}]")
+                self.dependents[dep].append(task.name)
+        self.order = self.topological_order()
+        self.rank = self.upward_rank({name: task.cost for name, task in self.tasks.items()})
+        self.start_time = {}
+        self.end_time = {}
+        self.failed = {}
+        self.skipped = []
+        self.metrics = []
+
+    def topological_order(self):
+        indegree = {name: len(task.deps) for name, task in self.tasks.items()}
+        queue = [name for name, degree in indegree.items() if degree == 0]
+        order = []
+        while queue:
+            name = queue.pop()
+            order.append(name)
+            for child in self.dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+        if len(order) != len(self.tasks):
+            cycle = sorted(name for name, degree in indegree.items() if degree > 0)
+            raise ValueError(f"Task graph has cycle among {cycle}")
+        return order
+
+    def upward_rank(self, weights):
+        """
+        任务到 DAG 终点的最长路径耗时 (含自身), 即任务的调度优先级
+        """
+        rank = {}
+        for name in reversed(self.order):
+            rank[name] = weights[name] + max(
+                (rank[child] for child in self.dependents[name]), default=0
+            )
+        return rank
+
+    def host_available(self, task, running_hosts):
+        limit = self.host_limits.get(task.host)
+        return limit is None or running_hosts.get(task.host, 0) < limit
+
+    def run(self):
+        """
+        执行全部任务, 返回失败任务 {任务名: 异常}
+        """
+        pending = {name: set(task.deps) for name, task in self.tasks.items()}
+        ready = [name for name, deps in pending.items() if not deps]
+        running = {}
+        running_hosts = {}
+        begin = time.time()
+
+        self.logger.info(
+            f"Exec DAG Schedule Tasks [{len(self.tasks)}] Workers [{self.max_workers}] HostLimits {self.host_limits}"
+        )
+        with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.initializer,
+                initargs=self.initargs,
+        ) as executor:
+            while ready or running:
+                # 关键路径最长的任务优先启动
+                ready.sort(key=lambda n: self.rank[n], reverse=True)
+                for name in list(ready):
+                    if len(running) >= self.max_workers:
+                        break
+                    task = self.tasks[name]
+                    if not self.host_available(task, running_hosts):
+                        continue
+                    ready.remove(name)
+                    running_hosts[task.host] = running_hosts.get(task.host, 0) + 1
+                    self.start_time[name] = time.time()
+                    self.logger.info(
+                        f"Start Task [{name}] Rank [{self.rank[name]}] Host [{task.host}]"
+                    )
+                    running[executor.submit(run_task, name, task.func, task.args, self.before_task)] = name
+
+                if not running:
+                    # 主机并发限制配置为 0 时任务无法启动
+                    self.logger.error(f"Tasks {ready} Blocked By Host Limits {self.host_limits}")
+                    self.skipped.extend(ready)
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    task = self.tasks[name]
+                    running_hosts[task.host] -= 1
+                    self.end_time[name] = time.time()
+                    duration = self.end_time[name] - self.start_time[name]
+                    error = future.exception()
+                    if error is not None:
+                        self.failed[name] = error
+                        if isinstance(error, TaskFailed):
+                            self.metrics.extend(error.records)
+                        self.logger.error(
+                            f"Task [{name}] Failed After [{duration:.1f}s], Caused By [{error}]"
+                        )
+                        self.skip_dependents(name, pending)
+                        continue
+                    self.logger.info(f"Finish Task [{name}] Cost [{duration:.1f}s]")
+                    self.metrics.extend(future.result())
+                    for child in self.dependents[name]:
+                        if child in pending:
+                            pending[child].discard(name)
+                            if not pending[child]:
+                                ready.append(child)
+                    pending.pop(name, None)
+
+        self.report(time.time() - begin)
+        return self.failed
+
+    def skip_dependents(self, name, pending):
+        pending.pop(name, None)
+        for child in self.dependents[name]:
+            if child in pending:
+                self.skipped.append(child)
+                self.logger.error(f"Skip Task [{child}], Dependency [{name}] Failed")
+                self.skip_dependents(child, pending)
+
+    def report(self, wall_seconds):
+        durations = {
+            name: self.end_time[name] - self.start_time[name] for name in self.end_time
+        }
+        for name in sorted(durations, key=durations.get, reverse=True):
+            self.logger.info(
+                f"Task [{name:<32}] Cost [{durations[name]:10.1f}s] Estimate [{self.tasks[name].cost}min]"
+            )
+
+        # 实际关键路径: 从最后结束的任务开始, 逐级回溯最晚结束的依赖任务
+        path = []
+        name = max(self.end_time, key=self.end_time.get) if self.end_time else None
+        while name is not None:
+            path.append(name)
+            deps = [dep for dep in self.tasks[name].deps if dep in self.end_time]
+            name = max(deps, key=self.end_time.get) if deps else None
+        path.reverse()
+        self.logger.info(
+            f"Critical Path [{' -> '.join(path)}] Wall Clock [{wall_seconds:.1f}s]"
+        )
+
+        # 理论关键路径: 按实际耗时计算的 DAG 最长路径, 即不受进程数和主机并发限制时的最短完成时间
+        if len(durations) == len(self.tasks):
+            rank = self.upward_rank(durations)
+            self.logger.info(
+                f"Lower Bound Of Wall Clock [{max(rank.values()):.1f}s], Failed [{len(self.failed)}], Skipped [{len(self.skipped)}]"
+            )
+        else:
+            self.logger.info(
+                f"Failed [{len(self.failed)}], Skipped [{len(self.skipped)}]"
+            )
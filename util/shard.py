@@ -0,0 +1,91 @@
+"""
+按股票代码分片同步
+1. 多台主机各自执行 sync_start.py --shard i/N (i 从 0 开始), 按股票代码 crc32 取模确定性划分股票列表, 各主机使用各自的出口 IP 和限流额度
+2. 分片参数通过环境变量传递给同步子进程, 未指定时读取 application.ini [shard] shard, 默认 0/1 (不分片)
+3. 仅按股票代码同步的任务参与分片, 其余任务只在 0 号分片执行; 非 0 号分片等待 0 号分片写入当天的基础数据就绪标记后再执行,
+   且不更新 SYNC_LOGS 中整张表的同步日期 (各股票的完成情况记录在 SYNC_CHECKPOINT)
+"""
+
+import os
+import time
+import zlib
+
+from util.config import get_cfg
+
+ENV_SHARD = "AKSHARE_SYNC_SHARD"
+
+
+def parse_shard(text):
+    """
+    解析分片参数 i/N, 返回 (i, N)
+    """
+    try:
+        index, count = (int(value) for value in str(text).split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard [{text}], expected i/N")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard [{text}], expected 0 <= i < N")
+    return index, count
+
+
+def set_shard(text):
+    """
+    设置当前进程及其子进程的分片
+    """
+    parse_shard(text)
+    os.environ[ENV_SHARD] = str(text)
+
+
+def get_shard():
+    text = os.environ.get(ENV_SHARD)
+    if text is None:
+        cfg = get_cfg()
+        text = cfg.get("shard", "shard", fallback="0/1")
+    return parse_shard(text)
+
+
+def get_shard_wait_cfg():
+    """
+    非 0 号分片等待基础数据表同步完成的超时秒数及轮询间隔秒数
+    """
+    cfg = get_cfg()
+    return (
+        cfg.getint("shard", "wait_timeout", fallback=7200),
+        cfg.getint("shard", "wait_interval", fallback=60),
+    )
+
+
+def wait_for_primary(query_ready_date, cur_date, logger, sleep=time.sleep, clock=time.time):
+    """
+    非 0 号分片等待 0 号分片写入 cur_date 当天的基础数据就绪标记, 超时后抛出 TimeoutError
+
+    :param query_ready_date: 查询就绪标记日期的函数, 未写入时返回 None
+    """
+    wait_timeout, wait_interval = get_shard_wait_cfg()
+    deadline = clock() + wait_timeout
+    while True:
+        ready_date = query_ready_date()
+        if ready_date is not None and ready_date >= cur_date:
+            return ready_date
+        if clock() >= deadline:
+            raise TimeoutError(f"Wait For Global Data Ready [{cur_date}] Timeout [{wait_timeout}] Seconds, Ready Date [{ready_date}]")
+        logger.info(f"Wait For Global Data Ready [{cur_date}] By Primary Shard, Ready Date [{ready_date}], Retry After [{wait_interval}] Seconds")
+        sleep(wait_interval)
+
+
+def is_primary_shard():
+    return get_shard()[0] == 0
+
+
+def shard_of(code, count):
+    return zlib.crc32(str(code).encode("utf-8")) % count
+
+
+def shard_filter(df, column):
+    """
+    过滤出当前分片负责的股票, 不分片时原样返回
+    """
+    index, count = get_shard()
+    if count == 1:
+        return df
+    return df[df[column].map(lambda code: shard_of(code, count) == index)]
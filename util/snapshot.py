@@ -0,0 +1,76 @@
+"""
+全局共享数据本地快照
+1. 股票列表、交易日历、港股通成份股、基金列表等全局数据首次加载后写入 Parquet 快照文件, 同一台机器上的同步进程直接内存映射读取, 不再重复查询数据库或下载
+2. 快照按 application.ini [global-data] ttl 过期, 文件名带版本号, 数据结构变化时递增 SNAPSHOT_VERSION 使旧快照失效
+3. 基础数据表同步完成后调用 invalidate_snapshot 删除对应快照, 后续任务重新加载
+4. 快照先写入临时文件再原子替换, 多个进程同时重建时读取方不会读到不完整的文件
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from util.config import get_cfg
+
+SNAPSHOT_VERSION = 1
+
+
+def get_snapshot_cfg():
+    """
+    读取快照目录(相对路径基于项目根目录)和有效期秒数, 有效期为 0 时不使用快照
+    """
+    cfg = get_cfg()
+    cache_dir = cfg.get("global-data", "cache_dir", fallback=".cache")
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.abspath(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", cache_dir)
+        )
+    return cache_dir, cfg.getint("global-data", "ttl", fallback=43200)
+
+
+def snapshot_path(name):
+    cache_dir, _ = get_snapshot_cfg()
+    return os.path.join(cache_dir, f"{name}.v{SNAPSHOT_VERSION}.parquet")
+
+
+def load_snapshot(name, loader, logger):
+    """
+    读取快照, 快照不存在、已过期或读取失败时调用 loader 重新加载并写入快照
+
+    :param name: 快照名
+    :param loader: 加载函数, 返回 DataFrame
+    """
+    cache_dir, ttl = get_snapshot_cfg()
+    if ttl <= 0:
+        return loader()
+
+    path = snapshot_path(name)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        try:
+            df = pd.read_parquet(path, memory_map=True)
+            logger.info(f"Load Snapshot [{name}] From [{path}] Records[{df.shape[0]}]")
+            return df
+        except Exception:
+            logger.warning(f"Load Snapshot [{name}] From [{path}] Failed, Reload", exc_info=True)
+
+    df = loader()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        logger.info(f"Write Snapshot [{name}] To [{path}] Records[{df.shape[0]}]")
+    except Exception:
+        logger.warning(f"Write Snapshot [{name}] To [{path}] Failed", exc_info=True)
+    return df
+
+
+def invalidate_snapshot(*names):
+    """
+    删除快照, 基础数据表同步后调用
+    """
+    for name in names:
+        path = snapshot_path(name)
+        if os.path.exists(path):
+            os.remove(path)
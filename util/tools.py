@@ -5,86 +5,49 @@
 2. 提供 tushare DataApi 对象函数
 """
 
+import hashlib
 import os
-import platform
 import re
-import sys
 from pathlib import Path
 
-import cx_Oracle
 import oracledb
 import pandas as pd
 import sqlparse
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
 
+from util import metrics
 from util.config import get_cfg
 from util.logger import get_logger
+from util.pool import acquire
 
 
-def once_init_decorator(func):
-    called = False
+_engines = {}
 
-    def wrapper(*args, **kwargs):
-        nonlocal called
-        if not called:
-            called = True
-            return func(*args, **kwargs)
-        else:
-            return None
-
-    return wrapper
-
-
-@once_init_decorator
-def init_oracle_client():
-    cfg = get_cfg()
-    lib_dir = (
-        cfg["oracle"]["client_macos"]
-        if platform.system() == "Darwin"
-        else cfg["oracle"]["client_win"]
-    )
-    try:
-        cx_Oracle.init_oracle_client(lib_dir=lib_dir)
-    except Exception as err:
-        print("Error connecting: cx_Oracle.init_oracle_client()")
-        print(err)
-        sys.exit(1)
 
-
-# 获取 Oracle Connection 对象
+# 获取 Oracle Engine 对象, 每个进程共享一个 Engine, 连接由进程级连接池提供
 def get_engine():
-    cfg = get_cfg()
-    init_oracle_client()
-    username = cfg["oracle"]["user"]
-    password = cfg["oracle"]["password"]
-    host = cfg["oracle"]["host"]
-    port = cfg["oracle"]["port"]
-    service_name = cfg["oracle"]["service_name"]
-    dsn = f"oracle+cx_oracle://{username}:{password}@{host}:{port}/?service_name={service_name}"
-    return create_engine(dsn)
+    pid = os.getpid()
+    engine = _engines.get(pid)
+    if engine is None:
+        # NullPool: SQLAlchemy 不再维护自己的连接池, 连接关闭即归还 oracledb 连接池
+        engine = create_engine("oracle+oracledb://", creator=acquire, poolclass=NullPool)
+        _engines.clear()
+        _engines[pid] = engine
+    return engine
 
 
-# 获取 Oracle Connection 对象
+# 获取 Oracle Connection 对象, close() 后归还连接池
 def get_connection():
-    cfg = get_cfg()
-    params = oracledb.ConnectParams(
-        host=cfg["oracle"]["host"],
-        port=int(cfg["oracle"]["port"]),
-        service_name=cfg["oracle"]["service_name"],
-    )
-    return oracledb.connect(
-        user=cfg["oracle"]["user"], password=cfg["oracle"]["password"], params=params
-    )
+    return acquire()
 
 
 def exec_sql(sql):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(sql)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with metrics.timer("db_exec"), get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+        conn.commit()
 
 
 def load_sql_script(path):
@@ -161,12 +124,22 @@ def exec_create_table_script(script_dir, drop_exist, logger):
             % (count, suc_cnt, flt_cnt)
         )
 
+        # 表结构可能变动, 清理合并插入临时表
+        drop_merge_gtt(table_name, logger)
+
         # 清理 LOGS 表的记录
         clean_logs_sql = f"DELETE FROM SYNC_LOGS WHERE \"接口名\"='{table_name}'"
         logger.info(f"Execute SQL  [{clean_logs_sql}]")
         cursor.execute(clean_logs_sql)
         conn.commit()
 
+        # 清理检查点表的记录 (表名统一大写), 否则重建后的表在同一目标日期内会被检查点全部跳过
+        if query_table_is_exist("SYNC_CHECKPOINT"):
+            clean_checkpoint_sql = f"DELETE FROM SYNC_CHECKPOINT WHERE \"表名\"='{table_name.upper()}'"
+            logger.info(f"Execute SQL  [{clean_checkpoint_sql}]")
+            cursor.execute(clean_checkpoint_sql)
+            conn.commit()
+
         cursor.close()
         conn.close()
         if flt_cnt > 0:
@@ -205,6 +178,156 @@ def max_date(date1, date2):
         return date2
 
 
+def get_write_cfg(writer=None, batch_size=None):
+    """
+    获取数据写入方式配置, 未指定时读取 application.ini [database-write] 配置
+    writer: to_sql (DataFrame.to_sql) | executemany (oracledb 数组绑定批量写入)
+    batch_size: executemany 单批次写入行数
+    """
+    cfg = get_cfg()
+    if writer is None:
+        writer = cfg.get("database-write", "writer", fallback="to_sql")
+    if batch_size is None:
+        batch_size = cfg.getint("database-write", "batch_size", fallback=50000)
+    return writer, batch_size
+
+
+def quote_identifier(name):
+    """
+    与 SQLAlchemy Oracle 方言保持一致: 全小写的普通标识符不区分大小写, 其余标识符(如中文字段)加双引号
+    """
+    name = str(name)
+    if re.fullmatch(r"[a-z_][a-z0-9_$#]*", name):
+        return name.upper()
+    return f'"{name}"'
+
+
+def to_bind_array(series):
+    """
+    将 DataFrame 列转换为 executemany 绑定数组, 返回 (绑定值列表, setinputsizes 类型)
+    """
+    if pd.api.types.is_bool_dtype(series):
+        series = series.astype("Int64")
+    if pd.api.types.is_datetime64_any_dtype(series):
+        input_size = oracledb.DB_TYPE_DATE
+        values = series.dt.to_pydatetime()
+        series = pd.Series(values, index=series.index, dtype=object)
+    elif pd.api.types.is_numeric_dtype(series):
+        input_size = oracledb.DB_TYPE_NUMBER
+    else:
+        not_null = series.dropna()
+        if not_null.map(type).eq(str).all():
+            input_size = max(int(not_null.str.len().max()), 1) if len(not_null) > 0 else 1
+        else:
+            input_size = None
+    values = series.astype(object).where(series.notna(), None).tolist()
+    return values, input_size
+
+
+def bulk_insert(df, table_name, connection, batch_size=50000):
+    """
+    使用 oracledb cursor.executemany 数组绑定将 DataFrame 批量写入表, 由调用方提交事务
+    :return: 写入的记录数
+    """
+    if df.empty:
+        return 0
+    columns = list(df.columns)
+    arrays = [to_bind_array(df[col]) for col in columns]
+    insert_sql = (
+        f"INSERT INTO {quote_identifier(table_name)} "
+        f"({', '.join(quote_identifier(col) for col in columns)}) "
+        f"VALUES ({', '.join(f':{i + 1}' for i in range(len(columns)))})"
+    )
+    rows = list(zip(*(values for values, _ in arrays)))
+
+    cursor = connection.cursor()
+    try:
+        cursor.setinputsizes(*(input_size for _, input_size in arrays))
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(insert_sql, rows[start: start + batch_size])
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def merge_gtt_name(table_name):
+    """
+    合并插入使用的会话级临时表名, 由表名前缀及表名哈希组成, 长度不超过 Oracle 标识符 30 字节限制
+    """
+    table_name = table_name.upper()
+    digest = hashlib.md5(table_name.encode("utf-8")).hexdigest()[:8].upper()
+    return f"GTT_{table_name[:16]}_{digest}"
+
+
+def create_merge_gtt(table_name, cursor):
+    """
+    创建合并插入临时表(不存在时), 字段与目标表一致(不含自增 ID 列), 事务提交后自动清空
+    """
+    gtt_name = merge_gtt_name(table_name)
+    cursor.execute(
+        "SELECT count(1) FROM USER_TABLES t WHERE t.TABLE_NAME = :1", [gtt_name]
+    )
+    if cursor.fetchone()[0] > 0:
+        return gtt_name
+
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM USER_TAB_COLUMNS "
+        "WHERE TABLE_NAME = :1 AND IDENTITY_COLUMN = 'NO' ORDER BY COLUMN_ID",
+        [table_name.upper()],
+    )
+    columns = [f'"{row[0]}"' for row in cursor.fetchall()]
+    cursor.execute(
+        f"CREATE GLOBAL TEMPORARY TABLE {gtt_name} ON COMMIT DELETE ROWS "
+        f"AS SELECT {', '.join(columns)} FROM {table_name.upper()} WHERE 1 = 0"
+    )
+    return gtt_name
+
+
+def drop_merge_gtt(table_name, logger):
+    """
+    目标表重建时删除对应的合并插入临时表, 下次合并时按新表结构重新创建
+    """
+    gtt_name = merge_gtt_name(table_name)
+    if query_table_is_exist(gtt_name):
+        drop_sql = f"DROP TABLE {gtt_name}"
+        logger.info(f"Execute SQL  [{drop_sql}]")
+        exec_sql(drop_sql)
+
+
+def merge_insert(df, table_name, merge_key, connection, batch_size=50000):
+    """
+    合并插入: 将本批次数据写入临时表, 执行 MERGE 仅插入 merge_key 在目标表中不存在的记录, 由调用方提交事务
+    :return: 实际插入的记录数
+    """
+    if df.empty:
+        return 0
+    cursor = connection.cursor()
+    try:
+        # DDL 会隐式提交, 需在写入临时表之前执行
+        gtt_name = create_merge_gtt(table_name, cursor)
+    finally:
+        cursor.close()
+
+    bulk_insert(df, gtt_name, connection, batch_size)
+
+    columns = [quote_identifier(col) for col in df.columns]
+    on_clause = " AND ".join(
+        f"t.{quote_identifier(k)} = s.{quote_identifier(k)}" for k in merge_key
+    )
+    merge_sql = (
+        f"MERGE INTO {quote_identifier(table_name)} t "
+        f"USING {gtt_name} s ON ({on_clause}) "
+        f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) "
+        f"VALUES ({', '.join(f's.{col}' for col in columns)})"
+    )
+    cursor = connection.cursor()
+    try:
+        cursor.execute(merge_sql)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
 def save_to_database(
         df,
         table_name,
@@ -213,6 +336,8 @@ def save_to_database(
         if_exists="append",
         chunksize=20000,
         merge_key=None,
+        writer=None,
+        batch_size=None,
 ):
     cfg = get_cfg()
     logger = get_logger(table_name, cfg["sync-logging"]["filename"])
@@ -220,67 +345,101 @@ def save_to_database(
     """
     将数据存储到数据库
     实现事务功能，
-    merge_append: 实现合并插入
+    merge_append: 实现合并插入, 按 merge_key 过滤表中已存在的记录, 由数据库端 MERGE 完成
+    writer: to_sql 使用 DataFrame.to_sql 写入; executemany 使用 oracledb 数组绑定批量写入 (仅支持追加写入)
     """
+    writer, batch_size = get_write_cfg(writer, batch_size)
+    metrics.count("rows_written", df.shape[0])
     try:
-        with engine.begin() as connection:  # 开启事务
+        with metrics.timer("db_write"):
             if if_exists == "merge_append":
-                if merge_key is None:
-                    merge_key = [""]
-
-                query_key = [
-                    f'"{k}"' if re.search(r"[\u4e00-\u9fa5]", str(k)) else k
-                    for k in merge_key
-                ]
+                if not merge_key:
+                    raise ValueError("merge_append requires merge_key")
+                # 批量写入临时表后由数据库执行 MERGE, 代价与本批次数据量成正比, 而非整表主键
+                df = df.dropna(subset=merge_key).reset_index(drop=True)
+                conn = get_connection()
+                try:
+                    count = merge_insert(df, table_name, merge_key, conn, batch_size)
+                    conn.commit()
+                except oracledb.DatabaseError:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+                logger.info(
+                    f"Write [{count}] Records Merge Into Table [{table_name}]"
+                )
+                return
 
-                # 从数据库仅读取主键列
-                query = f"SELECT {', '.join(query_key)} FROM {table_name}"
+            if writer == "executemany" and if_exists == "append":
+                conn = get_connection()
                 try:
-                    existing_data = pd.read_sql(query, con=engine)
-                    # 将数据库中的多列转为元组集合 (Set)，查询效率为 O(1)
-                    existing_tuples = set(
-                        zip(*(existing_data[col] for col in merge_key))
-                    )
-                except Exception:
-                    # 如果表不存在，则已存在集合为空
-                    existing_tuples = set()
-
-                # 2. 对当前的 df 同样生成元组标识
-                # 使用 zip 生成迭代器，避免在内存中创建巨大的字符串列
-                df_tuples = zip(*(df[col] for col in merge_key))
-
-                # 3. 过滤逻辑：保留那些不在 existing_tuples 中的行
-                # 这种写法比 apply(lambda) 快得多
-                mask = [tup not in existing_tuples for tup in df_tuples]
-                new_df = df[mask].dropna(subset=merge_key).reset_index(drop=True)
-
-                # 4. 追加插入
-                if not new_df.empty:
-                    new_df.to_sql(
+                    bulk_insert(df, table_name, conn, batch_size)
+                    conn.commit()
+                except oracledb.DatabaseError:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+            else:
+                with engine.begin() as connection:  # 开启事务
+                    df.to_sql(
                         table_name,
-                        con=engine,
+                        con=connection,
                         index=index,
-                        if_exists="append",
+                        if_exists=if_exists,
                         chunksize=chunksize,
                     )
-                    logger.info(
-                        f"Write [{new_df.shape[0]}] Records Merge Into Table [{table_name}]"
-                    )
-                else:
-                    logger.info(
-                        f"Write [{new_df.shape[0]}] Records Merge Into Table [{table_name}]"
-                    )
+    except (SQLAlchemyError, oracledb.DatabaseError) as e:
+        logger.error(f"Write Table [{table_name}] Error, Caused By [{e.__cause__ or e}]")
+        raise e
+
 
+def replace_to_database(
+        df,
+        table_name,
+        engine,
+        where,
+        chunksize=20000,
+        writer=None,
+        batch_size=None,
+):
+    """
+    按条件替换表中数据: 同一事务内删除 where 条件匹配的历史数据并写入 df, 失败时回滚,
+    其他会话不会读到历史数据已删除、新数据未写入的中间状态
+    """
+    cfg = get_cfg()
+    logger = get_logger(table_name, cfg["sync-logging"]["filename"])
+    writer, batch_size = get_write_cfg(writer, batch_size)
+    delete_sql = f"DELETE FROM {quote_identifier(table_name)} WHERE {where}"
+    metrics.count("rows_written", df.shape[0])
+    try:
+        with metrics.timer("db_write"):
+            if writer == "executemany":
+                conn = get_connection()
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute(delete_sql)
+                    bulk_insert(df, table_name, conn, batch_size)
+                    conn.commit()
+                except oracledb.DatabaseError:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
             else:
-                df.to_sql(
-                    table_name,
-                    con=connection,
-                    index=index,
-                    if_exists=if_exists,
-                    chunksize=chunksize,
-                )
-    except SQLAlchemyError as e:
-        logger.error(f"Write Table [{table_name}] Error, Caused By [{e.__cause__}]")
+                with engine.begin() as connection:  # 开启事务
+                    connection.exec_driver_sql(delete_sql)
+                    df.to_sql(
+                        table_name,
+                        con=connection,
+                        index=False,
+                        if_exists="append",
+                        chunksize=chunksize,
+                    )
+        logger.info(f"Execute Replace SQL  [{delete_sql}] Write [{df.shape[0]}] Records")
+    except (SQLAlchemyError, oracledb.DatabaseError) as e:
+        logger.error(f"Replace Table [{table_name}] Error, Caused By [{e.__cause__ or e}]")
         raise e
 
 
@@ -293,28 +452,45 @@ def save_to_database_v2(
         index=False,
         if_exists="append",
         chunksize=20000,
+        writer=None,
+        batch_size=None,
 ):
     """
     将数据存储到数据库 同时写入两张表数据
     实现事务功能，
     """
+    writer, batch_size = get_write_cfg(writer, batch_size)
+    metrics.count("rows_written", df1.shape[0] + df2.shape[0])
     try:
-        with engine.begin() as connection:  # 开启事务
-            df1.to_sql(
-                table_name1,
-                con=connection,
-                index=index,
-                if_exists=if_exists,
-                chunksize=chunksize,
-            )
-            df2.to_sql(
-                table_name2,
-                con=connection,
-                index=index,
-                if_exists=if_exists,
-                chunksize=chunksize,
-            )
-    except SQLAlchemyError as e:
+        with metrics.timer("db_write"):
+            if writer == "executemany" and if_exists == "append":
+                conn = get_connection()
+                try:
+                    bulk_insert(df1, table_name1, conn, batch_size)
+                    bulk_insert(df2, table_name2, conn, batch_size)
+                    conn.commit()
+                except oracledb.DatabaseError:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+            else:
+                with engine.begin() as connection:  # 开启事务
+                    df1.to_sql(
+                        table_name1,
+                        con=connection,
+                        index=index,
+                        if_exists=if_exists,
+                        chunksize=chunksize,
+                    )
+                    df2.to_sql(
+                        table_name2,
+                        con=connection,
+                        index=index,
+                        if_exists=if_exists,
+                        chunksize=chunksize,
+                    )
+    except (SQLAlchemyError, oracledb.DatabaseError) as e:
         raise e
 
 #
@@ -0,0 +1,127 @@
+"""
+交易日历
+1. 交易日期保存为有序 NumPy 整数数组 (YYYYMMDD), 按二分查找 (searchsorted) 定位, 替代逐个模块对交易日期列表的全量扫描
+2. 统一收盘截止时间规则: 当日 16:30:00 (SESSION_CUTOFF) 后当日数据视为已收盘, 之前取上一个交易日
+3. 入参日期支持 YYYYMMDD 字符串或整数, 返回 YYYYMMDD 字符串, 与数据库 NUMBER(8) 日期列及各同步模块的日期格式一致
+"""
+
+import datetime
+
+import numpy as np
+
+SESSION_CUTOFF = "16:30:00"
+
+
+def to_int(date):
+    return int(str(date).replace("-", "")[:8])
+
+
+def to_date(date):
+    value = to_int(date)
+    return datetime.date(value // 10000, value // 100 % 100, value % 100)
+
+
+def to_str(value):
+    return str(int(value))
+
+
+class TradeCalendar:
+    """
+    交易日历, dates 为交易日期列表 (YYYYMMDD 字符串或整数, 无需有序)
+    """
+
+    def __init__(self, dates):
+        self.dates = np.unique(np.array([to_int(date) for date in dates], dtype=np.int64))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, date):
+        value = to_int(date)
+        index = np.searchsorted(self.dates, value)
+        return index < len(self.dates) and self.dates[index] == value
+
+    def last_on_or_before(self, date):
+        """
+        不晚于 date 的最后一个交易日, 不存在时返回 None
+        """
+        index = np.searchsorted(self.dates, to_int(date), side="right")
+        return to_str(self.dates[index - 1]) if index > 0 else None
+
+    def last_before(self, date):
+        """
+        早于 date 的最后一个交易日, 不存在时返回 None
+        """
+        index = np.searchsorted(self.dates, to_int(date), side="left")
+        return to_str(self.dates[index - 1]) if index > 0 else None
+
+    def next_after(self, date):
+        """
+        晚于 date 的第一个交易日, 不存在时返回 None
+        """
+        index = np.searchsorted(self.dates, to_int(date), side="right")
+        return to_str(self.dates[index]) if index < len(self.dates) else None
+
+    def range(self, start, end, closed="both"):
+        """
+        start 至 end 之间的交易日列表 (升序)
+
+        :param closed: 区间端点是否包含, both: [start, end], left: [start, end), right: (start, end], neither: (start, end)
+        """
+        left = np.searchsorted(
+            self.dates, to_int(start), side="left" if closed in ("both", "left") else "right"
+        )
+        right = np.searchsorted(
+            self.dates, to_int(end), side="right" if closed in ("both", "right") else "left"
+        )
+        return [to_str(value) for value in self.dates[left:right]]
+
+    def week_end(self, date):
+        """
+        date 所在自然周 (周一至周日) 的最后一个交易日, 该周无交易日时返回 None
+        """
+        day = to_date(date)
+        monday = day - datetime.timedelta(days=day.weekday())
+        return self.last_in(monday, monday + datetime.timedelta(days=6))
+
+    def month_end(self, date):
+        """
+        date 所在自然月的最后一个交易日, 该月无交易日时返回 None
+        """
+        day = to_date(date)
+        first = day.replace(day=1)
+        last = (first + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        return self.last_in(first, last)
+
+    def last_in(self, first, last):
+        end = self.last_on_or_before(last.strftime("%Y%m%d"))
+        return end if end is not None and end >= first.strftime("%Y%m%d") else None
+
+    def last_session(self, now=None, cutoff=SESSION_CUTOFF):
+        """
+        最近一个已收盘的交易日: cutoff 时间后取不晚于当天的最后一个交易日, 否则取早于当天的最后一个交易日
+        """
+        now = now or datetime.datetime.now()
+        today = now.strftime("%Y%m%d")
+        if now.strftime("%H:%M:%S") > cutoff:
+            return self.last_on_or_before(today)
+        return self.last_before(today)
+
+    def last_week_end(self, now=None, cutoff=SESSION_CUTOFF):
+        """
+        最近一个已收盘的完整交易周的最后一个交易日
+        """
+        session = self.last_session(now, cutoff)
+        if self.week_end(session) == session:
+            return session
+        day = to_date(session)
+        return self.last_before((day - datetime.timedelta(days=day.weekday())).strftime("%Y%m%d"))
+
+    def last_month_end(self, now=None, cutoff=SESSION_CUTOFF):
+        """
+        最近一个已收盘的完整交易月的最后一个交易日
+        """
+        session = self.last_session(now, cutoff)
+        if self.month_end(session) == session:
+            return session
+        return self.last_before(to_date(session).replace(day=1).strftime("%Y%m%d"))
@@ -0,0 +1,99 @@
+"""
+同步水位批量查询
+1. 单次分析查询加载全表每个证券代码的最后同步日期和最后收盘价
+2. 各并发任务从内存字典中读取自身的水位，避免按代码逐个查询数据库
+"""
+
+import pandas as pd
+
+from util import metrics
+
+
+class SyncWatermark:
+    """
+    同步水位: {证券代码: (最后同步日期, 最后收盘价)}
+
+    table_name: 表名
+    default_date: 表中不存在该证券代码时使用的默认同步日期
+    code_column: 证券代码字段名
+    date_column: 日期字段名
+    close_column: 收盘价字段名, 为 None 时仅加载最后同步日期
+    date_format: 日期字段为 DATE 类型时的 TO_CHAR 格式, 为 None 时日期字段按 NUMBER(8) 处理
+    """
+
+    def __init__(
+            self,
+            table_name,
+            default_date,
+            code_column="股票代码",
+            date_column="日期",
+            close_column=None,
+            date_format=None,
+    ):
+        self.table_name = table_name.upper()
+        self.default_date = default_date
+        self.code_column = code_column
+        self.date_column = date_column
+        self.close_column = close_column
+        self.date_format = date_format
+        self.watermarks = {}
+
+    def format_date(self, column):
+        if self.date_format is None:
+            return column
+        return f"TO_CHAR({column}, '{self.date_format}')"
+
+    def build_query(self):
+        if self.close_column is None:
+            max_date = self.format_date(f'MAX("{self.date_column}")')
+            return (
+                f'SELECT "{self.code_column}" AS trade_code, {max_date} AS last_date '
+                f"FROM {self.table_name} "
+                f'WHERE "{self.date_column}" IS NOT NULL '
+                f'GROUP BY "{self.code_column}"'
+            )
+        return (
+            f"SELECT trade_code, {self.format_date('last_date')} AS last_date, last_close FROM ("
+            f'SELECT "{self.code_column}" AS trade_code, "{self.date_column}" AS last_date, "{self.close_column}" AS last_close, '
+            f'ROW_NUMBER() OVER (PARTITION BY "{self.code_column}" ORDER BY "{self.date_column}" DESC) AS rn '
+            f"FROM {self.table_name} "
+            f'WHERE "{self.date_column}" IS NOT NULL'
+            f") t WHERE rn = 1"
+        )
+
+    def load(self, engine, logger):
+        """
+        执行单次查询加载全部证券代码的同步水位
+        """
+        query = self.build_query()
+        logger.info(f"Execute Query SQL  [{query}]")
+        with metrics.timer("watermark"):
+            df = pd.read_sql(query, engine)
+
+        watermarks = {}
+        for row in df.itertuples(index=False, name=None):
+            last_date = (
+                str(row[1]) if self.date_format is not None else str(int(row[1]))
+            )
+            last_close = row[2] if self.close_column is not None else None
+            watermarks[row[0]] = (last_date, last_close)
+        self.watermarks = watermarks
+        logger.info(
+            f"Load Sync Watermark Of Table [{self.table_name}] Size [{len(watermarks)}]"
+        )
+        return self
+
+    def get_last_sync_date(self, trade_code):
+        """
+        查询上次同步的数据截止时间
+        """
+        return self.watermarks.get(trade_code, (self.default_date, None))[0]
+
+    def get_last_sync_info(self, trade_code):
+        """
+        查询上次同步的数据截止时间及该日期的收盘价, 用于检测复权数据是否发生变动
+        """
+        last_date, last_close = self.watermarks.get(
+            trade_code, (self.default_date, None)
+        )
+        return [last_date, last_close]